@@ -0,0 +1,99 @@
+import functools
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+
+DEFAULT_SIZES = '64,256,1024'
+
+# Every benchmark is repeated for about this long, at most MAX_ROUNDS times.
+TARGET_SECONDS = 1.
+MAX_ROUNDS = 100
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--benchmark-sizes',
+        default=DEFAULT_SIZES,
+        help=(
+            'Comma separated sizes of the (square) synthetic images, e.g. '
+            f'64,256,1024,4096. Default: {DEFAULT_SIZES}'
+        ),
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'max_size(size): skip images larger than size, for slow reference '
+        'implementations',
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' not in metafunc.fixturenames:
+        return
+    sizes = [
+        int(size)
+        for size in metafunc.config.getoption('benchmark_sizes').split(',')
+    ]
+    marker = metafunc.definition.get_closest_marker('max_size')
+    if marker is not None:
+        sizes = [size for size in sizes if size <= marker.args[0]]
+    metafunc.parametrize('size', sizes)
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_image(size: int) -> np.ndarray:
+    """A smooth image with edges and noise, like a photo."""
+    rng = np.random.RandomState(size)
+    y, x = np.mgrid[:size, :size] / size
+    im = (
+        128 +
+        60 * np.sin(12 * x) * np.cos(8 * y) +
+        40 * (x + y > 1) +
+        rng.normal(0, 8, (size, size))
+    )
+    im = np.clip(np.rint(im), 0, 255).astype(int)
+    im.setflags(write=False)
+    return im
+
+
+@pytest.fixture
+def image(size):
+    return synthetic_image(size)
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Benchmark a function and record its throughput and peak memory.
+
+    The function is first run once with tracemalloc to measure the peak
+    memory, this run also determines the number of rounds.
+    """
+    def measure(function, *args, n_pixels: int):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        rounds = int(max(1, min(MAX_ROUNDS, TARGET_SECONDS / elapsed)))
+        benchmark.pedantic(function, args, rounds=rounds)
+        benchmark.extra_info.update({
+            'megapixels': n_pixels / 1e6,
+            'peak_memory_mb': peak / 2 ** 20,
+        })
+        # There are no stats with --benchmark-disable.
+        if benchmark.stats is not None:
+            benchmark.extra_info['megapixels_per_second'] = (
+                n_pixels / 1e6 / benchmark.stats.stats.mean)
+        return result
+
+    return measure
@@ -0,0 +1,38 @@
+import pytest
+
+import jpeg.freq
+from jpeg.quantization import quantization_table
+from jpeg.utils import image_to_blocks
+
+
+@pytest.mark.max_size(256)
+def test_transform(measure, image):
+    measure(
+        jpeg.freq.transform,
+        image - 128.,
+        jpeg.freq.dct_filter_bank(),
+        n_pixels=image.size,
+    )
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_dct(measure, image, backend):
+    measure(
+        lambda: jpeg.freq.dct(image, backend=backend), n_pixels=image.size)
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_idct(measure, image, backend):
+    im_dct = jpeg.freq.dct(image)
+    measure(
+        lambda: jpeg.freq.idct(im_dct, backend=backend), n_pixels=image.size)
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_quantize_blocks(measure, image, backend):
+    blocks = image_to_blocks(image - 128.)
+    Q = quantization_table(50)
+    measure(
+        lambda: jpeg.freq.quantize_blocks(blocks, Q, backend=backend),
+        n_pixels=image.size,
+    )
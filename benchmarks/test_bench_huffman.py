@@ -0,0 +1,54 @@
+import pytest
+
+from jpeg import huffman
+from jpeg.bitstream import (
+    BitReader,
+    BitWriter,
+)
+from jpeg.freq import quantize_blocks
+from jpeg.quantization import quantization_table
+from jpeg.utils import image_to_blocks
+
+
+@pytest.fixture
+def sequences(image):
+    blocks = image_to_blocks(image - 128.)
+    return quantize_blocks(blocks, quantization_table(50)).reshape(-1, 64)
+
+
+@pytest.mark.max_size(256)
+def test_encode(measure, image, sequences):
+    measure(
+        lambda: [huffman.encode(sequence) for sequence in sequences],
+        n_pixels=image.size,
+    )
+
+
+@pytest.mark.max_size(256)
+def test_decode(measure, image, sequences):
+    codes = [huffman.encode(sequence) for sequence in sequences]
+    measure(
+        lambda: [huffman.decode(code) for code in codes], n_pixels=image.size)
+
+
+def write_blocks(sequences):
+    writer = BitWriter()
+    for sequence in sequences:
+        huffman.write_block(writer, sequence)
+    return writer.getvalue()
+
+
+def test_write_block(measure, image, sequences):
+    measure(write_blocks, sequences, n_pixels=image.size)
+
+
+def test_encode_blocks(measure, image, sequences):
+    measure(huffman.encode_blocks, sequences, n_pixels=image.size)
+
+
+def test_decode_blocks(measure, image, sequences):
+    data = write_blocks(sequences)
+    measure(
+        lambda: huffman.decode_blocks(BitReader(data), len(sequences)),
+        n_pixels=image.size,
+    )
@@ -0,0 +1,31 @@
+import pytest
+
+import jpeg
+
+
+QUALITIES = (25, 50, 90)
+
+
+@pytest.mark.parametrize("quality", QUALITIES)
+def test_compress(benchmark, measure, image, quality):
+    data = measure(
+        lambda: jpeg.compress_bytes(image, quality=quality),
+        n_pixels=image.size,
+    )
+    # The raw image has a byte per pixel.
+    benchmark.extra_info['compression_ratio'] = image.size / len(data)
+
+
+@pytest.mark.parametrize("quality", QUALITIES)
+def test_decompress(measure, image, quality):
+    data = jpeg.compress_bytes(image, quality=quality)
+    measure(jpeg.decompress_bytes, data, n_pixels=image.size)
+
+
+@pytest.mark.parametrize("scale", [1 / 2, 1 / 4, 1 / 8])
+def test_decompress_scale(measure, image, scale):
+    data = jpeg.compress_bytes(image, quality=50)
+    measure(
+        lambda: jpeg.decompress_bytes(data, scale=scale),
+        n_pixels=image.size,
+    )
@@ -0,0 +1,22 @@
+import pytest
+
+from jpeg.utils import (
+    generate_patches,
+    image_to_blocks,
+    zigzag_blocks,
+    zigzag_patch,
+)
+
+
+@pytest.mark.max_size(1024)
+def test_zigzag_patch(measure, image):
+    patches = list(generate_patches(image))
+    measure(
+        lambda: [zigzag_patch(patch) for patch in patches],
+        n_pixels=image.size,
+    )
+
+
+def test_zigzag_blocks(measure, image):
+    blocks = image_to_blocks(image)
+    measure(zigzag_blocks, blocks, n_pixels=image.size)
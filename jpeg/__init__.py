@@ -1,103 +1,1675 @@
-import numpy as np
+import concurrent.futures
+import contextlib
+import functools
+import mmap
+import os
+from itertools import (
+    chain,
+    repeat,
+)
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from typing import Union
+import numpy as np
 
+from .bitstream import (
+    BitReader,
+    BitWriter,
+)
 from .freq import (
-    discrete_cosine_filter,
-    inverse_discrete_cosine_filter,
-    transform,
+    dequantize_blocks,
+    quantize_blocks,
+    scaled_coefficients,
+    scaled_size,
+)
+from .color import (
+    SUBSAMPLING,
+    downsample,
+    pad,
+    rgb_to_ycbcr,
+    upsample,
+    ycbcr_to_rgb,
+)
+from .header import (
+    MIN_HEADER_SIZE,
+    PATCH_SIZE,
+    PROGRESSIVE_BANDS,
+    Header,
+    check_bands,
+    read_header,
+    write_header,
 )
 from .huffman import (
-    decode,
-    encode,
+    FIXED_DC_TABLE,
+    FIXED_TABLE,
+    HuffmanTable,
+    dc_symbol_frequencies,
+    decode_blocks,
+    encode_blocks,
+    symbol_frequencies,
+)
+from .instrument import (
+    Observer,
+    timed,
 )
+from .quantization import quantization_table
 from .utils import (
-    bits_to_int,
-    generate_patches,
-    int_to_bits,
-    izigzag_patch,
-    zigzag_patch,
+    blocks_to_image,
+    image_to_blocks,
 )
 
 
-def compress(im: np.ndarray, *, Q: Union[float, np.ndarray] = 1.) -> str:
+@contextlib.contextmanager
+def _mapper(
+    workers: Optional[int],
+    executor: Optional[concurrent.futures.Executor],
+) -> Iterator[Callable]:
+    """
+    The map function to distribute work over, keeping the order of the work.
+    """
+    if executor is not None:
+        yield executor.map
+    elif workers is not None and workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            yield executor.map
+    else:
+        yield map
+
+
+def _read_image_header(reader: BitReader) -> Header:
+    """
+    The header of a compressed image, a ValueError if the data ends within
+    it.
+    """
+    try:
+        return read_header(reader)
+    except EOFError:
+        raise ValueError(
+            f'Not a compressed image, the header is truncated: '
+            f'{len(reader) // 8} bytes'
+        ) from None
+
+
+def _header_quantization(
+    header: Header,
+    Q: Union[float, np.ndarray],
+) -> Union[float, np.ndarray]:
+    """
+    The quantization matrix stored in the header, or `Q` if there is none.
+    """
+    if header.quantization is None:
+        return Q
+    return np.array(header.quantization).reshape(PATCH_SIZE, PATCH_SIZE)
+
+
+def _quantize(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    backend: str,
+) -> np.ndarray:
+    """
+    The quantized coefficients of the blocks of an image (strip).
+
+    Returns
+    -------
+    np.ndarray : The zigzag ordered coefficients with shape (n_blocks, 64).
+    """
+    coefficients = quantize_blocks(
+        image_to_blocks(im - 128.), Q, backend=backend)
+    return coefficients.reshape(-1, PATCH_SIZE ** 2)
+
+
+def _quantize_and_count(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    backend: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The quantized coefficients and their symbol frequencies.
+    """
+    sequences = _quantize(im, Q, backend)
+    return sequences, _symbol_frequencies(sequences)
+
+
+def _symbol_frequencies(
+    sequences: np.ndarray,
+    dc_prediction: bool = True,
+    eob_runs: bool = False,
+) -> np.ndarray:
+    """
+    The frequencies of the symbols of the AC coefficients and of the DC
+    differences of a segment, with shape (2, 256). Without DC prediction all
+    coefficients count as AC coefficients. With EOB runs the segment is a
+    band, see :func:encode_blocks.
+    """
+    if not dc_prediction:
+        return np.stack([
+            symbol_frequencies(sequences, eob_runs=eob_runs),
+            np.zeros(256, dtype=int),
+        ])
+    return np.stack([
+        symbol_frequencies(sequences[:, 1:], eob_runs=eob_runs),
+        dc_symbol_frequencies(sequences),
+    ])
+
+
+def _optimized_tables(
+    frequencies: np.ndarray
+) -> Tuple[HuffmanTable, HuffmanTable]:
+    """
+    The Huffman tables of the AC coefficients and the DC differences for the
+    symbol frequencies, see :func:_symbol_frequencies.
+    """
+    return (
+        HuffmanTable.from_frequencies(frequencies[0]),
+        HuffmanTable.from_frequencies(frequencies[1]),
+    )
+
+
+def _encode_segment(
+    sequences: np.ndarray,
+    table: HuffmanTable,
+    dc_table: Optional[HuffmanTable],
+    eob_runs: bool = False,
+) -> bytes:
+    """
+    Encode the blocks of a segment, the segment is padded to a whole byte.
+    The DC prediction starts at 0, without a DC table the DC coefficients are
+    encoded like the other coefficients. With EOB runs the segment is a band,
+    see :func:encode_blocks.
+    """
+    data, _ = encode_blocks(
+        sequences, table=table, dc_table=dc_table, eob_runs=eob_runs)
+    return data
+
+
+def _compress_segment(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    table: HuffmanTable,
+    dc_table: HuffmanTable,
+) -> bytes:
+    """
+    Compress an image strip into a segment.
+    """
+    return _encode_segment(_quantize(im, Q, backend), table, dc_table)
+
+
+def _reconstruct(
+    sequences: np.ndarray,
+    n_ver_patches: int,
+    n_hor_patches: int,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    scale: float = 1,
+) -> np.ndarray:
+    """
+    The image (strip) from the quantized, zigzag ordered coefficients.
+    """
+    blocks = dequantize_blocks(sequences, Q, backend=backend, scale=scale)
+    blocks = blocks.reshape(
+        (n_ver_patches, n_hor_patches) + blocks.shape[-2:])
+    return blocks_to_image(blocks) + 128
+
+
+def _n_values(scale: float) -> int:
+    """The number of coefficients per block to decode at a scale."""
+    return PATCH_SIZE ** 2 if scale == 1 else scaled_coefficients(scale)
+
+
+def _decode_segment(
+    segment: bytes,
+    n_blocks: int,
+    table: HuffmanTable,
+    scale: float = 1,
+    dc_table: Optional[HuffmanTable] = None,
+) -> np.ndarray:
+    """
+    The quantized, zigzag ordered coefficients of a segment.
+    """
+    return decode_blocks(
+        BitReader(segment),
+        n_blocks,
+        table=table,
+        n_values=_n_values(scale),
+        dc_table=dc_table,
+    )
+
+
+def _decompress_segment(
+    segment: bytes,
+    n_ver_patches: int,
+    n_hor_patches: int,
+    table: HuffmanTable,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    scale: float = 1,
+    dc_table: Optional[HuffmanTable] = None,
+) -> np.ndarray:
+    """
+    Decompress a segment into an image strip.
+    """
+    sequences = _decode_segment(
+        segment, n_ver_patches * n_hor_patches, table, scale, dc_table)
+    return _reconstruct(
+        sequences, n_ver_patches, n_hor_patches, Q, backend, scale)
+
+
+def _plan(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    store_quantization: bool,
+    restart_interval: Optional[int],
+) -> Tuple[Header, List[np.ndarray]]:
+    """
+    The header and the image strips of the segments of a (grayscale) image.
+    """
+    image_to_blocks(im)   # validates the image shape
+    header = Header(
+        *im.shape, dc_table=FIXED_DC_TABLE, restart_interval=restart_interval)
+    if store_quantization:
+        header = header._replace(
+            quantization=tuple(np.asarray(Q).ravel().tolist()))
+    strips = [
+        im[PATCH_SIZE * y: PATCH_SIZE * (y + n_rows)]
+        for y, n_rows in header.segments()
+    ]
+    return header, strips
+
+
+def _assemble(header: Header, segments: List[bytes], index: bool) -> bytes:
+    """
+    The compressed image from the header and the segments.
+    """
+    if index:
+        offsets = np.cumsum([0] + [len(segment) for segment in segments])
+        header = header._replace(offsets=tuple(offsets[:-1].tolist()))
+
+    writer = BitWriter()
+    write_header(writer, header)
+    return writer.getvalue() + b''.join(segments)
+
+
+def _bands(
+    progressive: Union[bool, Tuple[int, ...]]
+) -> Optional[Tuple[int, ...]]:
+    """
+    The ends of the bands of the progressive option, None if sequential.
+    """
+    if progressive is True:
+        return PROGRESSIVE_BANDS
+    if progressive is False:
+        return None
+    bands = tuple(progressive)
+    check_bands(bands)
+    return bands
+
+
+def _encode_progressive(
+    sequences: np.ndarray,
+    header: Header,
+    optimize: bool,
+    observer: Optional[Observer] = None,
+) -> bytes:
+    """
+    Encode the quantized coefficients of a (grayscale) image into a scan per
+    band of the header. The DC coefficients are predicted in the first band,
+    the ends of band are coded as runs over the blocks.
+    """
+    bands = [
+        (start, sequences[:, start: stop])
+        for start, stop in header.band_ranges()
+    ]
+    table, dc_table = FIXED_TABLE, FIXED_DC_TABLE
+    if optimize:
+        with timed(observer, 'count'):
+            frequencies = sum(
+                _symbol_frequencies(band, start == 0, True)
+                for start, band in bands
+            )
+        with timed(observer, 'table'):
+            table, dc_table = _optimized_tables(frequencies)
+    with timed(observer, 'entropy'):
+        scans = [
+            _encode_segment(
+                band, table, dc_table if start == 0 else None, True)
+            for start, band in bands
+        ]
+    header = header._replace(
+        table=table,
+        dc_table=dc_table,
+        scans=tuple(len(scan) for scan in scans),
+    )
+    return _assemble(header, scans, False)
+
+
+def _interleave(components: List[bytes]) -> bytes:
+    """
+    Interleave the scans of the progressive components of a color image.
+    """
+    scans = []
+    for data in components:
+        header = read_header(BitReader(data))
+        bounds = np.cumsum((header.size,) + header.scans).tolist()
+        # The first scan of a component is preceded by its header.
+        bounds[0] = 0
+        scans.append([
+            data[start: stop] for start, stop in zip(bounds, bounds[1:])])
+    return b''.join(chain.from_iterable(zip(*scans)))
+
+
+def _component_streams(data: bytes, header: Header) -> List[bytes]:
+    """
+    The compressed (grayscale) components of a color image, the scans of a
+    progressive image are joined per component, see :func:_interleave.
+    """
+    if header.bands is None:
+        bounds = np.cumsum((header.size,) + header.components).tolist()
+        return [data[start: end] for start, end in zip(bounds, bounds[1:])]
+
+    headers: List[Optional[Header]] = [None] * len(header.components)
+    streams = [b''] * len(header.components)
+    position = header.size
+    for band_idx in range(len(header.bands)):
+        for component_idx, component_header in enumerate(headers):
+            start = position
+            if component_header is None:
+                component_header = read_header(BitReader(data[position:]))
+                headers[component_idx] = component_header
+                position += component_header.size
+            position += component_header.scans[band_idx]
+            streams[component_idx] += data[start: position]
+    return streams
+
+
+def _progressive_scans(
+    data: bytes,
+    header: Header,
+) -> Iterator[Tuple[int, Header, Tuple[int, int], memoryview]]:
+    """
+    The scans of a progressive image in the order of the data, up to the
+    first scan not completely in the data.
+
+    Yields
+    ------
+    Tuple[int, Header, Tuple[int, int], memoryview] : The component index,
+    the header of the component, the band and the bytes of the scan.
+    """
+    data = memoryview(data)
+    if header.components is None:
+        headers = [header]
+    else:
+        headers = [None] * len(header.components)
+    position = header.size
+    for band_idx, band in enumerate(header.band_ranges()):
+        for component_idx, component_header in enumerate(headers):
+            if component_header is None:
+                try:
+                    component_header = read_header(BitReader(data[position:]))
+                except EOFError:
+                    return
+                headers[component_idx] = component_header
+                position += component_header.size
+            stop = position + component_header.scans[band_idx]
+            if stop > len(data):
+                return
+            yield component_idx, component_header, band, data[position: stop]
+            position = stop
+
+
+def _decode_scan(
+    scan: bytes,
+    header: Header,
+    band: Tuple[int, int],
+    sequences: np.ndarray,
+) -> None:
+    """
+    Decode a scan of a progressive (grayscale) image into the quantized,
+    zigzag ordered coefficients with shape (n_blocks, 64).
+    """
+    start, stop = band
+    sequences[:, start: stop] = decode_blocks(
+        BitReader(scan),
+        len(sequences),
+        table=header.table,
+        n_values=stop - start,
+        dc_table=header.dc_table if start == 0 else None,
+        eob_runs=True,
+    )
+
+
+def _decode_progressive(
+    data: bytes,
+    header: Header,
+    scale: float = 1,
+) -> List[Tuple[Header, np.ndarray]]:
+    """
+    The header and the quantized, zigzag ordered coefficients with shape
+    (n_blocks, 64) of every component of a progressive image. The scans not
+    needed at the scale are skipped.
+    """
+    n_values = _n_values(scale)
+    n_components = len(header.components or (None,))
+    components: List[Tuple[Header, np.ndarray]] = []
+    n_scans = 0
+    for component_idx, component_header, band, scan in _progressive_scans(
+        data, header
+    ):
+        n_scans += 1
+        if component_idx == len(components):
+            components.append((component_header, np.zeros((
+                component_header.n_ver_patches *
+                component_header.n_hor_patches,
+                PATCH_SIZE ** 2,
+            ), dtype=np.int16)))
+        if band[0] < n_values:
+            _decode_scan(
+                scan, component_header, band, components[component_idx][1])
+    if n_scans < n_components * len(header.bands):
+        raise ValueError('Expecting all scans of the progressive image.')
+    return components
+
+
+def _decode_coefficients(data: bytes) -> Tuple[Header, np.ndarray]:
+    """
+    The header and the quantized, zigzag ordered coefficients of a
+    (grayscale) image, with shape (n_ver_patches, n_hor_patches, 64).
+    """
+    reader = BitReader(data)
+    header = read_header(reader)
+    if header.bands is not None:
+        ((header, sequences),) = _decode_progressive(data, header)
+        return header, sequences.reshape(
+            header.n_ver_patches, header.n_hor_patches, PATCH_SIZE ** 2)
+    sequences = [np.zeros((0, PATCH_SIZE ** 2), dtype=np.int16)]
+    for _, n_rows in header.segments():
+        sequences.append(decode_blocks(
+            reader,
+            n_rows * header.n_hor_patches,
+            table=header.table,
+            dc_table=header.dc_table,
+        ))
+        # Every segment starts at a whole byte.
+        reader.align()
+    return header, np.concatenate(sequences).reshape(
+        header.n_ver_patches, header.n_hor_patches, PATCH_SIZE ** 2)
+
+
+def _encode_blocks(
+    coefficients: np.ndarray,
+    header: Header,
+    optimize: bool,
+    index: bool,
+) -> bytes:
+    """
+    Encode quantized, zigzag ordered coefficients with shape (n_ver_patches,
+    n_hor_patches, 64) with the restart interval, quantization and bands of
+    the header, and DC prediction.
+    """
+    if header.bands is not None:
+        return _encode_progressive(
+            coefficients.reshape(-1, PATCH_SIZE ** 2), header, optimize)
+    sequences = [
+        coefficients[y: y + n_rows].reshape(-1, PATCH_SIZE ** 2)
+        for y, n_rows in header.segments()
+    ]
+    table, dc_table = FIXED_TABLE, FIXED_DC_TABLE
+    if optimize:
+        table, dc_table = _optimized_tables(
+            sum(map(_symbol_frequencies, sequences)))
+    segments = [
+        _encode_segment(strip, table, dc_table) for strip in sequences]
+    return _assemble(
+        header._replace(table=table, dc_table=dc_table), segments, index)
+
+
+def _encode_coefficients(coefficients: np.ndarray, header: Header) -> bytes:
+    """
+    Encode quantized, zigzag ordered coefficients with shape (n_ver_patches,
+    n_hor_patches, 64) like the image of the header: with its restart
+    interval and quantization, an optimized table, an index and bands if it
+    has them.
+    """
+    n_ver_patches, n_hor_patches, _ = coefficients.shape
+    return _encode_blocks(
+        coefficients,
+        header._replace(
+            height=PATCH_SIZE * n_ver_patches,
+            width=PATCH_SIZE * n_hor_patches,
+            offsets=None,
+            size=0,
+        ),
+        header.table != FIXED_TABLE,
+        header.offsets is not None,
+    )
+
+
+def _compress_observed(
+    strips: List[np.ndarray],
+    Q: Union[float, np.ndarray],
+    backend: str,
+    optimize: bool,
+    map_: Callable,
+    observer: Observer,
+) -> Tuple[Tuple[HuffmanTable, HuffmanTable], List[bytes]]:
+    """
+    Compress the segments like :func:_compress, with the stages one after
+    the other to report them to the observer.
+    """
+    with timed(observer, 'transform'):
+        sequences = list(map_(_quantize, strips, repeat(Q), repeat(backend)))
+    for strip_sequences in sequences:
+        observer.blocks(strip_sequences)
+
+    tables = (FIXED_TABLE, FIXED_DC_TABLE)
+    if optimize:
+        with timed(observer, 'count'):
+            frequencies = sum(map_(_symbol_frequencies, sequences))
+        with timed(observer, 'table'):
+            tables = _optimized_tables(frequencies)
+    with timed(observer, 'entropy'):
+        segments = list(map_(
+            _encode_segment, sequences, *map(repeat, tables)))
+    return tables, segments
+
+
+# The stages of a computation: every step yields a function and the argument
+# iterables of its jobs, one job per segment, and gets the list of results
+# back. The jobs are run by :func:_run_stages or by jpeg.aio.
+_Stages = Generator[Tuple[Callable, Tuple[Iterable, ...]], List, object]
+
+
+def _run_stages(stages: _Stages, map_: Callable):
+    """
+    Run the jobs of the stages with a map function, see :func:_mapper.
+
+    Returns
+    -------
+    The result of the stages.
+    """
+    try:
+        function, iterables = next(stages)
+        while True:
+            function, iterables = stages.send(
+                list(map_(function, *iterables)))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _compress_stages(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    store_quantization: bool,
+    optimize: bool,
+    restart_interval: Optional[int],
+    index: bool,
+) -> _Stages:
+    """
+    The stages compressing a (grayscale) image segment by segment, the result
+    is the compressed image, see :func:compress_bytes.
+    """
+    header, strips = _plan(im, Q, store_quantization, restart_interval)
+    if optimize:
+        sequences, frequencies = zip(*(yield _quantize_and_count, (
+            strips, repeat(Q), repeat(backend))))
+        tables = _optimized_tables(sum(frequencies))
+        segments = yield _encode_segment, (sequences, *map(repeat, tables))
+    else:
+        tables = (FIXED_TABLE, FIXED_DC_TABLE)
+        segments = yield _compress_segment, (
+            strips, repeat(Q), repeat(backend), *map(repeat, tables))
+    table, dc_table = tables
+    return _assemble(
+        header._replace(table=table, dc_table=dc_table), segments, index)
+
+
+def _join_strips(
+    header: Header,
+    strips: Iterable[np.ndarray],
+    dtype: np.dtype = int,
+    scale: float = 1,
+) -> np.ndarray:
+    """
+    The image from the strips of its segments.
+    """
+    size = scaled_size(scale)
+    im_back = np.empty(
+        (header.n_ver_patches * size, header.n_hor_patches * size),
+        dtype=dtype
+    )
+    for (y, n_rows), strip in zip(header.segments(), strips):
+        im_back[size * y: size * (y + n_rows)] = strip
+    return im_back
+
+
+def _decompress_stages(
+    data: bytes,
+    header: Header,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    dtype: np.dtype = int,
+    scale: float = 1,
+) -> _Stages:
+    """
+    The stages decompressing an indexed (grayscale) image segment by
+    segment, the result is the image, see :func:decompress_bytes.
+    """
+    segments = header.segments()
+    strips = yield _decompress_segment, (
+        [
+            data[header.segment_bounds(segment_idx, len(data))]
+            for segment_idx in range(len(segments))
+        ],
+        [n_rows for _, n_rows in segments],
+        repeat(header.n_hor_patches),
+        repeat(header.table),
+        repeat(_header_quantization(header, Q)),
+        repeat(backend),
+        repeat(scale),
+        repeat(header.dc_table),
+    )
+    return _join_strips(header, strips, dtype, scale)
+
+
+def _compress(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    store_quantization: bool,
+    optimize: bool,
+    restart_interval: Optional[int],
+    index: bool,
+    workers: Optional[int],
+    executor: Optional[concurrent.futures.Executor],
+    observer: Optional[Observer] = None,
+    bands: Optional[Tuple[int, ...]] = None,
+) -> bytes:
+    """
+    Compress an image, see :func:compress_bytes.
+    """
+    if bands is not None:
+        if restart_interval is not None or index:
+            raise ValueError(
+                'A progressive image has no restart interval or index.')
+        header, _ = _plan(im, Q, store_quantization, None)
+        header = header._replace(bands=tuple(bands))
+        with timed(observer, 'transform'):
+            sequences = _quantize(im, Q, backend)
+        if observer is not None:
+            observer.blocks(sequences, header.band_ranges())
+        return _encode_progressive(sequences, header, optimize, observer)
+
+    with _mapper(workers, executor) as map_:
+        if observer is None:
+            return _run_stages(_compress_stages(
+                im, Q, backend, store_quantization, optimize,
+                restart_interval, index
+            ), map_)
+        header, strips = _plan(im, Q, store_quantization, restart_interval)
+        (table, dc_table), segments = _compress_observed(
+            strips, Q, backend, optimize, map_, observer)
+    return _assemble(
+        header._replace(table=table, dc_table=dc_table), segments, index)
+
+
+def _decompress(
+    data: bytes,
+    Q: Union[float, np.ndarray],
+    backend: str,
+    workers: Optional[int],
+    executor: Optional[concurrent.futures.Executor],
+    observer: Optional[Observer] = None,
+    dtype: np.dtype = int,
+    scale: float = 1,
+) -> np.ndarray:
+    """
+    Decompress a (grayscale) image, see :func:decompress_bytes.
+    """
+    reader = BitReader(data)
+    header = read_header(reader)
+    segments = header.segments()
+    Q = _header_quantization(header, Q)
+    # The observer counts full blocks only.
+    observer_blocks = observer is not None and scale == 1
+
+    if header.bands is not None:
+        with timed(observer, 'entropy'):
+            ((_, sequences),) = _decode_progressive(data, header, scale)
+        if observer_blocks:
+            observer.blocks(sequences, header.band_ranges())
+        with timed(observer, 'reconstruct'):
+            return _reconstruct(
+                sequences, header.n_ver_patches, header.n_hor_patches, Q,
+                backend, scale
+            ).astype(dtype)
+
+    if header.offsets is None:
+        strips = []
+        for _, n_rows in segments:
+            with timed(observer, 'entropy'):
+                sequences = decode_blocks(
+                    reader,
+                    n_rows * header.n_hor_patches,
+                    table=header.table,
+                    n_values=_n_values(scale),
+                    dc_table=header.dc_table,
+                )
+            # Every segment starts at a whole byte.
+            reader.align()
+            if observer_blocks:
+                observer.blocks(sequences)
+            with timed(observer, 'reconstruct'):
+                strips.append(_reconstruct(
+                    sequences, n_rows, header.n_hor_patches, Q, backend,
+                    scale
+                ))
+    elif observer is not None:
+        # The stages one after the other to report them to the observer.
+        with _mapper(workers, executor) as map_:
+            with timed(observer, 'entropy'):
+                sequences = list(map_(
+                    _decode_segment,
+                    [
+                        data[header.segment_bounds(segment_idx, len(data))]
+                        for segment_idx in range(len(segments))
+                    ],
+                    [n_rows * header.n_hor_patches for _, n_rows in segments],
+                    repeat(header.table),
+                    repeat(scale),
+                    repeat(header.dc_table),
+                ))
+            if observer_blocks:
+                for segment_sequences in sequences:
+                    observer.blocks(segment_sequences)
+            with timed(observer, 'reconstruct'):
+                strips = list(map_(
+                    _reconstruct,
+                    sequences,
+                    [n_rows for _, n_rows in segments],
+                    repeat(header.n_hor_patches),
+                    repeat(Q),
+                    repeat(backend),
+                    repeat(scale),
+                ))
+    else:
+        with _mapper(workers, executor) as map_:
+            return _run_stages(_decompress_stages(
+                data, header, Q, backend, dtype, scale), map_)
+    return _join_strips(header, strips, dtype, scale)
+
+
+def _compress_color(
+    im: np.ndarray,
+    Q: Union[float, np.ndarray],
+    Q_chroma: Union[float, np.ndarray],
+    subsampling: str,
+    backend: str,
+    *args,
+    observer: Optional[Observer] = None,
+    bands: Optional[Tuple[int, ...]] = None,
+) -> bytes:
+    """
+    Compress a RGB image, see :func:compress_bytes.
+    """
+    factors = SUBSAMPLING[subsampling]
+    with timed(observer, 'color'):
+        ycbcr = rgb_to_ycbcr(im)
+        planes = [
+            ycbcr[:, :, 0],
+            downsample(ycbcr[:, :, 1], factors),
+            downsample(ycbcr[:, :, 2], factors),
+        ]
+    components = [
+        _compress(
+            pad(plane, (PATCH_SIZE, PATCH_SIZE)),
+            Q_component,
+            backend,
+            *args,
+            observer=observer,
+            bands=bands
+        )
+        for plane, Q_component in zip(planes, (Q, Q_chroma, Q_chroma))
+    ]
+
+    header = Header(
+        im.shape[0],
+        im.shape[1],
+        subsampling=factors,
+        components=tuple(len(component) for component in components),
+        bands=None if bands is None else tuple(bands),
+    )
+    writer = BitWriter()
+    write_header(writer, header)
+    if bands is not None:
+        return writer.getvalue() + _interleave(components)
+    return writer.getvalue() + b''.join(components)
+
+
+def _to_rgb(
+    planes: List[np.ndarray],
+    header: Header,
+    scale: float = 1,
+    observer: Optional[Observer] = None,
+) -> np.ndarray:
+    """
+    The RGB image from the (padded, subsampled) Y, Cb and Cr planes.
+    """
+    size = scaled_size(scale)
+    shape = (
+        -(-header.height * size // PATCH_SIZE),
+        -(-header.width * size // PATCH_SIZE),
+    )
+    with timed(observer, 'color'):
+        planes = [planes[0][:shape[0], :shape[1]]] + [
+            upsample(plane, header.subsampling, shape) for plane in planes[1:]
+        ]
+        return ycbcr_to_rgb(np.stack(planes, axis=2)).astype(int)
+
+
+def _decompress_color(
+    data: bytes,
+    header: Header,
+    Q: Union[float, np.ndarray],
+    Q_chroma: Union[float, np.ndarray],
+    backend: str,
+    *args,
+    observer: Optional[Observer] = None,
+    scale: float = 1,
+) -> np.ndarray:
+    """
+    Decompress a RGB image, see :func:decompress_bytes.
+    """
+    Qs = (Q, Q_chroma, Q_chroma)
+    if header.bands is not None:
+        with timed(observer, 'entropy'):
+            components = _decode_progressive(data, header, scale)
+        # The observer counts full blocks only.
+        if observer is not None and scale == 1:
+            for _, sequences in components:
+                observer.blocks(sequences, header.band_ranges())
+        with timed(observer, 'reconstruct'):
+            planes = [
+                _reconstruct(
+                    sequences,
+                    component_header.n_ver_patches,
+                    component_header.n_hor_patches,
+                    _header_quantization(component_header, Q_component),
+                    backend,
+                    scale,
+                )
+                for (component_header, sequences), Q_component in zip(
+                    components, Qs)
+            ]
+        return _to_rgb(planes, header, scale, observer)
+
+    planes = []
+    start = header.size
+    for n_bytes, Q_component in zip(header.components, Qs):
+        plane = _decompress(
+            data[start: start + n_bytes],
+            Q_component,
+            backend,
+            *args,
+            observer=observer,
+            dtype=float,
+            scale=scale
+        )
+        start += n_bytes
+        planes.append(plane)
+    return _to_rgb(planes, header, scale, observer)
+
+
+def compress_bytes(
+    im: np.ndarray,
+    *,
+    Q: Union[float, np.ndarray] = 1.,
+    Q_chroma: Optional[Union[float, np.ndarray]] = None,
+    quality: Optional[int] = None,
+    subsampling: str = '4:2:0',
+    backend: str = 'matrix',
+    optimize: bool = False,
+    restart_interval: Optional[int] = None,
+    index: bool = False,
+    progressive: Union[bool, Tuple[int, ...]] = False,
+    workers: Optional[int] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+    observer: Optional[Observer] = None
+) -> bytes:
     """
     Compress an image.
 
+    A RGB image is converted to YCbCr, the chroma is subsampled and every
+    component is compressed as a grayscale image with its own Huffman table.
+    The DC coefficient of a block is encoded as the difference with the
+    previous block in the segment, with a Huffman table of its own.
+
     Parameters
     ----------
     im : np.ndarray
-        The image to be compressed.
+        The image to be compressed, a grayscale image with shape (height,
+        width) or a RGB image with shape (height, width, 3).
     Q : Union[float, np.ndarray] (default : 1.)
         The quantization matrix or number.
+    Q_chroma : Optional[Union[float, np.ndarray]], optional (default : None)
+        The quantization matrix or number of the chroma of a RGB image, if
+        None `Q` is used.
+    quality : Optional[int], optional (default : None)
+        If given, compress with the luminance and chrominance tables of this
+        quality in [1, 100] instead of `Q` and `Q_chroma`, see
+        :func:jpeg.quantization.quantization_table. The tables are stored in
+        the header, they are not needed to decompress.
+    subsampling : str, optional (default : '4:2:0')
+        The chroma subsampling of a RGB image, see
+        :data:jpeg.color.SUBSAMPLING.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    optimize : bool, optional (default : False)
+        If true, count the symbols of all blocks first and use a Huffman table
+        optimized for this image. The table is stored in the header.
+    restart_interval : Optional[int], optional (default : None)
+        The number of block rows per segment. Segments start at a whole byte
+        and are encoded independently. If None, the image is one segment.
+    index : bool, optional (default : False)
+        If true, store the byte offset of every segment in the header, so the
+        segments can be decompressed in parallel.
+    progressive : Union[bool, Tuple[int, ...]], optional (default : False)
+        If true, store the coefficients of all blocks band by band - the DC
+        coefficients first, then the low and the high frequencies (see
+        :data:jpeg.header.PROGRESSIVE_BANDS) - instead of block by block. Or
+        the (exclusive) ends of the bands in zigzag order. A prefix of the
+        data gives a coarse image, see
+        :class:jpeg.progressive.ProgressiveDecoder. Not supported with a
+        restart interval or an index.
+    workers : Optional[int], optional (default : None)
+        The number of processes to compress the segments with.
+    executor : Optional[concurrent.futures.Executor], optional (default: None)
+        The executor to compress the segments with, overrules `workers`.
+    observer : Optional[Observer], optional (default : None)
+        The observer to report the stages and counters to, see
+        :class:jpeg.instrument.Observer.
 
     Returns
     -------
-    str : The bit representation of the compressed image.
+    bytes : The compressed image, independent of the number of workers.
     """
-    im = im - 128
+    if quality is not None:
+        Q = quantization_table(quality)
+        Q_chroma = quantization_table(quality, chroma=True)
+    args = (
+        quality is not None, optimize, restart_interval, index, workers,
+        executor
+    )
+    bands = _bands(progressive)
+    if im.ndim == 3:
+        if Q_chroma is None:
+            Q_chroma = Q
+        data = _compress_color(
+            im, Q, Q_chroma, subsampling, backend, *args, observer=observer,
+            bands=bands
+        )
+    else:
+        data = _compress(
+            im, Q, backend, *args, observer=observer, bands=bands)
+    if observer is not None:
+        observer.size(len(data))
+    return data
 
-    dc_filters = [
-        discrete_cosine_filter(x, y)
-        for x in range(8)
-        for y in range(8)
-    ]
 
-    dct = transform(im, dc_filters)
+def _group_by(keys: Iterable) -> Dict:
+    """
+    The indices of equal keys, in order of first occurrence.
+    """
+    groups = {}
+    for idx, key in enumerate(keys):
+        groups.setdefault(key, []).append(idx)
+    return groups
+
 
-    bit_string = (
-        int_to_bits(im.shape[0]).zfill(32) +
-        int_to_bits(im.shape[1]).zfill(32)
+def _encode_image(
+    sequences: np.ndarray,
+    header: Header,
+    optimize: bool,
+) -> bytes:
+    """
+    Encode the quantized coefficients of an image (of one segment).
+    """
+    table, dc_table = FIXED_TABLE, FIXED_DC_TABLE
+    if optimize:
+        table, dc_table = _optimized_tables(_symbol_frequencies(sequences))
+    return _assemble(
+        header._replace(table=table, dc_table=dc_table),
+        [_encode_segment(sequences, table, dc_table)],
+        False,
     )
-    bit_string += ''.join(
-        encode(zigzag_patch((patch / Q).astype(int)))
-        for patch in generate_patches(dct, patch_size=8)
+
+
+def compress_many(
+    images: Iterable[np.ndarray],
+    *,
+    Q: Union[float, np.ndarray] = 1.,
+    Q_chroma: Optional[Union[float, np.ndarray]] = None,
+    quality: Optional[int] = None,
+    subsampling: str = '4:2:0',
+    backend: str = 'matrix',
+    optimize: bool = False,
+    batch_size: int = 256,
+    workers: Optional[int] = None,
+    executor: Optional[concurrent.futures.Executor] = None
+) -> List[bytes]:
+    """
+    Compress many images.
+
+    Grayscale images are grouped by shape and the images of a group are
+    transformed and quantized as one batch, sharing the (cached) basis and
+    the header. The entropy coding - and the compression of RGB images - is
+    distributed over the workers. The result of every image is the same as
+    :func:compress_bytes.
+
+    Parameters
+    ----------
+    images : Iterable[np.ndarray]
+        The images to be compressed, see :func:compress_bytes.
+    Q : Union[float, np.ndarray] (default : 1.)
+        The quantization matrix or number.
+    Q_chroma : Optional[Union[float, np.ndarray]], optional (default : None)
+        The quantization matrix or number of the chroma of a RGB image, if
+        None `Q` is used.
+    quality : Optional[int], optional (default : None)
+        If given, compress with the tables of this quality, see
+        :func:compress_bytes.
+    subsampling : str, optional (default : '4:2:0')
+        The chroma subsampling of a RGB image.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    optimize : bool, optional (default : False)
+        If true, use a Huffman table optimized for every image.
+    batch_size : int, optional (default : 256)
+        The maximum number of images transformed at once, this bounds the
+        memory of the intermediates.
+    workers : Optional[int], optional (default : None)
+        The number of processes to compress the images with.
+    executor : Optional[concurrent.futures.Executor], optional (default: None)
+        The executor to compress the images with, overrules `workers`.
+
+    Returns
+    -------
+    List[bytes] : The compressed images, in the order of the images.
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be positive: {batch_size}')
+    images = [np.asarray(im) for im in images]
+    results: List[Optional[bytes]] = [None] * len(images)
+
+    groups = _group_by(im.shape if im.ndim == 2 else None for im in images)
+    colors = groups.pop(None, [])
+    store_quantization = quality is not None
+    if store_quantization:
+        Q = quantization_table(quality)
+
+    with _mapper(workers, executor) as map_:
+        for shape, indices in groups.items():
+            image_to_blocks(images[indices[0]])   # validates the image shape
+            header = Header(*shape)
+            if store_quantization:
+                header = header._replace(
+                    quantization=tuple(Q.ravel().tolist()))
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start: start + batch_size]
+                stacked = np.concatenate([images[idx] for idx in batch])
+                sequences = _quantize(stacked, Q, backend).reshape(
+                    len(batch), -1, PATCH_SIZE ** 2)
+                encoded = map_(
+                    _encode_image, sequences, repeat(header), repeat(optimize))
+                for idx, data in zip(batch, encoded):
+                    results[idx] = data
+
+        compress_color = functools.partial(
+            compress_bytes,
+            Q=Q,
+            Q_chroma=Q_chroma,
+            quality=quality,
+            subsampling=subsampling,
+            backend=backend,
+            optimize=optimize,
+        )
+        for idx, data in zip(colors, map_(
+            compress_color, [images[idx] for idx in colors]
+        )):
+            results[idx] = data
+
+    return results
+
+
+def _block_rows(
+    source: Union[np.ndarray, Iterable[np.ndarray]]
+) -> Iterator[np.ndarray]:
+    """
+    The block rows - strips of `PATCH_SIZE` rows - of an image (strips).
+    """
+    if isinstance(source, np.ndarray):
+        for y in range(0, source.shape[0], PATCH_SIZE):
+            yield source[y: y + PATCH_SIZE]
+        return
+
+    remainder = None   # the rows of a strip not filling a block row
+    for strip in source:
+        strip = np.asarray(strip)
+        if remainder is not None:
+            strip = np.concatenate([remainder, strip])
+        n_rows = strip.shape[0] - strip.shape[0] % PATCH_SIZE
+        for y in range(0, n_rows, PATCH_SIZE):
+            yield strip[y: y + PATCH_SIZE]
+        remainder = strip[n_rows:] if n_rows < strip.shape[0] else None
+    if remainder is not None:
+        raise ValueError(
+            f'Image height should be a multiple of {PATCH_SIZE}.')
+
+
+def compress_stream(
+    source: Union[np.ndarray, Iterable[np.ndarray]],
+    fileobj: BinaryIO,
+    *,
+    height: Optional[int] = None,
+    Q: Union[float, np.ndarray] = 1.,
+    quality: Optional[int] = None,
+    backend: str = 'matrix',
+    restart_interval: Optional[int] = None,
+    index: bool = False
+) -> int:
+    """
+    Compress an image to a file, one block row at a time.
+
+    The result is the same as :func:compress_bytes, but only a block row of
+    the image is in memory at once. Optimized Huffman tables are not
+    supported, they need a pass over the whole image.
+
+    Parameters
+    ----------
+    source : Union[np.ndarray, Iterable[np.ndarray]]
+        The image - e.g. a np.memmap - or an iterable of image strips. The
+        strips are split and joined into block rows.
+    fileobj : BinaryIO
+        The file to write the compressed image to.
+    height : Optional[int], optional (default : None)
+        The image height, if None for an iterable of strips the header is
+        rewritten after the last strip, this requires a seekable file.
+    Q : Union[float, np.ndarray] (default : 1.)
+        The quantization matrix or number.
+    quality : Optional[int], optional (default : None)
+        If given, compress with the luminance table of this quality instead
+        of `Q`, see :func:compress_bytes.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    restart_interval : Optional[int], optional (default : None)
+        The number of block rows per segment, see :func:compress_bytes.
+    index : bool, optional (default : False)
+        If true, store the index, see :func:compress_bytes. The header is
+        rewritten after the last strip, this requires a seekable file and the
+        height.
+
+    Returns
+    -------
+    int : The number of bytes written.
+    """
+    if isinstance(source, np.ndarray):
+        height = source.shape[0]
+    rows = _block_rows(source)
+    first_row = next(rows, None)
+    if first_row is None:
+        raise ValueError('Expecting at least one block row.')
+    width = first_row.shape[1]
+
+    rewrite_header = height is None or index
+    if rewrite_header and not fileobj.seekable():
+        raise ValueError('Expecting a seekable file to rewrite the header.')
+    if index and height is None:
+        raise ValueError('Expecting the image height to write an index.')
+
+    header = Header(
+        height or 0,
+        width,
+        dc_table=FIXED_DC_TABLE,
+        restart_interval=restart_interval,
     )
+    if quality is not None:
+        Q = quantization_table(quality)
+        header = header._replace(quantization=tuple(Q.ravel().tolist()))
+    if index:
+        header = header._replace(offsets=(0,) * len(header.segments()))
+
+    start = fileobj.tell() if rewrite_header else None
+    writer = BitWriter()
+    write_header(writer, header)
+    n_header_bytes = len(writer) // 8
+    fileobj.write(writer.take())
+
+    n_bytes = 0   # the number of bytes written after the header
+    offsets = []
+    n_rows = 0
+    prediction = 0   # the last DC coefficient of the segment
+    for n_rows, row in enumerate(chain([first_row], rows), start=1):
+        if row.shape[1] != width:
+            raise ValueError(f'Expecting strips of width {width}: {row.shape}')
+        if n_rows == 1 or (
+            restart_interval is not None and
+            (n_rows - 1) % restart_interval == 0
+        ):
+            # Every segment starts at a whole byte.
+            writer.align()
+            offsets.append(n_bytes + len(writer) // 8)
+            prediction = 0
+        sequences = _quantize(row, Q, backend)
+        writer.write_packed(*encode_blocks(
+            sequences, dc_table=FIXED_DC_TABLE, prediction=prediction))
+        prediction = int(sequences[-1, 0])
+        data = writer.take()
+        fileobj.write(data)
+        n_bytes += len(data)
+    writer.align()
+    data = writer.take()
+    fileobj.write(data)
+    n_bytes += len(data)
+
+    if height is not None and n_rows * PATCH_SIZE != height:
+        raise ValueError(
+            f'Expecting an image of height {height}: {n_rows * PATCH_SIZE}')
+
+    if rewrite_header:
+        header = header._replace(height=n_rows * PATCH_SIZE)
+        if index:
+            header = header._replace(offsets=tuple(offsets))
+        end = fileobj.tell()
+        fileobj.seek(start)
+        write_header(writer, header)
+        fileobj.write(writer.take())
+        fileobj.seek(end)
 
-    return bit_string
+    return n_header_bytes + n_bytes
 
 
-def decompress(
-    bit_string: str,
+def decompress_bytes(
+    data: bytes,
     *,
-    Q: Union[float, np.ndarray] = 1
+    Q: Union[float, np.ndarray] = 1,
+    Q_chroma: Optional[Union[float, np.ndarray]] = None,
+    backend: str = 'matrix',
+    scale: float = 1,
+    workers: Optional[int] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+    observer: Optional[Observer] = None
 ) -> np.ndarray:
     """
     Decompress an image.
 
     Parameters
     ----------
-    bit_string : str
-        The bit representation of an image.
+    data : bytes
+        The compressed image, see :func:compress_bytes.
     Q : Union[float, np.ndarray], optional (default : 1.)
-        The quantization matrix.
+        The quantization matrix, unless the header stores one.
+    Q_chroma : Optional[Union[float, np.ndarray]], optional (default : None)
+        The quantization matrix of the chroma of a RGB image, if None `Q` is
+        used.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    scale : float, optional (default : 1)
+        Decompress at a reduced resolution, e.g. 1/2, 1/4 or 1/8 for a
+        thumbnail: every block is reconstructed from its lowest frequencies
+        only, with a 4 by 4, 2 by 2 or 1 by 1 inverse transform, see
+        :func:jpeg.freq.scaled_idct_basis. The other coefficients are skipped
+        while decoding.
+    workers : Optional[int], optional (default : None)
+        The number of processes to decompress the segments with. Only used
+        when the compressed image has an index.
+    executor : Optional[concurrent.futures.Executor], optional (default: None)
+        The executor to decompress the segments with, overrules `workers`.
+    observer : Optional[Observer], optional (default : None)
+        The observer to report the stages and counters to, see
+        :class:jpeg.instrument.Observer.
+
+    Returns
+    -------
+    np.ndarray : The decompressed image, with the height and width times the
+    scale (rounded up).
+    """
+    if observer is not None:
+        observer.size(len(data))
+    header = _read_image_header(BitReader(data))
+    if header.components is not None:
+        if Q_chroma is None:
+            Q_chroma = Q
+        return _decompress_color(
+            data,
+            header,
+            Q,
+            Q_chroma,
+            backend,
+            workers,
+            executor,
+            observer=observer,
+            scale=scale,
+        )
+    return _decompress(
+        data, Q, backend, workers, executor, observer, scale=scale)
+
+
+def _decode_image(data: bytes) -> np.ndarray:
+    """
+    The quantized coefficients of a (grayscale) image.
+    """
+    return _decode_coefficients(data)[1].reshape(-1, PATCH_SIZE ** 2)
+
+
+def decompress_many(
+    blobs: Iterable[bytes],
+    *,
+    Q: Union[float, np.ndarray] = 1,
+    Q_chroma: Optional[Union[float, np.ndarray]] = None,
+    backend: str = 'matrix',
+    batch_size: int = 256,
+    workers: Optional[int] = None,
+    executor: Optional[concurrent.futures.Executor] = None
+) -> List[np.ndarray]:
+    """
+    Decompress many images, the inverse of :func:compress_many.
+
+    The entropy decoding - and the decompression of RGB images - is
+    distributed over the workers. Grayscale images of the same shape and
+    quantization are dequantized and inverse transformed as one batch. The
+    result of every image is the same as :func:decompress_bytes.
+
+    Parameters
+    ----------
+    blobs : Iterable[bytes]
+        The compressed images.
+    Q : Union[float, np.ndarray], optional (default : 1.)
+        The quantization matrix, unless the header stores one.
+    Q_chroma : Optional[Union[float, np.ndarray]], optional (default : None)
+        The quantization matrix of the chroma of a RGB image, if None `Q` is
+        used.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    batch_size : int, optional (default : 256)
+        The maximum number of images transformed at once.
+    workers : Optional[int], optional (default : None)
+        The number of processes to decompress the images with.
+    executor : Optional[concurrent.futures.Executor], optional (default: None)
+        The executor to decompress the images with, overrules `workers`.
+
+    Returns
+    -------
+    List[np.ndarray] : The decompressed images, in the order of the blobs.
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be positive: {batch_size}')
+    blobs = list(blobs)
+    results: List[Optional[np.ndarray]] = [None] * len(blobs)
+    headers = [read_header(BitReader(data)) for data in blobs]
+    groups = _group_by(
+        None if header.components is not None else
+        (header.height, header.width, header.quantization)
+        for header in headers
+    )
+    colors = groups.pop(None, [])
+    grays = [idx for indices in groups.values() for idx in indices]
+
+    with _mapper(workers, executor) as map_:
+        sequences = dict(zip(
+            grays, map_(_decode_image, [blobs[idx] for idx in grays])))
+        for indices in groups.values():
+            header = headers[indices[0]]
+            Q_group = _header_quantization(header, Q)
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start: start + batch_size]
+                stacked = _reconstruct(
+                    np.concatenate([sequences.pop(idx) for idx in batch]),
+                    len(batch) * header.n_ver_patches,
+                    header.n_hor_patches,
+                    Q_group,
+                    backend,
+                ).astype(int)
+                for idx, im in zip(batch, np.split(stacked, len(batch))):
+                    results[idx] = im
+
+        decompress_color = functools.partial(
+            decompress_bytes, Q=Q, Q_chroma=Q_chroma, backend=backend)
+        for idx, im in zip(colors, map_(
+            decompress_color, [blobs[idx] for idx in colors]
+        )):
+            results[idx] = im
+
+    return results
+
+
+def decompress_file(
+    path: Union[str, os.PathLike],
+    out: Optional[np.ndarray] = None,
+    *,
+    Q: Union[float, np.ndarray] = 1,
+    backend: str = 'matrix'
+) -> np.ndarray:
+    """
+    Decompress an image from a file.
+
+    The file is memory mapped and decompressed one block row at a time into
+    the output, there are no full image (floating point) intermediates.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        The path to the compressed image, see :func:compress_bytes.
+    out : Optional[np.ndarray], optional (default : None)
+        The array to decompress the image into. If None, a uint8 array is
+        created. The pixel values are clipped to [0, 255].
+    Q : Union[float, np.ndarray], optional (default : 1.)
+        The quantization matrix, unless the header stores one.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
 
     Returns
     -------
     np.ndarray : The decompressed image.
     """
-    height = bits_to_int(bit_string[:32])
-    width = bits_to_int(bit_string[32: 64])
-    bit_string = bit_string[64:]
+    with open(path, 'rb') as fileobj:
+        # An empty file can not be memory mapped.
+        n_bytes = os.fstat(fileobj.fileno()).st_size
+        if n_bytes < MIN_HEADER_SIZE:
+            raise ValueError(
+                f'Not a compressed image, the header is truncated: '
+                f'{n_bytes} bytes'
+            )
+        data = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        reader = BitReader(data)
+        try:
+            header = _read_image_header(reader)
+            if header.components is not None:
+                raise ValueError('Expecting a grayscale image.')
+            if header.bands is not None:
+                raise ValueError('Expecting a sequential image.')
+            Q = _header_quantization(header, Q)
+            shape = (header.height, header.width)
+            if out is None:
+                out = np.empty(shape, dtype=np.uint8)
+            elif out.shape != shape:
+                raise ValueError(
+                    f'Expecting output of shape {shape}: {out.shape}')
 
-    im_transformed = []
-    while len(bit_string) > 0:
-        patch, bit_string = decode(bit_string, remainder=True)
-        im_transformed.append(izigzag_patch(patch) * Q)
+            for y, n_rows in header.segments():
+                prediction = 0   # the last DC coefficient of the segment
+                for row in range(y, y + n_rows):
+                    sequences = decode_blocks(
+                        reader,
+                        header.n_hor_patches,
+                        table=header.table,
+                        dc_table=header.dc_table,
+                        prediction=prediction,
+                    )
+                    prediction = int(sequences[-1, 0])
+                    strip = _reconstruct(
+                        sequences, 1, header.n_hor_patches, Q, backend)
+                    np.clip(strip, 0, 255, out=strip)
+                    out[PATCH_SIZE * row: PATCH_SIZE * (row + 1)] = strip
+                # Every segment starts at a whole byte.
+                reader.align()
+        except EOFError:
+            raise ValueError(
+                f'The compressed image is truncated: {len(data)} bytes'
+            ) from None
+        finally:
+            reader.release()
 
-    patch_size = 8
-    n_hor_patches = int(width / patch_size)
-    im_dc = np.vstack([
-        np.hstack(im_transformed[y * n_hor_patches: (y + 1) * n_hor_patches])
-        for y in range(int(height / patch_size))
-    ])
+    return out
 
-    idc_filters = [
-        inverse_discrete_cosine_filter(u, v)
-        for u in range(8)
-        for v in range(8)
-    ]
 
-    im_back = transform(im_dc, idc_filters) + 128
+def decompress_region(
+    data: bytes,
+    y0: int,
+    x0: int,
+    h: int,
+    w: int,
+    *,
+    Q: Union[float, np.ndarray] = 1,
+    backend: str = 'matrix'
+) -> np.ndarray:
+    """
+    Decompress a region of an image.
+
+    Only the blocks intersecting the region are inverse transformed. Segments
+    after the region are not decoded. With an index (see
+    :func:compress_bytes) the segments before the region are skipped too,
+    and within a segment only the blocks up to the region are decoded. Use a
+    restart interval of one block row for the cost to scale with the region
+    size only.
 
-    return im_back.astype(int)
+    Parameters
+    ----------
+    data : bytes
+        The compressed image, see :func:compress_bytes.
+    y0 : int
+        The first row of the region.
+    x0 : int
+        The first column of the region.
+    h : int
+        The height of the region, positive.
+    w : int
+        The width of the region, positive.
+    Q : Union[float, np.ndarray], optional (default : 1.)
+        The quantization matrix, unless the header stores one.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+
+    Returns
+    -------
+    np.ndarray : The decompressed region.
+    """
+    reader = BitReader(data)
+    header = read_header(reader)
+    if header.components is not None:
+        raise ValueError('Expecting a grayscale image.')
+    if header.bands is not None:
+        raise ValueError('Expecting a sequential image.')
+    if (
+        min(y0, x0) < 0 or
+        min(h, w) <= 0 or
+        y0 + h > header.height or
+        x0 + w > header.width
+    ):
+        raise ValueError(
+            f'Region ({y0}, {x0}, {h}, {w}) outside image of shape '
+            f'{(header.height, header.width)}'
+        )
+    Q = _header_quantization(header, Q)
+
+    first_row, last_row = y0 // PATCH_SIZE, -(-(y0 + h) // PATCH_SIZE)
+    first_col, last_col = x0 // PATCH_SIZE, -(-(x0 + w) // PATCH_SIZE)
+    n_hor_patches = header.n_hor_patches
+
+    rows = []
+    for segment_idx, (y, n_rows) in enumerate(header.segments()):
+        if y >= last_row:
+            break
+        if header.offsets is not None:
+            if y + n_rows <= first_row:
+                continue
+            reader.position = 8 * (header.size + header.offsets[segment_idx])
+
+        # The next segment is found by decoding this segment completely,
+        # unless there is an index or this is the last segment needed.
+        if header.offsets is not None or y + n_rows >= last_row:
+            n_blocks = (min(n_rows, last_row - y) - 1) * n_hor_patches + (
+                last_col)
+        else:
+            n_blocks = n_rows * n_hor_patches
+        sequences = decode_blocks(
+            reader, n_blocks, table=header.table, dc_table=header.dc_table)
+        reader.align()
+
+        for row in range(max(first_row - y, 0), min(n_rows, last_row - y)):
+            start = row * n_hor_patches
+            rows.append(sequences[start + first_col: start + last_col])
+
+    region = _reconstruct(
+        np.concatenate(rows),
+        last_row - first_row,
+        last_col - first_col,
+        Q,
+        backend,
+    )
+    y_offset = y0 - PATCH_SIZE * first_row
+    x_offset = x0 - PATCH_SIZE * first_col
+    return region[y_offset: y_offset + h, x_offset: x_offset + w].astype(int)
+
+
+def compress(im: np.ndarray, **kwargs) -> str:
+    """
+    Compress an image.
+
+    This is a debug view of :func:compress_bytes.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The image to be compressed.
+    **kwargs
+        See :func:compress_bytes.
+
+    Returns
+    -------
+    str : The bit representation of the compressed image.
+    """
+    return ''.join(f'{byte:08b}' for byte in compress_bytes(im, **kwargs))
+
+
+def decompress(bit_string: str, **kwargs) -> np.ndarray:
+    """
+    Decompress an image.
+
+    This is a debug view of :func:decompress_bytes.
+
+    Parameters
+    ----------
+    bit_string : str
+        The bit representation of an image.
+    **kwargs
+        See :func:decompress_bytes.
+
+    Returns
+    -------
+    np.ndarray : The decompressed image.
+    """
+    writer = BitWriter()
+    writer.write_bits(bit_string)
+    return decompress_bytes(writer.getvalue(), **kwargs)
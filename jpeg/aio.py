@@ -0,0 +1,242 @@
+"""
+Compress and decompress images from asyncio code.
+
+The CPU work runs in an executor, so the event loop is not blocked. A
+(grayscale) image is processed one segment per job, see the
+`restart_interval` of :func:jpeg.compress_bytes: between the segments the
+call can be cancelled, and other calls get a turn. Decompression needs an
+index to find the segments, without one the image is decompressed in one
+job.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import weakref
+from typing import (
+    Callable,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from . import (
+    _Stages,
+    _compress_stages,
+    _decompress_stages,
+    compress_bytes,
+    decompress_bytes,
+)
+from .bitstream import BitReader
+from .header import read_header
+from .quantization import quantization_table
+
+
+# The loop of the running coroutine (Python 3.6 has get_event_loop only).
+_running_loop = getattr(
+    asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+class AsyncCodec:
+    """
+    Compress and decompress images without blocking the event loop.
+
+    The calls share bounded resources: at most `max_jobs` jobs run in the
+    executor at once and at most `max_pending` images are processed at once,
+    further calls wait for their turn (backpressure). Every call has at most
+    one job in the executor, a large image with many segments alternates with
+    the other calls instead of occupying all jobs.
+
+    Parameters
+    ----------
+    executor : Optional[concurrent.futures.Executor], optional (default : None)
+        The thread or process executor to run the jobs in. If None, the
+        default executor of the event loop.
+    max_jobs : int, optional (default : 4)
+        The maximum number of jobs in the executor at once.
+    max_pending : int, optional (default : 64)
+        The maximum number of images processed at once.
+    """
+
+    def __init__(
+        self,
+        executor: Optional[concurrent.futures.Executor] = None,
+        *,
+        max_jobs: int = 4,
+        max_pending: int = 64
+    ):
+        if max_jobs < 1 or max_pending < 1:
+            raise ValueError(
+                'The number of jobs and pending images should be positive: '
+                f'{max_jobs}, {max_pending}'
+            )
+        self.executor = executor
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        # The semaphores per event loop, asyncio primitives are bound to one.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _limits(self) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        """The pending images and jobs semaphores of the running loop."""
+        loop = _running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = (
+                asyncio.Semaphore(self.max_pending),
+                asyncio.Semaphore(self.max_jobs),
+            )
+        return self._semaphores[loop]
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        """Run a job in the executor."""
+        _, jobs = self._limits()
+        async with jobs:
+            return await _running_loop().run_in_executor(
+                self.executor, functools.partial(function, *args, **kwargs))
+
+    async def _run_stages(self, stages: _Stages):
+        """
+        Run the jobs of the stages one by one, see :func:jpeg._run_stages.
+        """
+        try:
+            function, iterables = next(stages)
+            while True:
+                results = []
+                for args in zip(*iterables):
+                    results.append(await self._run(function, *args))
+                function, iterables = stages.send(results)
+        except StopIteration as stop:
+            return stop.value
+
+    async def compress(
+        self,
+        im: np.ndarray,
+        *,
+        Q: Union[float, np.ndarray] = 1.,
+        Q_chroma: Optional[Union[float, np.ndarray]] = None,
+        quality: Optional[int] = None,
+        subsampling: str = '4:2:0',
+        backend: str = 'matrix',
+        optimize: bool = False,
+        restart_interval: Optional[int] = None,
+        index: bool = False
+    ) -> bytes:
+        """
+        Compress an image, see :func:jpeg.compress_bytes.
+
+        A RGB image is compressed in one job.
+
+        Returns
+        -------
+        bytes : The compressed image, the same as :func:jpeg.compress_bytes.
+        """
+        pending, _ = self._limits()
+        async with pending:
+            if im.ndim == 3:
+                return await self._run(
+                    compress_bytes,
+                    im,
+                    Q=Q,
+                    Q_chroma=Q_chroma,
+                    quality=quality,
+                    subsampling=subsampling,
+                    backend=backend,
+                    optimize=optimize,
+                    restart_interval=restart_interval,
+                    index=index,
+                )
+
+            if quality is not None:
+                Q = quantization_table(quality)
+            return await self._run_stages(_compress_stages(
+                im, Q, backend, quality is not None, optimize,
+                restart_interval, index
+            ))
+
+    async def decompress(
+        self,
+        data: bytes,
+        *,
+        Q: Union[float, np.ndarray] = 1,
+        Q_chroma: Optional[Union[float, np.ndarray]] = None,
+        backend: str = 'matrix'
+    ) -> np.ndarray:
+        """
+        Decompress an image, see :func:jpeg.decompress_bytes.
+
+        A RGB or progressive image, or an image without index, is
+        decompressed in one job: the segments are found by decoding.
+
+        Returns
+        -------
+        np.ndarray : The decompressed image.
+        """
+        pending, _ = self._limits()
+        async with pending:
+            header = read_header(BitReader(data))
+            if (
+                header.components is not None or
+                header.bands is not None or
+                header.offsets is None
+            ):
+                return await self._run(
+                    decompress_bytes, data, Q=Q, Q_chroma=Q_chroma,
+                    backend=backend
+                )
+
+            return await self._run_stages(
+                _decompress_stages(data, header, Q, backend))
+
+
+_DEFAULT_CODEC = AsyncCodec()
+
+
+async def compress_async(
+    im: np.ndarray,
+    *,
+    codec: Optional[AsyncCodec] = None,
+    **kwargs
+) -> bytes:
+    """
+    Compress an image without blocking the event loop.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The image to be compressed.
+    codec : Optional[AsyncCodec], optional (default : None)
+        The codec limiting the concurrency. If None, a default codec with the
+        default executor of the event loop, shared by all calls.
+    **kwargs
+        See :meth:AsyncCodec.compress.
+
+    Returns
+    -------
+    bytes : The compressed image.
+    """
+    return await (codec or _DEFAULT_CODEC).compress(im, **kwargs)
+
+
+async def decompress_async(
+    data: bytes,
+    *,
+    codec: Optional[AsyncCodec] = None,
+    **kwargs
+) -> np.ndarray:
+    """
+    Decompress an image without blocking the event loop.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed image.
+    codec : Optional[AsyncCodec], optional (default : None)
+        The codec limiting the concurrency, see :func:compress_async.
+    **kwargs
+        See :meth:AsyncCodec.decompress.
+
+    Returns
+    -------
+    np.ndarray : The decompressed image.
+    """
+    return await (codec or _DEFAULT_CODEC).decompress(data, **kwargs)
@@ -0,0 +1,227 @@
+from typing import Union
+
+
+class BitWriter:
+    """
+    Write bits to a packed byte buffer.
+
+    The bits are written most significant bit first, i.e. the first bit
+    written is the highest bit of the first byte.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._accumulator = 0   # the bits which do not fill a byte yet
+        self._n_bits = 0        # the number of bits in the accumulator
+
+    def __len__(self) -> int:
+        """The number of bits written (and not taken)."""
+        return 8 * len(self._buffer) + self._n_bits
+
+    def write(self, value: int, n_bits: int) -> None:
+        """
+        Write the `n_bits` lowest bits of a value.
+
+        Parameters
+        ----------
+        value : int
+            The (positive) value to be written.
+        n_bits : int
+            The number of bits used to represent the value.
+        """
+        if value < 0 or value >> n_bits:
+            raise ValueError(f'Value does not fit in {n_bits} bits: {value}')
+        self._accumulator = (self._accumulator << n_bits) | value
+        self._n_bits += n_bits
+        while self._n_bits >= 8:
+            self._n_bits -= 8
+            self._buffer.append((self._accumulator >> self._n_bits) & 0xFF)
+        self._accumulator &= (1 << self._n_bits) - 1
+
+    def write_bits(self, bits: str) -> None:
+        """
+        Write a bit string.
+
+        Parameters
+        ----------
+        bits : str
+            The bit string, e.g. '0110'.
+        """
+        if bits:
+            self.write(int(bits, 2), len(bits))
+
+    def write_packed(self, data: bytes, n_bits: int) -> None:
+        """
+        Write the first bits of packed bytes, e.g. of another writer.
+
+        Parameters
+        ----------
+        data : bytes
+            The packed bits, most significant bit first.
+        n_bits : int
+            The number of bits to write.
+        """
+        n_bytes = -(-n_bits // 8)
+        if n_bits < 0 or len(data) < n_bytes:
+            raise ValueError(
+                f'Expecting at least {n_bytes} bytes: {len(data)}')
+        value = int.from_bytes(data[:n_bytes], 'big') >> (-n_bits % 8)
+        value |= self._accumulator << n_bits
+        n_bits += self._n_bits
+        self._n_bits = n_bits % 8
+        self._buffer += (value >> self._n_bits).to_bytes(n_bits // 8, 'big')
+        self._accumulator = value & ((1 << self._n_bits) - 1)
+
+    def align(self) -> None:
+        """Pad with zeros up to the next byte boundary."""
+        if self._n_bits:
+            self.write(0, 8 - self._n_bits)
+
+    def take(self) -> bytes:
+        """
+        Remove the whole bytes written so far from the buffer.
+
+        The bits which do not fill a byte yet remain in the writer, this
+        allows to write bits to a file incrementally.
+
+        Returns
+        -------
+        bytes : The whole bytes.
+        """
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def getvalue(self) -> bytes:
+        """
+        The packed bytes.
+
+        Returns
+        -------
+        bytes : The bits written, padded with zeros to a whole byte.
+        """
+        if self._n_bits == 0:
+            return bytes(self._buffer)
+        last_byte = self._accumulator << (8 - self._n_bits)
+        return bytes(self._buffer) + bytes([last_byte])
+
+    def to_bit_string(self) -> str:
+        """
+        A debug view of the bits written.
+
+        Returns
+        -------
+        str : The bits written as a string of '0' and '1' characters.
+        """
+        n_bits = len(self)
+        if n_bits == 0:
+            return ''
+        value = int.from_bytes(self.getvalue(), 'big')
+        return bin(value >> (-n_bits % 8))[2:].zfill(n_bits)
+
+
+class BitReader:
+    """
+    Read bits from packed bytes, see :class:BitWriter.
+
+    Parameters
+    ----------
+    data : Union[bytes, bytearray, memoryview]
+        The packed bytes.
+    position : int, optional (default : 0)
+        The bit position to start reading from.
+    """
+
+    def __init__(
+        self,
+        data: Union[bytes, bytearray, memoryview],
+        *,
+        position: int = 0
+    ):
+        self._data = memoryview(data).cast('B')
+        self.position = position
+
+    @classmethod
+    def from_bit_string(cls, bits: str) -> 'BitReader':
+        """
+        Create a reader from a bit string, see :meth:BitWriter.to_bit_string.
+
+        Parameters
+        ----------
+        bits : str
+            The bit string.
+
+        Returns
+        -------
+        BitReader : The reader.
+        """
+        writer = BitWriter()
+        writer.write_bits(bits)
+        return cls(writer.getvalue())
+
+    def __len__(self) -> int:
+        """The number of bits in the buffer (including padding)."""
+        return 8 * len(self._data)
+
+    @property
+    def bits_remaining(self) -> int:
+        """The number of bits after the current position."""
+        return len(self) - self.position
+
+    def read(self, n_bits: int) -> int:
+        """
+        Read a number of bits as an unsigned integer.
+
+        Parameters
+        ----------
+        n_bits : int
+            The number of bits to read.
+
+        Returns
+        -------
+        int : The value of the bits.
+        """
+        if n_bits == 0:
+            return 0
+        end = self.position + n_bits
+        if end > len(self):
+            raise EOFError(
+                f'Reading {n_bits} bits at position {self.position} beyond '
+                f'end of data: {len(self)}'
+            )
+        first_byte = self.position >> 3
+        last_byte = (end + 7) >> 3
+        chunk = int.from_bytes(self._data[first_byte: last_byte], 'big')
+        self.position = end
+        return (chunk >> (8 * last_byte - end)) & ((1 << n_bits) - 1)
+
+    def peek(self, n_bits: int) -> int:
+        """
+        Look at the next bits without moving the position.
+
+        Bits beyond the end of the data are read as zeros.
+
+        Parameters
+        ----------
+        n_bits : int
+            The number of bits to look at.
+
+        Returns
+        -------
+        int : The value of the bits.
+        """
+        end = self.position + n_bits
+        first_byte = self.position >> 3
+        last_byte = (end + 7) >> 3
+        chunk = self._data[first_byte: last_byte]
+        value = int.from_bytes(chunk, 'big') << (
+            8 * (last_byte - first_byte - len(chunk)))
+        return (value >> (8 * last_byte - end)) & ((1 << n_bits) - 1)
+
+    def align(self) -> None:
+        """Skip the padding up to the next byte boundary."""
+        self.position += -self.position % 8
+
+    def release(self) -> None:
+        """Release the buffer, e.g. to allow closing a memory map."""
+        self._data.release()
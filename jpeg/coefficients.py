@@ -0,0 +1,324 @@
+"""
+The quantized coefficients of an image, the intermediate of compression.
+
+:func:image_to_coefficients and :func:encode_coefficients are the transform
+and the entropy coding halves of :func:jpeg.compress_bytes,
+:func:decode_coefficients and :func:coefficients_to_image those of
+:func:jpeg.decompress_bytes. In between, a :class:CoefficientImage holds the
+coefficients of all blocks in one contiguous int16 array, e.g. to cache
+decoded images, to process them in the coefficient domain or to send them to
+another process.
+"""
+from typing import (
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from . import (
+    _bands,
+    _decode_coefficients,
+    _encode_blocks,
+    _quantize,
+    _reconstruct,
+)
+from .bitstream import BitReader
+from .header import (
+    PATCH_SIZE,
+    Header,
+    read_header,
+)
+from .quantization import quantization_table
+
+
+# The serialized image: height, width and whether there is a quantization
+# matrix, followed by the matrix and the coefficients (little endian).
+_PREFIX_DTYPE = np.dtype('<u4')
+_QUANTIZATION_DTYPE = np.dtype('<u2')
+_COEFFICIENTS_DTYPE = np.dtype('<i2')
+
+
+class CoefficientImage:
+    """
+    The quantized, zigzag ordered coefficients of a grayscale image.
+
+    Parameters
+    ----------
+    height : int
+        The image height, a multiple of 8.
+    width : int
+        The image width, a multiple of 8.
+    coefficients : np.ndarray
+        The coefficients with shape (height // 8, width // 8, 64) and values
+        in [-2 ** 15, 2 ** 15), stored as a contiguous int16 array.
+    quantization : Optional[np.ndarray], optional (default : None)
+        The 8 by 8 quantization matrix with integer values in [1, 2 ** 16).
+        If None, it is given when reconstructing the image.
+    """
+
+    __slots__ = ('height', 'width', 'coefficients', 'quantization')
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        coefficients: np.ndarray,
+        quantization: Optional[np.ndarray] = None,
+    ):
+        shape = (height // PATCH_SIZE, width // PATCH_SIZE, PATCH_SIZE ** 2)
+        if height % PATCH_SIZE or width % PATCH_SIZE:
+            raise ValueError(
+                f'Image height and width should be multiples of {PATCH_SIZE}:'
+                f' {(height, width)}'
+            )
+        if coefficients.shape != shape:
+            raise ValueError(
+                f'Expecting coefficients of shape {shape}: '
+                f'{coefficients.shape}'
+            )
+        if coefficients.dtype != np.int16 and coefficients.size and (
+            coefficients.min() < -2 ** 15 or coefficients.max() >= 2 ** 15
+        ):
+            raise ValueError('Coefficients should fit in 16 bits.')
+        if quantization is not None:
+            quantization = np.asarray(quantization)
+            if (
+                quantization.shape != (PATCH_SIZE, PATCH_SIZE) or
+                np.any(quantization != np.round(quantization)) or
+                quantization.min() < 1 or quantization.max() >= 2 ** 16
+            ):
+                raise ValueError(
+                    f'Expecting a {PATCH_SIZE} by {PATCH_SIZE} quantization '
+                    f'matrix with values in [1, 2 ** 16): {quantization}'
+                )
+            quantization = quantization.astype(np.uint16)
+
+        self.height = height
+        self.width = width
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=np.int16)
+        self.quantization = quantization
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, CoefficientImage) and
+            self.height == other.height and
+            self.width == other.width and
+            np.array_equal(self.coefficients, other.coefficients) and
+            (self.quantization is None) == (other.quantization is None) and
+            (self.quantization is None or
+             np.array_equal(self.quantization, other.quantization))
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f'CoefficientImage(height={self.height}, width={self.width}, '
+            f'quantization={self.quantization is not None})'
+        )
+
+    def __reduce__(self):
+        # Pickle the serialized bytes, not the arrays.
+        return CoefficientImage.frombytes, (self.tobytes(),)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes of the coefficients."""
+        return self.coefficients.nbytes
+
+    def tobytes(self) -> bytes:
+        """
+        Serialize the image.
+
+        Returns
+        -------
+        bytes : The height, width, quantization matrix and the raw
+        coefficients, see :meth:frombytes.
+        """
+        has_quantization = self.quantization is not None
+        parts = [np.array(
+            [self.height, self.width, has_quantization], dtype=_PREFIX_DTYPE
+        ).tobytes()]
+        if has_quantization:
+            parts.append(
+                self.quantization.astype(_QUANTIZATION_DTYPE).tobytes())
+        parts.append(self.coefficients.astype(_COEFFICIENTS_DTYPE).tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def frombytes(cls, data: bytes) -> 'CoefficientImage':
+        """
+        Deserialize an image, see :meth:tobytes.
+
+        Parameters
+        ----------
+        data : bytes
+            The serialized image.
+
+        Returns
+        -------
+        CoefficientImage : The image, the coefficients are a read-only view
+        of the data (on little endian machines).
+        """
+        height, width, has_quantization = np.frombuffer(
+            data, dtype=_PREFIX_DTYPE, count=3).tolist()
+        offset = 3 * _PREFIX_DTYPE.itemsize
+        quantization = None
+        if has_quantization:
+            quantization = np.frombuffer(
+                data,
+                dtype=_QUANTIZATION_DTYPE,
+                count=PATCH_SIZE ** 2,
+                offset=offset,
+            ).reshape(PATCH_SIZE, PATCH_SIZE)
+            offset += quantization.nbytes
+        coefficients = np.frombuffer(
+            data, dtype=_COEFFICIENTS_DTYPE, offset=offset)
+        return cls(height, width, coefficients.reshape(
+            height // PATCH_SIZE, width // PATCH_SIZE, PATCH_SIZE ** 2
+        ), quantization)
+
+
+def image_to_coefficients(
+    im: np.ndarray,
+    *,
+    Q: Union[float, np.ndarray] = 1.,
+    quality: Optional[int] = None,
+    backend: str = 'matrix'
+) -> CoefficientImage:
+    """
+    Transform and quantize a grayscale image.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The image with shape (height, width), multiples of 8.
+    Q : Union[float, np.ndarray] (default : 1.)
+        The quantization matrix or number.
+    quality : Optional[int], optional (default : None)
+        If given, quantize with the luminance table of this quality instead
+        of `Q`, the table is kept with the coefficients, see
+        :func:jpeg.compress_bytes.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+
+    Returns
+    -------
+    CoefficientImage : The quantized coefficients.
+    """
+    quantization = None
+    if quality is not None:
+        Q = quantization = quantization_table(quality)
+    sequences = _quantize(im, Q, backend)
+    height, width = im.shape
+    return CoefficientImage(height, width, sequences.reshape(
+        height // PATCH_SIZE, width // PATCH_SIZE, PATCH_SIZE ** 2
+    ), quantization)
+
+
+def coefficients_to_image(
+    image: CoefficientImage,
+    *,
+    Q: Union[float, np.ndarray] = 1,
+    backend: str = 'matrix',
+    scale: float = 1
+) -> np.ndarray:
+    """
+    Dequantize and inverse transform the coefficients of an image, the
+    inverse of :func:image_to_coefficients.
+
+    Parameters
+    ----------
+    image : CoefficientImage
+        The quantized coefficients.
+    Q : Union[float, np.ndarray], optional (default : 1.)
+        The quantization matrix, unless the image has one.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    scale : float, optional (default : 1)
+        Reconstruct at a reduced resolution, see :func:jpeg.decompress_bytes.
+
+    Returns
+    -------
+    np.ndarray : The image, the same as :func:jpeg.decompress_bytes.
+    """
+    if image.quantization is not None:
+        Q = image.quantization
+    n_ver_patches, n_hor_patches, _ = image.coefficients.shape
+    return _reconstruct(
+        image.coefficients.reshape(-1, PATCH_SIZE ** 2),
+        n_ver_patches,
+        n_hor_patches,
+        Q,
+        backend,
+        scale,
+    ).astype(int)
+
+
+def encode_coefficients(
+    image: CoefficientImage,
+    *,
+    optimize: bool = False,
+    restart_interval: Optional[int] = None,
+    index: bool = False,
+    progressive: Union[bool, Tuple[int, ...]] = False
+) -> bytes:
+    """
+    Entropy code the coefficients of an image.
+
+    Parameters
+    ----------
+    image : CoefficientImage
+        The quantized coefficients, the quantization matrix is stored in the
+        header if the image has one.
+    optimize : bool, optional (default : False)
+        If true, use a Huffman table optimized for this image.
+    restart_interval : Optional[int], optional (default : None)
+        The number of block rows per segment.
+    index : bool, optional (default : False)
+        If true, store the byte offset of every segment in the header.
+    progressive : Union[bool, Tuple[int, ...]], optional (default : False)
+        If true, or the ends of the bands, store the coefficients band by
+        band.
+
+    Returns
+    -------
+    bytes : The compressed image, the same as :func:jpeg.compress_bytes
+    with the same options.
+    """
+    header = Header(image.height, image.width)
+    if image.quantization is not None:
+        header = header._replace(
+            quantization=tuple(image.quantization.ravel().tolist()))
+    bands = _bands(progressive)
+    if bands is not None and (restart_interval is not None or index):
+        raise ValueError(
+            'A progressive image has no restart interval or index.')
+    header = header._replace(restart_interval=restart_interval, bands=bands)
+    return _encode_blocks(image.coefficients, header, optimize, index)
+
+
+def decode_coefficients(data: bytes) -> CoefficientImage:
+    """
+    Entropy decode the coefficients of a compressed grayscale image, the
+    inverse of :func:encode_coefficients.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed image, see :func:jpeg.compress_bytes.
+
+    Returns
+    -------
+    CoefficientImage : The quantized coefficients, with the quantization
+    matrix of the header if it stores one.
+    """
+    if read_header(BitReader(data)).components is not None:
+        raise ValueError('Expecting a grayscale image.')
+    header, coefficients = _decode_coefficients(data)
+    quantization = None
+    if header.quantization is not None:
+        quantization = np.array(header.quantization).reshape(
+            PATCH_SIZE, PATCH_SIZE)
+    return CoefficientImage(
+        header.height, header.width, coefficients, quantization)
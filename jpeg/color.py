@@ -0,0 +1,133 @@
+from typing import Tuple
+
+import numpy as np
+
+
+# The (vertical, horizontal) chroma subsampling factors.
+SUBSAMPLING = {
+    '4:4:4': (1, 1),
+    '4:2:2': (1, 2),
+    '4:2:0': (2, 2),
+}
+
+# JFIF (full range) conversion, see: https://www.w3.org/Graphics/JPEG/jfif3.pdf
+RGB_TO_YCBCR = np.array([
+    [0.299, 0.587, 0.114],
+    [-0.168736, -0.331264, 0.5],
+    [0.5, -0.418688, -0.081312],
+])
+YCBCR_TO_RGB = np.array([
+    [1., 0., 1.402],
+    [1., -0.344136, -0.714136],
+    [1., 1.772, 0.],
+])
+CHROMA_OFFSET = np.array([0., 128., 128.])
+
+
+def rgb_to_ycbcr(im: np.ndarray) -> np.ndarray:
+    """
+    Convert an RGB image to YCbCr.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The RGB image with shape (height, width, 3).
+
+    Returns
+    -------
+    np.ndarray : The YCbCr image with shape (height, width, 3).
+    """
+    if im.ndim != 3 or im.shape[2] != 3:
+        raise ValueError(f'Expecting RGB image: {im.shape}')
+    return im @ RGB_TO_YCBCR.T + CHROMA_OFFSET
+
+
+def ycbcr_to_rgb(im: np.ndarray) -> np.ndarray:
+    """
+    Inverse of :func:rgb_to_ycbcr.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The YCbCr image with shape (height, width, 3).
+
+    Returns
+    -------
+    np.ndarray : The RGB image with shape (height, width, 3).
+    """
+    if im.ndim != 3 or im.shape[2] != 3:
+        raise ValueError(f'Expecting YCbCr image: {im.shape}')
+    return (im - CHROMA_OFFSET) @ YCBCR_TO_RGB.T
+
+
+def downsample(plane: np.ndarray, factors: Tuple[int, int]) -> np.ndarray:
+    """
+    Downsample a plane by averaging.
+
+    Parameters
+    ----------
+    plane : np.ndarray
+        The (2D) plane.
+    factors : Tuple[int, int]
+        The vertical and horizontal downsample factors. The plane is padded by
+        repeating the last row (column) if its size is not a multiple.
+
+    Returns
+    -------
+    np.ndarray : The downsampled plane.
+    """
+    factor_ver, factor_hor = factors
+    plane = pad(plane, factors)
+    height, width = plane.shape
+    return plane.reshape(
+        height // factor_ver, factor_ver, width // factor_hor, factor_hor
+    ).mean(axis=(1, 3))
+
+
+def upsample(
+    plane: np.ndarray,
+    factors: Tuple[int, int],
+    shape: Tuple[int, int],
+) -> np.ndarray:
+    """
+    Upsample a plane by repeating, inverse of :func:downsample.
+
+    Parameters
+    ----------
+    plane : np.ndarray
+        The (2D) plane.
+    factors : Tuple[int, int]
+        The vertical and horizontal upsample factors.
+    shape : Tuple[int, int]
+        The shape of the upsampled plane, the remainder is cropped.
+
+    Returns
+    -------
+    np.ndarray : The upsampled plane.
+    """
+    factor_ver, factor_hor = factors
+    plane = np.repeat(np.repeat(plane, factor_ver, axis=0), factor_hor, axis=1)
+    return plane[:shape[0], :shape[1]]
+
+
+def pad(plane: np.ndarray, multiples: Tuple[int, int]) -> np.ndarray:
+    """
+    Pad a plane by repeating the last row and column.
+
+    Parameters
+    ----------
+    plane : np.ndarray
+        The (2D) plane.
+    multiples : Tuple[int, int]
+        The height and width of the padded plane are multiples of these.
+
+    Returns
+    -------
+    np.ndarray : The padded plane.
+    """
+    height, width = plane.shape
+    pad_height = -height % multiples[0]
+    pad_width = -width % multiples[1]
+    if pad_height == 0 and pad_width == 0:
+        return plane
+    return np.pad(plane, ((0, pad_height), (0, pad_width)), mode='edge')
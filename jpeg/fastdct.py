@@ -0,0 +1,390 @@
+"""
+Fast, factored 8-point discrete cosine transforms.
+
+The transforms are ported from the Independent JPEG Group's libjpeg and are
+vectorized over all blocks: every butterfly stage is one array operation on
+the blocks instead of a loop over the blocks.
+
+- `aan`: the floating point Arai, Agui and Nakajima (AAN) algorithm
+  (jfdctflt.c, jidctflt.c). The AAN output is scaled per coefficient, this
+  scale is removed in one multiplication. Its accuracy compared to the
+  reference (:func:jpeg.freq.dct_blocks) is limited by floating point
+  rounding only, the differences are in the order of 1e-12.
+- `int`: the fixed point Loeffler, Ligtenberg and Moschytz (LLM) algorithm
+  with 13 bits constants (jfdctint.c, jidctint.c) on int32 arrays. The
+  outputs are integers: the coefficients are rounded, as are the pixels
+  (before adding the level shift). The coefficients and pixels differ at
+  most one from the rounded reference. Like libjpeg, the input is expected
+  to be the coefficients (samples) of an 8-bit image, larger values might
+  overflow.
+"""
+import numpy as np
+
+
+DCT_SIZE = 8
+
+# AAN scale factors: cos(k * pi / 16) * sqrt(2), and 1 for k = 0.
+AAN_SCALE = np.array(
+    [1.] + [np.cos(k * np.pi / 16) * 2 ** .5 for k in range(1, DCT_SIZE)])
+# The AAN transform divided by the divisors is the transform, the transform
+# times the multipliers is the input of the inverse AAN transform. Fold these
+# into the quantization tables to save a pass over the coefficients.
+AAN_DIVISORS = DCT_SIZE * np.outer(AAN_SCALE, AAN_SCALE)
+AAN_MULTIPLIERS = np.outer(AAN_SCALE, AAN_SCALE) / DCT_SIZE
+
+# AAN butterfly constants
+SQRT_2 = 2 ** .5
+COS_1_PI_8 = np.cos(np.pi / 8)
+COS_2_PI_8 = np.cos(2 * np.pi / 8)
+COS_3_PI_8 = np.cos(3 * np.pi / 8)
+
+# Fixed point constants of the LLM algorithm: round(x * 2 ** CONST_BITS).
+CONST_BITS = 13
+PASS1_BITS = 2
+FIX_0_298631336 = 2446
+FIX_0_390180644 = 3196
+FIX_0_541196100 = 4433
+FIX_0_765366865 = 6270
+FIX_0_899976223 = 7373
+FIX_1_175875602 = 9633
+FIX_1_501321110 = 12299
+FIX_1_847759065 = 15137
+FIX_1_961570560 = 16069
+FIX_2_053119869 = 16819
+FIX_2_562915447 = 20995
+FIX_3_072711026 = 25172
+
+
+def _check_blocks(blocks: np.ndarray) -> None:
+    """Raise a ValueError if the blocks are not 8 by 8."""
+    if blocks.shape[-2:] != (DCT_SIZE, DCT_SIZE):
+        raise ValueError(
+            f'Fast transforms expect {DCT_SIZE} by {DCT_SIZE} blocks: '
+            f'{blocks.shape}'
+        )
+
+
+def _descale(x: np.ndarray, n_bits: int) -> np.ndarray:
+    """Divide by 2 ** n_bits, rounding half up."""
+    return (x + (1 << (n_bits - 1))) >> n_bits
+
+
+def _aan_dct_1d(x: np.ndarray) -> np.ndarray:
+    """The (scaled) AAN DCT along the last axis."""
+    tmp0 = x[..., 0] + x[..., 7]
+    tmp7 = x[..., 0] - x[..., 7]
+    tmp1 = x[..., 1] + x[..., 6]
+    tmp6 = x[..., 1] - x[..., 6]
+    tmp2 = x[..., 2] + x[..., 5]
+    tmp5 = x[..., 2] - x[..., 5]
+    tmp3 = x[..., 3] + x[..., 4]
+    tmp4 = x[..., 3] - x[..., 4]
+
+    # Even part
+    tmp10 = tmp0 + tmp3
+    tmp13 = tmp0 - tmp3
+    tmp11 = tmp1 + tmp2
+    tmp12 = tmp1 - tmp2
+
+    out0 = tmp10 + tmp11
+    out4 = tmp10 - tmp11
+    z1 = (tmp12 + tmp13) * COS_2_PI_8
+    out2 = tmp13 + z1
+    out6 = tmp13 - z1
+
+    # Odd part
+    tmp10 = tmp4 + tmp5
+    tmp11 = tmp5 + tmp6
+    tmp12 = tmp6 + tmp7
+
+    z5 = (tmp10 - tmp12) * COS_3_PI_8
+    z2 = SQRT_2 * COS_3_PI_8 * tmp10 + z5
+    z4 = SQRT_2 * COS_1_PI_8 * tmp12 + z5
+    z3 = tmp11 * COS_2_PI_8
+
+    z11 = tmp7 + z3
+    z13 = tmp7 - z3
+
+    out5 = z13 + z2
+    out3 = z13 - z2
+    out1 = z11 + z4
+    out7 = z11 - z4
+
+    return np.stack([out0, out1, out2, out3, out4, out5, out6, out7], axis=-1)
+
+
+def _aan_idct_1d(x: np.ndarray) -> np.ndarray:
+    """The AAN IDCT of (scaled) coefficients along the last axis."""
+    # Even part
+    tmp10 = x[..., 0] + x[..., 4]
+    tmp11 = x[..., 0] - x[..., 4]
+    tmp13 = x[..., 2] + x[..., 6]
+    tmp12 = (x[..., 2] - x[..., 6]) * SQRT_2 - tmp13
+
+    tmp0 = tmp10 + tmp13
+    tmp3 = tmp10 - tmp13
+    tmp1 = tmp11 + tmp12
+    tmp2 = tmp11 - tmp12
+
+    # Odd part
+    z13 = x[..., 5] + x[..., 3]
+    z10 = x[..., 5] - x[..., 3]
+    z11 = x[..., 1] + x[..., 7]
+    z12 = x[..., 1] - x[..., 7]
+
+    tmp7 = z11 + z13
+    tmp11 = (z11 - z13) * SQRT_2
+
+    z5 = (z10 + z12) * 2 * COS_1_PI_8
+    tmp10 = 2 * (COS_1_PI_8 - COS_3_PI_8) * z12 - z5
+    tmp12 = -2 * (COS_1_PI_8 + COS_3_PI_8) * z10 + z5
+
+    tmp6 = tmp12 - tmp7
+    tmp5 = tmp11 - tmp6
+    tmp4 = tmp10 + tmp5
+
+    return np.stack([
+        tmp0 + tmp7,
+        tmp1 + tmp6,
+        tmp2 + tmp5,
+        tmp3 - tmp4,
+        tmp3 + tmp4,
+        tmp2 - tmp5,
+        tmp1 - tmp6,
+        tmp0 - tmp7,
+    ], axis=-1)
+
+
+def aan_scaled_dct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The scaled AAN transform of 8 by 8 blocks, see :data:AAN_DIVISORS.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The blocks, the last two axes are a patch.
+
+    Returns
+    -------
+    np.ndarray : The transformed blocks times the divisors.
+    """
+    _check_blocks(blocks)
+    rows = _aan_dct_1d(np.asarray(blocks, dtype=float))
+    return _aan_dct_1d(rows.swapaxes(-1, -2)).swapaxes(-1, -2)
+
+
+def aan_scaled_idct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The inverse of :func:aan_scaled_dct_blocks, see :data:AAN_MULTIPLIERS.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The transformed blocks times the multipliers, the last two axes are a
+        patch.
+
+    Returns
+    -------
+    np.ndarray : The blocks transformed back.
+    """
+    _check_blocks(blocks)
+    columns = _aan_idct_1d(blocks.swapaxes(-1, -2)).swapaxes(-1, -2)
+    return _aan_idct_1d(columns)
+
+
+def aan_dct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The discrete cosine transform of 8 by 8 blocks with the AAN algorithm.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The blocks, the last two axes are a patch.
+
+    Returns
+    -------
+    np.ndarray : The transformed blocks.
+    """
+    return aan_scaled_dct_blocks(blocks) / AAN_DIVISORS
+
+
+def aan_idct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The inverse of :func:aan_dct_blocks.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The transformed blocks, the last two axes are a patch.
+
+    Returns
+    -------
+    np.ndarray : The blocks transformed back.
+    """
+    _check_blocks(blocks)
+    return aan_scaled_idct_blocks(blocks * AAN_MULTIPLIERS)
+
+
+def _int_dct_1d(x: np.ndarray, first_pass: bool) -> np.ndarray:
+    """
+    The LLM DCT along the last axis.
+
+    The first pass scales the outputs up by 2 ** PASS1_BITS, the second pass
+    removes this scale and the factor 8 of the two passes.
+    """
+    odd_bits = CONST_BITS - PASS1_BITS if first_pass else (
+        CONST_BITS + PASS1_BITS + 3)
+
+    tmp0 = x[..., 0] + x[..., 7]
+    tmp7 = x[..., 0] - x[..., 7]
+    tmp1 = x[..., 1] + x[..., 6]
+    tmp6 = x[..., 1] - x[..., 6]
+    tmp2 = x[..., 2] + x[..., 5]
+    tmp5 = x[..., 2] - x[..., 5]
+    tmp3 = x[..., 3] + x[..., 4]
+    tmp4 = x[..., 3] - x[..., 4]
+
+    # Even part
+    tmp10 = tmp0 + tmp3
+    tmp13 = tmp0 - tmp3
+    tmp11 = tmp1 + tmp2
+    tmp12 = tmp1 - tmp2
+
+    if first_pass:
+        out0 = (tmp10 + tmp11) << PASS1_BITS
+        out4 = (tmp10 - tmp11) << PASS1_BITS
+    else:
+        out0 = _descale(tmp10 + tmp11, PASS1_BITS + 3)
+        out4 = _descale(tmp10 - tmp11, PASS1_BITS + 3)
+
+    z1 = (tmp12 + tmp13) * FIX_0_541196100
+    out2 = _descale(z1 + tmp13 * FIX_0_765366865, odd_bits)
+    out6 = _descale(z1 - tmp12 * FIX_1_847759065, odd_bits)
+
+    # Odd part
+    z1 = tmp4 + tmp7
+    z2 = tmp5 + tmp6
+    z3 = tmp4 + tmp6
+    z4 = tmp5 + tmp7
+    z5 = (z3 + z4) * FIX_1_175875602
+
+    tmp4 = tmp4 * FIX_0_298631336
+    tmp5 = tmp5 * FIX_2_053119869
+    tmp6 = tmp6 * FIX_3_072711026
+    tmp7 = tmp7 * FIX_1_501321110
+    z1 = z1 * -FIX_0_899976223
+    z2 = z2 * -FIX_2_562915447
+    z3 = z3 * -FIX_1_961570560 + z5
+    z4 = z4 * -FIX_0_390180644 + z5
+
+    out7 = _descale(tmp4 + z1 + z3, odd_bits)
+    out5 = _descale(tmp5 + z2 + z4, odd_bits)
+    out3 = _descale(tmp6 + z2 + z3, odd_bits)
+    out1 = _descale(tmp7 + z1 + z4, odd_bits)
+
+    return np.stack([out0, out1, out2, out3, out4, out5, out6, out7], axis=-1)
+
+
+def _int_idct_1d(x: np.ndarray, first_pass: bool) -> np.ndarray:
+    """
+    The LLM IDCT along the last axis.
+
+    The first pass scales the outputs up by 2 ** PASS1_BITS, the second pass
+    removes this scale and the factor 8 of the two passes.
+    """
+    n_bits = CONST_BITS - PASS1_BITS if first_pass else (
+        CONST_BITS + PASS1_BITS + 3)
+
+    # Even part
+    z2 = x[..., 2]
+    z3 = x[..., 6]
+    z1 = (z2 + z3) * FIX_0_541196100
+    tmp2 = z1 - z3 * FIX_1_847759065
+    tmp3 = z1 + z2 * FIX_0_765366865
+
+    tmp0 = (x[..., 0] + x[..., 4]) << CONST_BITS
+    tmp1 = (x[..., 0] - x[..., 4]) << CONST_BITS
+
+    tmp10 = tmp0 + tmp3
+    tmp13 = tmp0 - tmp3
+    tmp11 = tmp1 + tmp2
+    tmp12 = tmp1 - tmp2
+
+    # Odd part
+    tmp0 = x[..., 7]
+    tmp1 = x[..., 5]
+    tmp2 = x[..., 3]
+    tmp3 = x[..., 1]
+
+    z1 = tmp0 + tmp3
+    z2 = tmp1 + tmp2
+    z3 = tmp0 + tmp2
+    z4 = tmp1 + tmp3
+    z5 = (z3 + z4) * FIX_1_175875602
+
+    tmp0 = tmp0 * FIX_0_298631336
+    tmp1 = tmp1 * FIX_2_053119869
+    tmp2 = tmp2 * FIX_3_072711026
+    tmp3 = tmp3 * FIX_1_501321110
+    z1 = z1 * -FIX_0_899976223
+    z2 = z2 * -FIX_2_562915447
+    z3 = z3 * -FIX_1_961570560 + z5
+    z4 = z4 * -FIX_0_390180644 + z5
+
+    tmp0 += z1 + z3
+    tmp1 += z2 + z4
+    tmp2 += z2 + z3
+    tmp3 += z1 + z4
+
+    return np.stack([
+        _descale(tmp10 + tmp3, n_bits),
+        _descale(tmp11 + tmp2, n_bits),
+        _descale(tmp12 + tmp1, n_bits),
+        _descale(tmp13 + tmp0, n_bits),
+        _descale(tmp13 - tmp0, n_bits),
+        _descale(tmp12 - tmp1, n_bits),
+        _descale(tmp11 - tmp2, n_bits),
+        _descale(tmp10 - tmp3, n_bits),
+    ], axis=-1)
+
+
+def int_dct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The discrete cosine transform of 8 by 8 blocks in fixed point.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The (level shifted) blocks, the last two axes are a patch. The values
+        are rounded to integers.
+
+    Returns
+    -------
+    np.ndarray : The transformed blocks, rounded to int32.
+    """
+    _check_blocks(blocks)
+    blocks = np.rint(blocks).astype(np.int32)
+    rows = _int_dct_1d(blocks, first_pass=True)
+    return _int_dct_1d(
+        rows.swapaxes(-1, -2), first_pass=False).swapaxes(-1, -2)
+
+
+def int_idct_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    The inverse of :func:int_dct_blocks.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The transformed blocks, the last two axes are a patch. The values are
+        rounded to integers.
+
+    Returns
+    -------
+    np.ndarray : The blocks transformed back, rounded to int32.
+    """
+    _check_blocks(blocks)
+    blocks = np.rint(blocks).astype(np.int32)
+    columns = _int_idct_1d(
+        blocks.swapaxes(-1, -2), first_pass=True).swapaxes(-1, -2)
+    return _int_idct_1d(columns, first_pass=False)
@@ -1,17 +1,51 @@
+import math
+import threading
+from collections import OrderedDict
 from typing import (
     Callable,
+    Dict,
     List,
+    Optional,
     Tuple,
     Union,
 )
 
 import numpy as np
 
-from .utils import generate_patches
+from .fastdct import (
+    AAN_DIVISORS,
+    AAN_MULTIPLIERS,
+    aan_dct_blocks,
+    aan_idct_blocks,
+    aan_scaled_dct_blocks,
+    aan_scaled_idct_blocks,
+    int_dct_blocks,
+    int_idct_blocks,
+)
+from .utils import (
+    blocks_to_image,
+    generate_patches,
+    image_to_blocks,
+    izigzag_blocks,
+    zigzag_blocks,
+    zigzag_indices,
+)
 
 
 ONE_OVER_SQRT_TWO = 2 ** (-0.5)
 
+# The block transform implementations, see :mod:jpeg.fastdct.
+TRANSFORM_BACKENDS = ('matrix', 'aan', 'int')
+
+# The number of bases with quantization folded in to keep: the least
+# recently used one is evicted, so that many quantization matrices (e.g.
+# qualities) do not grow the cache without bound.
+MAX_QUANTIZED_BASES = 64
+
+_BASIS_CACHE: Dict[Tuple, np.ndarray] = {}
+_QUANTIZED_BASIS_CACHE: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+_BASIS_CACHE_LOCK = threading.Lock()
+
 
 def discrete_cosine(freq: int, *, patch_size: int = 8) -> float:
     """
@@ -47,9 +81,36 @@ def normalization_constant(value: int) -> float:
     return ONE_OVER_SQRT_TWO if value == 0 else 1.
 
 
+def dct_matrix(*, patch_size: int = 8) -> np.ndarray:
+    """
+    The (one dimensional) discrete cosine transform matrix.
+
+    The discrete cosine filters are separable: filter (u, v) is the outer
+    product of row u and row v of this matrix. Hence, the transform of a patch
+    is `D @ patch @ D.T` and the inverse transform is `D.T @ patch @ D`.
+
+    Parameters
+    ----------
+    patch_size : int, optional (default : 8)
+        The patch size.
+
+    Returns
+    -------
+    np.ndarray : The discrete cosine transform matrix.
+    """
+    c = np.array([normalization_constant(freq) for freq in range(patch_size)])
+    cosines = np.vstack([
+        discrete_cosine(freq, patch_size=patch_size)
+        for freq in range(patch_size)
+    ])
+    return (2 / patch_size) ** .5 * c.reshape((-1, 1)) * cosines
+
+
 def discrete_cosine_filter(
     freq_ver: int,
-    freq_hor: int
+    freq_hor: int,
+    *,
+    patch_size: int = 8
 ) -> np.ndarray:
     """
     Create a discrete cosine filter.
@@ -60,15 +121,17 @@ def discrete_cosine_filter(
         The vertical frequency.
     freq_hor : int
         The horizontal frequency.
+    patch_size : int, optional (default : 8)
+        The patch size.
 
     Returns
     -------
     np.ndarray : The discrete cosine filter.
     """
-    dc_ver = discrete_cosine(freq_ver).reshape((-1, 1))
-    dc_hor = discrete_cosine(freq_hor).reshape((1, -1))
+    dc_ver = discrete_cosine(freq_ver, patch_size=patch_size).reshape((-1, 1))
+    dc_hor = discrete_cosine(freq_hor, patch_size=patch_size).reshape((1, -1))
     c = normalization_constant(freq_ver) * normalization_constant(freq_hor)
-    return .25 * c * (dc_ver @ dc_hor)
+    return 2 / patch_size * c * (dc_ver @ dc_hor)
 
 
 def inverse_discrete_cosine(pix: int, *, patch_size: int = 8) -> float:
@@ -89,7 +152,12 @@ def inverse_discrete_cosine(pix: int, *, patch_size: int = 8) -> float:
     return np.cos(np.arange(patch_size) * (pix + .5) * np.pi / patch_size)
 
 
-def inverse_discrete_cosine_filter(pix_ver: int, pix_hor: int) -> np.ndarray:
+def inverse_discrete_cosine_filter(
+    pix_ver: int,
+    pix_hor: int,
+    *,
+    patch_size: int = 8
+) -> np.ndarray:
     """
     The inverse discrete cosine filter.
 
@@ -99,18 +167,397 @@ def inverse_discrete_cosine_filter(pix_ver: int, pix_hor: int) -> np.ndarray:
         The horizontal discrete cosine filters.
     pix_hor : int
         The vertical discrete cosine filters.
+    patch_size : int, optional (default : 8)
+        The patch size.
 
     Returns
     -------
     np.ndarray : The inverse discrete cosine filters.
     """
-    idc_ver = inverse_discrete_cosine(pix_ver).reshape((-1, 1))
-    idc_hor = inverse_discrete_cosine(pix_hor).reshape((1, -1))
+    idc_ver = inverse_discrete_cosine(
+        pix_ver, patch_size=patch_size).reshape((-1, 1))
+    idc_hor = inverse_discrete_cosine(
+        pix_hor, patch_size=patch_size).reshape((1, -1))
     c_ver = np.array(
-        [normalization_constant(p) for p in range(8)]).reshape((-1, 1))
+        [normalization_constant(p) for p in range(patch_size)]
+    ).reshape((-1, 1))
     c_hor = c_ver.copy().reshape((1, -1))
     c = c_ver @ c_hor
-    return .25 * c * (idc_ver @ idc_hor)
+    return 2 / patch_size * c * (idc_ver @ idc_hor)
+
+
+def _cached_basis(
+    kind: str,
+    patch_size: int,
+    dtype: np.dtype,
+    build: Callable[[], np.ndarray],
+    quantization: Optional[Tuple[float, ...]] = None,
+) -> np.ndarray:
+    """
+    Get a basis from the cache, build it when it is not cached yet.
+
+    The lock is not held while building, two threads might build the same
+    basis, but only the first one is stored (and returned to both). Bases
+    with quantization folded in are cached per quantization matrix, up to
+    :data:MAX_QUANTIZED_BASES of them.
+    """
+    key = (kind, patch_size, np.dtype(dtype))
+    cache = _BASIS_CACHE
+    if quantization is not None:
+        key += (quantization,)
+        cache = _QUANTIZED_BASIS_CACHE
+    with _BASIS_CACHE_LOCK:
+        basis = cache.get(key)
+        if basis is not None and quantization is not None:
+            cache.move_to_end(key)
+    if basis is not None:
+        return basis
+
+    basis = np.array(build(), dtype=key[2])
+    basis.setflags(write=False)
+    with _BASIS_CACHE_LOCK:
+        basis = cache.setdefault(key, basis)
+        if len(cache) > MAX_QUANTIZED_BASES and quantization is not None:
+            cache.popitem(last=False)
+        return basis
+
+
+def dct_basis(
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) discrete cosine transform matrix.
+
+    Parameters
+    ----------
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the matrix.
+
+    Returns
+    -------
+    np.ndarray : The discrete cosine transform matrix, see :func:dct_matrix.
+    """
+    return _cached_basis(
+        'dct', patch_size, dtype, lambda: dct_matrix(patch_size=patch_size))
+
+
+def dct_filter_bank(
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) discrete cosine filters.
+
+    Parameters
+    ----------
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the filters.
+
+    Returns
+    -------
+    np.ndarray : The filters with shape (patch_size ** 2, patch_size,
+    patch_size), ordered as expected by :func:transform.
+    """
+    return _cached_basis(
+        'dct_filters',
+        patch_size,
+        dtype,
+        lambda: [
+            discrete_cosine_filter(x, y, patch_size=patch_size)
+            for x in range(patch_size)
+            for y in range(patch_size)
+        ]
+    )
+
+
+def idct_filter_bank(
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) inverse discrete cosine filters.
+
+    Parameters
+    ----------
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the filters.
+
+    Returns
+    -------
+    np.ndarray : The filters with shape (patch_size ** 2, patch_size,
+    patch_size), ordered as expected by :func:transform.
+    """
+    return _cached_basis(
+        'idct_filters',
+        patch_size,
+        dtype,
+        lambda: [
+            inverse_discrete_cosine_filter(u, v, patch_size=patch_size)
+            for u in range(patch_size)
+            for v in range(patch_size)
+        ]
+    )
+
+
+def _quantization_key(
+    Q: Union[float, np.ndarray],
+    patch_size: int,
+) -> Tuple[float, ...]:
+    """The quantization matrix (or number) as a flat tuple, a cache key."""
+    Q = np.asarray(Q, dtype=float)
+    try:
+        table = np.broadcast_to(Q, (patch_size, patch_size))
+    except ValueError:
+        raise ValueError(
+            f'Expecting a number or a {patch_size} by {patch_size} '
+            f'quantization matrix: {Q.shape}'
+        ) from None
+    if not (table > 0).all():
+        raise ValueError('Quantization values should be positive.')
+    return tuple(table.ravel().tolist())
+
+
+def _zigzag_transform(patch_size: int) -> np.ndarray:
+    """
+    The transform of flattened patches, with the coefficients (rows) in
+    zigzag order.
+    """
+    matrix = dct_matrix(patch_size=patch_size)
+    return np.kron(matrix, matrix)[zigzag_indices(patch_size)]
+
+
+def quantized_dct_basis(
+    Q: Union[float, np.ndarray],
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) discrete cosine transform including quantization.
+
+    The zigzag ordered, quantized coefficients of flattened patches are
+    `patches @ basis`: the transform, the zigzag order and the division by
+    the quantization matrix are one matrix product.
+
+    Parameters
+    ----------
+    Q : Union[float, np.ndarray]
+        The quantization matrix or number.
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the basis.
+
+    Returns
+    -------
+    np.ndarray : The basis with shape (patch_size ** 2, patch_size ** 2).
+    """
+    quantization = _quantization_key(Q, patch_size)
+    order = zigzag_indices(patch_size)
+
+    def build():
+        divisors = np.array(quantization)[order].reshape((-1, 1))
+        return (_zigzag_transform(patch_size) / divisors).T
+
+    return _cached_basis(
+        'quantized_dct', patch_size, dtype, build, quantization)
+
+
+def dequantized_idct_basis(
+    Q: Union[float, np.ndarray],
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) inverse of :func:quantized_dct_basis.
+
+    The flattened patches are `coefficients @ basis`: the multiplication by
+    the quantization matrix, the inverse zigzag order and the inverse
+    transform are one matrix product.
+
+    Parameters
+    ----------
+    Q : Union[float, np.ndarray]
+        The quantization matrix or number.
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the basis.
+
+    Returns
+    -------
+    np.ndarray : The basis with shape (patch_size ** 2, patch_size ** 2).
+    """
+    quantization = _quantization_key(Q, patch_size)
+    order = zigzag_indices(patch_size)
+
+    def build():
+        multipliers = np.array(quantization)[order].reshape((-1, 1))
+        return _zigzag_transform(patch_size) * multipliers
+
+    return _cached_basis(
+        'dequantized_idct', patch_size, dtype, build, quantization)
+
+
+def scaled_size(scale: float, patch_size: int = 8) -> int:
+    """
+    The patch size of a reduced inverse transform.
+
+    Parameters
+    ----------
+    scale : float
+        The scale, k / patch_size for k in [1, patch_size], e.g. 1/2, 1/4 or
+        1/8.
+    patch_size : int, optional (default : 8)
+        The patch size.
+
+    Returns
+    -------
+    int : The size of the reduced patches.
+    """
+    size = scale * patch_size
+    if not 1 <= size <= patch_size or size != int(size):
+        raise ValueError(
+            f'Expecting a scale of k / {patch_size} with k in [1, '
+            f'{patch_size}]: {scale}'
+        )
+    return int(size)
+
+
+def scaled_coefficients(scale: float, patch_size: int = 8) -> int:
+    """
+    The number of zigzag ordered coefficients used by a reduced inverse
+    transform, see :func:scaled_idct_basis.
+
+    Parameters
+    ----------
+    scale : float
+        The scale, see :func:scaled_size.
+    patch_size : int, optional (default : 8)
+        The patch size.
+
+    Returns
+    -------
+    int : The number of coefficients, up to the last one used.
+    """
+    size = scaled_size(scale, patch_size)
+    rows, cols = np.divmod(zigzag_indices(patch_size), patch_size)
+    return int(np.flatnonzero((rows < size) & (cols < size)).max()) + 1
+
+
+def scaled_idct_basis(
+    Q: Union[float, np.ndarray],
+    scale: float,
+    patch_size: int = 8,
+    *,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    The cached (read-only) reduced inverse transform including
+    dequantization.
+
+    Only the lowest `scale * patch_size` frequencies of both axes are
+    transformed, with an inverse transform of that size: the patch at a
+    lower resolution, every pixel the mean of the pixels it replaces (like
+    the DC coefficient at scale 1 / patch_size). The flattened reduced
+    patches are `coefficients[..., :len(basis)] @ basis`.
+
+    Parameters
+    ----------
+    Q : Union[float, np.ndarray]
+        The quantization matrix or number.
+    scale : float
+        The scale, see :func:scaled_size.
+    patch_size : int, optional (default : 8)
+        The patch size.
+    dtype : np.dtype, optional (default : np.float64)
+        The data type of the basis.
+
+    Returns
+    -------
+    np.ndarray : The basis with shape (n_coefficients, size ** 2), see
+    :func:scaled_coefficients.
+    """
+    size = scaled_size(scale, patch_size)
+    n_coefficients = scaled_coefficients(scale, patch_size)
+    quantization = _quantization_key(Q, patch_size)
+
+    def build():
+        order = zigzag_indices(patch_size)[:n_coefficients]
+        rows, cols = np.divmod(order, patch_size)
+        used = (rows < size) & (cols < size)
+        matrix = dct_matrix(patch_size=size)
+        transform = np.kron(matrix, matrix)
+        basis = np.zeros((n_coefficients, size ** 2))
+        basis[used] = transform[rows[used] * size + cols[used]] * (
+            np.array(quantization)[order[used]].reshape((-1, 1)))
+        # The orthonormal transforms differ in scale by the patch sizes.
+        return basis * size / patch_size
+
+    return _cached_basis(
+        f'scaled_idct_{size}', patch_size, dtype, build, quantization)
+
+
+def _aan_quantization(
+    Q: Union[float, np.ndarray],
+    inverse: bool,
+) -> np.ndarray:
+    """
+    The zigzag ordered factors quantizing the scaled AAN coefficients, or
+    dequantizing them when `inverse`: the AAN scale is folded into the
+    quantization matrix.
+    """
+    quantization = _quantization_key(Q, 8)
+    table = np.array(quantization).reshape(8, 8)
+    if inverse:
+        return _cached_basis(
+            'aan_dequantization',
+            8,
+            np.float64,
+            lambda: zigzag_blocks(table * AAN_MULTIPLIERS),
+            quantization,
+        )
+    return _cached_basis(
+        'aan_quantization',
+        8,
+        np.float64,
+        lambda: 1 / zigzag_blocks(table * AAN_DIVISORS),
+        quantization,
+    )
+
+
+def basis_cache_info() -> List[Tuple]:
+    """
+    The keys of the cached bases.
+
+    Returns
+    -------
+    List[Tuple] : The kind, patch size and data type of every cached basis,
+    followed by the quantization matrix for bases including quantization.
+    """
+    with _BASIS_CACHE_LOCK:
+        return sorted(
+            list(_BASIS_CACHE) + list(_QUANTIZED_BASIS_CACHE), key=str)
+
+
+def clear_basis_cache() -> None:
+    """
+    Remove all cached bases.
+    """
+    with _BASIS_CACHE_LOCK:
+        _BASIS_CACHE.clear()
+        _QUANTIZED_BASIS_CACHE.clear()
 
 
 def apply_filter(
@@ -197,7 +644,78 @@ def transform(
     ])
 
 
-def dct(im: np.ndarray) -> np.ndarray:
+def _basis_dtype(blocks: np.ndarray) -> np.dtype:
+    """The basis data type: floating point blocks keep their precision."""
+    if np.issubdtype(blocks.dtype, np.floating):
+        return blocks.dtype
+    return np.dtype(np.float64)
+
+
+def _check_backend(backend: str) -> None:
+    """Raise a ValueError for an unknown transform backend."""
+    if backend not in TRANSFORM_BACKENDS:
+        raise ValueError(
+            f'Transform backend should be one of {TRANSFORM_BACKENDS}: '
+            f'{backend}'
+        )
+
+
+def dct_blocks(blocks: np.ndarray, *, backend: str = 'matrix') -> np.ndarray:
+    """
+    Apply the discrete cosine transform to all blocks at once.
+
+    This gives the same result as :func:transform with the discrete cosine
+    filters, but uses the separable basis on the whole block tensor instead of
+    a filter per coefficient per patch.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The blocks, the last two axes are a patch. See
+        :func:jpeg.utils.image_to_blocks.
+    backend : str, optional (default : 'matrix')
+        The transform implementation: 'matrix' for matrix products with the
+        basis, 'aan' or 'int' for the fast 8 by 8 transforms, see
+        :mod:jpeg.fastdct for their accuracy.
+
+    Returns
+    -------
+    np.ndarray : The transformed blocks.
+    """
+    _check_backend(backend)
+    if backend == 'aan':
+        return aan_dct_blocks(blocks)
+    if backend == 'int':
+        return int_dct_blocks(blocks)
+    matrix = dct_basis(blocks.shape[-1], dtype=_basis_dtype(blocks))
+    return matrix @ blocks @ matrix.T
+
+
+def idct_blocks(blocks: np.ndarray, *, backend: str = 'matrix') -> np.ndarray:
+    """
+    Inverse of :func:dct_blocks.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The transformed blocks, the last two axes are a patch.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:dct_blocks.
+
+    Returns
+    -------
+    np.ndarray : The blocks transformed back.
+    """
+    _check_backend(backend)
+    if backend == 'aan':
+        return aan_idct_blocks(blocks)
+    if backend == 'int':
+        return int_idct_blocks(blocks)
+    matrix = dct_basis(blocks.shape[-1], dtype=_basis_dtype(blocks))
+    return matrix.T @ blocks @ matrix
+
+
+def dct(im: np.ndarray, *, backend: str = 'matrix') -> np.ndarray:
     """
     Get the discrete cosine transform of an image.
 
@@ -205,21 +723,19 @@ def dct(im: np.ndarray) -> np.ndarray:
     ----------
     im : np.ndarray
         The image (to be transformed).
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:dct_blocks.
 
     Returns
     -------
     np.ndarray : The image transformed using the discrete cosine transform
     filters.
     """
-    dc_filters = [
-        discrete_cosine_filter(x, y)
-        for x in range(8)
-        for y in range(8)
-    ]
-    return transform(im - 128, dc_filters)
+    return blocks_to_image(
+        dct_blocks(image_to_blocks(im - 128.), backend=backend))
 
 
-def idct(im_dct: np.ndarray) -> np.ndarray:
+def idct(im_dct: np.ndarray, *, backend: str = 'matrix') -> np.ndarray:
     """
     The inverse discrete cosine of an image.
 
@@ -227,15 +743,108 @@ def idct(im_dct: np.ndarray) -> np.ndarray:
     ----------
     im_dct : np.ndarray
         The discrete cosine transformed image.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:dct_blocks.
 
     Returns
     -------
     np.ndarray : The image transformed back.
     """
-    idc_filters = [
-        inverse_discrete_cosine_filter(u, v)
-        for u in range(8)
-        for v in range(8)
-    ]
+    return blocks_to_image(
+        idct_blocks(image_to_blocks(im_dct), backend=backend)) + 128
+
+
+def quantize_blocks(
+    blocks: np.ndarray,
+    Q: Union[float, np.ndarray],
+    *,
+    backend: str = 'matrix'
+) -> np.ndarray:
+    """
+    The quantized, zigzag ordered coefficients of all blocks.
+
+    The coefficients are `(zigzag(dct_blocks(blocks)) / Q).astype(int)`, but
+    the quantization is folded into the transform: into the basis, see
+    :func:quantized_dct_basis, or into the AAN scale factors.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The (level shifted) blocks, the last two axes are a patch.
+    Q : Union[float, np.ndarray]
+        The quantization matrix or number.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:dct_blocks.
 
-    return transform(im_dct, idc_filters) + 128
+    Returns
+    -------
+    np.ndarray : The quantized coefficients, the last two axes are replaced
+    by one axis.
+    """
+    _check_backend(backend)
+    patch_size = blocks.shape[-1]
+    if backend == 'aan':
+        coefficients = zigzag_blocks(aan_scaled_dct_blocks(blocks))
+        return (coefficients * _aan_quantization(Q, False)).astype(int)
+    if backend == 'int':
+        divisors = np.array(_quantization_key(Q, patch_size))
+        coefficients = zigzag_blocks(int_dct_blocks(blocks))
+        return (coefficients / divisors[zigzag_indices(patch_size)]).astype(
+            int)
+    basis = quantized_dct_basis(Q, patch_size, dtype=_basis_dtype(blocks))
+    vectors = blocks.reshape(blocks.shape[:-2] + (patch_size ** 2,))
+    return (vectors @ basis).astype(int)
+
+
+def dequantize_blocks(
+    coefficients: np.ndarray,
+    Q: Union[float, np.ndarray],
+    *,
+    backend: str = 'matrix',
+    scale: float = 1
+) -> np.ndarray:
+    """
+    Inverse of :func:quantize_blocks.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        The quantized, zigzag ordered coefficients, the last axis is a block.
+        At a reduced scale, the first coefficients are enough, see
+        :func:scaled_coefficients.
+    Q : Union[float, np.ndarray]
+        The quantization matrix or number.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:dct_blocks. The reduced
+        transforms are matrix products for all backends.
+    scale : float, optional (default : 1)
+        The scale of the blocks, e.g. 1/2, 1/4 or 1/8 for 4 by 4, 2 by 2 or 1
+        by 1 blocks, see :func:scaled_idct_basis.
+
+    Returns
+    -------
+    np.ndarray : The (level shifted) blocks, the last axis is replaced by
+    two axes.
+    """
+    _check_backend(backend)
+    if scale != 1:
+        # The blocks are 8 by 8, the coefficients might be truncated.
+        basis = scaled_idct_basis(Q, scale, dtype=_basis_dtype(coefficients))
+        size = scaled_size(scale)
+        return (coefficients[..., :len(basis)] @ basis).reshape(
+            coefficients.shape[:-1] + (size, size))
+    patch_size = int(round(math.sqrt(coefficients.shape[-1])))
+    if patch_size ** 2 != coefficients.shape[-1]:
+        raise ValueError(
+            f'Block length should be a square: {coefficients.shape[-1]}')
+    if backend == 'aan':
+        return aan_scaled_idct_blocks(
+            izigzag_blocks(coefficients * _aan_quantization(Q, True)))
+    if backend == 'int':
+        multipliers = np.array(_quantization_key(Q, patch_size))
+        return int_idct_blocks(izigzag_blocks(
+            coefficients * multipliers[zigzag_indices(patch_size)]))
+    basis = dequantized_idct_basis(
+        Q, patch_size, dtype=_basis_dtype(coefficients))
+    return (coefficients @ basis).reshape(
+        coefficients.shape[:-1] + (patch_size, patch_size))
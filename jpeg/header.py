@@ -0,0 +1,341 @@
+from typing import (
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .bitstream import (
+    BitReader,
+    BitWriter,
+)
+from .huffman import (
+    FIXED_DC_TABLE,
+    FIXED_TABLE,
+    HuffmanTable,
+)
+
+
+PATCH_SIZE = 8
+
+# Header flags
+FLAG_OPTIMIZED_TABLE = 0b1
+FLAG_RESTART_INTERVAL = 0b10
+FLAG_INDEX = 0b100
+FLAG_COLOR = 0b1000
+FLAG_QUANTIZATION = 0b10000
+FLAG_PROGRESSIVE = 0b100000
+FLAG_DC_PREDICTION = 0b1000000
+FLAG_OPTIMIZED_DC_TABLE = 0b10000000
+
+# The number of bytes of the smallest header: the height, width and flags.
+MIN_HEADER_SIZE = 9
+
+# The (exclusive) ends of the bands of a progressive image: the DC
+# coefficient, the low and the high frequency AC coefficients (zigzag order).
+PROGRESSIVE_BANDS = (1, 6, PATCH_SIZE ** 2)
+
+# The number of components of a color image: Y, Cb and Cr.
+N_COLOR_COMPONENTS = 3
+
+
+class Header(NamedTuple):
+    """
+    The header of a compressed image.
+
+    The header is followed by the segments: the encoded blocks of
+    `restart_interval` block rows, every segment starts at a whole byte. The
+    header of a color image is followed by its components instead.
+
+    A progressive image is one segment split into scans: the coefficients of
+    a band - a range of the zigzag order - of all blocks. The scans are
+    ordered from low to high frequencies and every scan starts at a whole
+    byte. A scan has no end of band for the blocks ending with a non-zero
+    value, the other blocks share one symbol per run of blocks ending with
+    zeros. The components of a progressive color image are interleaved by
+    scan: the first scan of every component, preceded by its header, then the
+    second scan of every component and so on.
+
+    Parameters
+    ----------
+    height : int
+        The image height.
+    width : int
+        The image width.
+    table : HuffmanTable, optional (default : FIXED_TABLE)
+        The Huffman table.
+    dc_table : Optional[HuffmanTable], optional (default : None)
+        The Huffman table of the DC differences, if the DC coefficients are
+        encoded as the difference with the previous block (DPCM), see
+        :func:jpeg.huffman.write_blocks. The prediction is reset to 0 at the
+        start of every segment and scan.
+    restart_interval : Optional[int], optional (default : None)
+        The number of block rows per segment, if None the image is one
+        segment.
+    offsets : Optional[Tuple[int, ...]], optional (default : None)
+        The index: the byte offset of every segment relative to the end of
+        the header.
+    subsampling : Optional[Tuple[int, int]], optional (default : None)
+        The vertical and horizontal chroma subsampling of a color image.
+    components : Optional[Tuple[int, ...]], optional (default : None)
+        The number of bytes of every component of a color image. Every
+        component is a compressed (grayscale) image.
+    quantization : Optional[Tuple[int, ...]], optional (default : None)
+        The quantization matrix, row by row, with values in [1, 2 ** 16). If
+        stored, the image is decompressed with it instead of the given one.
+    bands : Optional[Tuple[int, ...]], optional (default : None)
+        The (exclusive) ends of the bands of a progressive image, increasing
+        and ending at 64, e.g. :data:PROGRESSIVE_BANDS.
+    scans : Optional[Tuple[int, ...]], optional (default : None)
+        The number of bytes of every scan of a progressive (grayscale) image.
+    size : int, optional (default : 0)
+        The number of bytes of the header, set when reading a header.
+    """
+    height: int
+    width: int
+    table: HuffmanTable = FIXED_TABLE
+    dc_table: Optional[HuffmanTable] = None
+    restart_interval: Optional[int] = None
+    offsets: Optional[Tuple[int, ...]] = None
+    subsampling: Optional[Tuple[int, int]] = None
+    components: Optional[Tuple[int, ...]] = None
+    quantization: Optional[Tuple[int, ...]] = None
+    bands: Optional[Tuple[int, ...]] = None
+    scans: Optional[Tuple[int, ...]] = None
+    size: int = 0
+
+    @property
+    def n_ver_patches(self) -> int:
+        """The number of block rows."""
+        return self.height // PATCH_SIZE
+
+    @property
+    def n_hor_patches(self) -> int:
+        """The number of blocks per row."""
+        return self.width // PATCH_SIZE
+
+    def segments(self) -> List[Tuple[int, int]]:
+        """
+        The block rows of the segments.
+
+        Returns
+        -------
+        List[Tuple[int, int]] : The first block row and the number of block
+        rows of every segment.
+        """
+        interval = self.restart_interval or max(self.n_ver_patches, 1)
+        return [
+            (y, min(interval, self.n_ver_patches - y))
+            for y in range(0, self.n_ver_patches, interval)
+        ]
+
+    def segment_bounds(self, segment_idx: int, n_bytes: int) -> slice:
+        """
+        The bytes of a segment, requires an index.
+
+        Parameters
+        ----------
+        segment_idx : int
+            The segment index.
+        n_bytes : int
+            The number of bytes of the compressed image.
+
+        Returns
+        -------
+        slice : The bytes of the segment in the compressed image.
+        """
+        if self.offsets is None:
+            raise ValueError('The header has no index.')
+        start = self.size + self.offsets[segment_idx]
+        if segment_idx + 1 < len(self.offsets):
+            return slice(start, self.size + self.offsets[segment_idx + 1])
+        return slice(start, n_bytes)
+
+    def band_ranges(self) -> List[Tuple[int, int]]:
+        """
+        The coefficients of the bands of a progressive image.
+
+        Returns
+        -------
+        List[Tuple[int, int]] : The first and the (exclusive) last zigzag
+        index of every band.
+        """
+        if self.bands is None:
+            raise ValueError('The header has no bands.')
+        return list(zip((0,) + self.bands[:-1], self.bands))
+
+
+def check_bands(bands: Tuple[int, ...]) -> None:
+    """
+    Check the ends of the bands of a progressive image, see :class:Header.
+
+    Parameters
+    ----------
+    bands : Tuple[int, ...]
+        The (exclusive) ends of the bands.
+    """
+    if not (
+        0 < len(bands) < 2 ** 8 and
+        bands[-1] == PATCH_SIZE ** 2 and
+        all(0 < stop - start for start, stop in zip((0,) + bands[:-1], bands))
+    ):
+        raise ValueError(
+            f'Expecting increasing bands ending at {PATCH_SIZE ** 2}: {bands}')
+
+
+def write_header(writer: BitWriter, header: Header) -> None:
+    """
+    Write a header.
+
+    Parameters
+    ----------
+    writer : BitWriter
+        The writer to write the header to.
+    header : Header
+        The header.
+    """
+    if (
+        header.restart_interval is not None and
+        not 0 < header.restart_interval < 2 ** 16
+    ):
+        raise ValueError(
+            'Restart interval should be in [1, 2 ** 16): '
+            f'{header.restart_interval}'
+        )
+    if (
+        header.offsets is not None and
+        len(header.offsets) != len(header.segments())
+    ):
+        raise ValueError(
+            f'Expecting an offset per segment: {len(header.offsets)}')
+
+    if (header.subsampling is None) != (header.components is None):
+        raise ValueError(
+            'Expecting both subsampling and components for a color image.')
+    if (
+        header.components is not None and
+        len(header.components) != N_COLOR_COMPONENTS
+    ):
+        raise ValueError(
+            f'Expecting {N_COLOR_COMPONENTS} components: '
+            f'{len(header.components)}'
+        )
+
+    if header.quantization is not None and (
+        len(header.quantization) != PATCH_SIZE ** 2 or
+        not all(0 < value < 2 ** 16 for value in header.quantization)
+    ):
+        raise ValueError(
+            f'Expecting {PATCH_SIZE ** 2} quantization values in '
+            f'[1, 2 ** 16): {header.quantization}'
+        )
+
+    if header.bands is not None:
+        check_bands(header.bands)
+        if header.restart_interval is not None or header.offsets is not None:
+            raise ValueError(
+                'A progressive image has no restart interval or index.')
+    if (
+        header.bands is not None and header.components is None
+    ) != (header.scans is not None) or (
+        header.scans is not None and len(header.scans) != len(header.bands)
+    ):
+        raise ValueError(
+            'Expecting the number of bytes of every scan of a progressive '
+            'grayscale image.'
+        )
+
+    flags = 0
+    if header.table != FIXED_TABLE:
+        flags |= FLAG_OPTIMIZED_TABLE
+    if header.restart_interval is not None:
+        flags |= FLAG_RESTART_INTERVAL
+    if header.offsets is not None:
+        flags |= FLAG_INDEX
+    if header.components is not None:
+        flags |= FLAG_COLOR
+    if header.quantization is not None:
+        flags |= FLAG_QUANTIZATION
+    if header.bands is not None:
+        flags |= FLAG_PROGRESSIVE
+    if header.dc_table is not None:
+        flags |= FLAG_DC_PREDICTION
+        if header.dc_table != FIXED_DC_TABLE:
+            flags |= FLAG_OPTIMIZED_DC_TABLE
+
+    writer.write(header.height, 32)
+    writer.write(header.width, 32)
+    writer.write(flags, 8)
+    if flags & FLAG_OPTIMIZED_TABLE:
+        header.table.write(writer)
+    if flags & FLAG_OPTIMIZED_DC_TABLE:
+        header.dc_table.write(writer)
+    if flags & FLAG_RESTART_INTERVAL:
+        writer.write(header.restart_interval, 16)
+    if flags & FLAG_INDEX:
+        for offset in header.offsets:
+            writer.write(offset, 32)
+    if flags & FLAG_COLOR:
+        factor_ver, factor_hor = header.subsampling
+        writer.write((factor_ver << 4) | factor_hor, 8)
+        for n_bytes in header.components:
+            writer.write(n_bytes, 32)
+    if flags & FLAG_QUANTIZATION:
+        for value in header.quantization:
+            writer.write(value, 16)
+    if flags & FLAG_PROGRESSIVE:
+        writer.write(len(header.bands), 8)
+        for stop in header.bands:
+            writer.write(stop, 8)
+        for n_bytes in header.scans or ():
+            writer.write(n_bytes, 32)
+    writer.align()
+
+
+def read_header(reader: BitReader) -> Header:
+    """
+    Read a header, see :func:write_header.
+
+    Parameters
+    ----------
+    reader : BitReader
+        The reader positioned at the start of the compressed image, it is left
+        at the first segment.
+
+    Returns
+    -------
+    Header : The header.
+    """
+    height = reader.read(32)
+    width = reader.read(32)
+    flags = reader.read(8)
+    header = Header(height, width)
+    if flags & FLAG_OPTIMIZED_TABLE:
+        header = header._replace(table=HuffmanTable.read(reader))
+    if flags & FLAG_OPTIMIZED_DC_TABLE:
+        header = header._replace(dc_table=HuffmanTable.read(reader))
+    elif flags & FLAG_DC_PREDICTION:
+        header = header._replace(dc_table=FIXED_DC_TABLE)
+    if flags & FLAG_RESTART_INTERVAL:
+        header = header._replace(restart_interval=reader.read(16))
+    if flags & FLAG_INDEX:
+        header = header._replace(offsets=tuple(
+            reader.read(32) for _ in range(len(header.segments()))))
+    if flags & FLAG_COLOR:
+        factors = reader.read(8)
+        header = header._replace(
+            subsampling=(factors >> 4, factors & 0x0F),
+            components=tuple(
+                reader.read(32) for _ in range(N_COLOR_COMPONENTS))
+        )
+    if flags & FLAG_QUANTIZATION:
+        header = header._replace(quantization=tuple(
+            reader.read(16) for _ in range(PATCH_SIZE ** 2)))
+    if flags & FLAG_PROGRESSIVE:
+        bands = tuple(reader.read(8) for _ in range(reader.read(8)))
+        header = header._replace(bands=bands)
+        if header.components is None:
+            header = header._replace(
+                scans=tuple(reader.read(32) for _ in bands))
+    reader.align()
+    return header._replace(size=reader.position // 8)
@@ -1,31 +1,250 @@
-from typing import Iterable
+import heapq
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import numpy as np
 
-from .utils import (
-    bits_to_int,
-    int_to_bits,
+from .bitstream import (
+    BitReader,
+    BitWriter,
 )
 
 
-def encode(sequence: Iterable) -> str:
+MAX_CODE_LENGTH = 16
+
+# Special symbols: end of block and a run of 15 zeros.
+EOB = 0x00
+ZRL = 0xF0
+
+# The longest run of blocks ending with zeros which one symbol describes in
+# a band, see :func:encode_blocks: the symbol (r << 4) is followed by the r
+# low bits of the run length.
+MAX_EOB_RUN = (1 << 15) - 1
+
+# The size categories of the DC differences: the number of bits of the value.
+MAX_DC_SIZE = 15
+
+_MASKS = tuple((1 << n_bits) - 1 for n_bits in range(16))
+
+
+class HuffmanTable:
     """
-    Encode a sequence with Huffman (entropy) encoding.
+    A canonical Huffman code for the (runlength, number of bits) symbols.
 
-    The encoding is done with entropy encoding, i.e. using a smaller bit
-    representation for more frequent occurring values. The mapping above is
-    used. Also there are markers for many sequential zeros.
+    A symbol is a byte: the high half byte is the number of zeros before a
+    non-zero value, the low half byte the number of bits needed to describe
+    the value. The code is described - like in JPEG - by the number of codes
+    per code length and the symbols ordered by code length.
+
+    Parameters
+    ----------
+    counts : Sequence[int]
+        The number of codes per code length, from 1 up to 16 bits.
+    symbols : Sequence[int]
+        The symbols ordered by code length.
+    """
+
+    def __init__(self, counts: Sequence[int], symbols: Sequence[int]):
+        if len(counts) != MAX_CODE_LENGTH:
+            raise ValueError(
+                f'Expecting {MAX_CODE_LENGTH} counts: {len(counts)}')
+        if sum(counts) != len(symbols):
+            raise ValueError(
+                f'Expecting {sum(counts)} symbols: {len(symbols)}')
+        self.counts = tuple(int(count) for count in counts)
+        self.symbols = tuple(int(symbol) for symbol in symbols)
+
+        # The (code, code length) per symbol
+        self.codes: List[Optional[Tuple[int, int]]] = [None] * 256
+        code = 0
+        symbol_idx = 0
+        for length, count in enumerate(self.counts, start=1):
+            for symbol in self.symbols[symbol_idx: symbol_idx + count]:
+                self.codes[symbol] = (code, length)
+                code += 1
+            if code > 1 << length:
+                raise ValueError(f'Too many codes of length {length}.')
+            symbol_idx += count
+            code <<= 1
+
+        # Decoding looks up the next `max_length` bits: all values starting
+        # with a code map to the (runlength, number of bits, code length).
+        self.max_length = max(
+            [length for length, count in enumerate(self.counts, start=1)
+             if count > 0],
+            default=1
+        )
+        self.lookup: List[Optional[Tuple[int, int, int]]] = (
+            [None] * (1 << self.max_length))
+        for symbol in self.symbols:
+            code, length = self.codes[symbol]
+            shift = self.max_length - length
+            self.lookup[code << shift: (code + 1) << shift] = (
+                [(symbol >> 4, symbol & 0x0F, length)] * (1 << shift))
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, HuffmanTable) and
+            self.counts == other.counts and
+            self.symbols == other.symbols
+        )
+
+    def __repr__(self) -> str:
+        return f'HuffmanTable(counts={self.counts}, symbols={self.symbols})'
+
+    def __reduce__(self):
+        # Pickle the description only, the lookup table is rebuilt.
+        return HuffmanTable, (self.counts, self.symbols)
+
+    @classmethod
+    def from_frequencies(
+        cls,
+        frequencies: Sequence[int],
+        *,
+        reserve_all_ones: bool = False
+    ) -> 'HuffmanTable':
+        """
+        Create an optimal code (limited to 16 bits) for symbol frequencies.
+
+        Parameters
+        ----------
+        frequencies : Sequence[int]
+            The frequency of every symbol (indexed by symbol).
+        reserve_all_ones : bool, optional (default : False)
+            If true, no symbol gets a code of only ones, which JPEG files do
+            not allow (Annex C). Like libjpeg, a pseudo symbol is coded and
+            its code is dropped.
+
+        Returns
+        -------
+        HuffmanTable : The Huffman table.
+        """
+        symbols = [
+            symbol for symbol, frequency in enumerate(frequencies)
+            if frequency > 0
+        ]
+        if len(symbols) == 0:
+            raise ValueError('Expecting at least one symbol.')
+        if reserve_all_ones:
+            frequencies = list(frequencies) + [0] * (256 - len(frequencies))
+            frequencies.append(1)
+            symbols.append(256)
+
+        # Huffman's algorithm on the code lengths, the symbol is used as tie
+        # breaker to make the code deterministic.
+        lengths = {symbol: 0 for symbol in symbols}
+        heap = [
+            (frequencies[symbol], symbol, [symbol]) for symbol in symbols]
+        heapq.heapify(heap)
+        while len(heap) > 1:
+            frequency_a, key_a, symbols_a = heapq.heappop(heap)
+            frequency_b, key_b, symbols_b = heapq.heappop(heap)
+            for symbol in symbols_a + symbols_b:
+                lengths[symbol] += 1
+            heapq.heappush(heap, (
+                frequency_a + frequency_b,
+                min(key_a, key_b),
+                symbols_a + symbols_b
+            ))
+        if len(symbols) == 1:
+            lengths[symbols[0]] = 1
+
+        counts = [0] * (max(lengths.values()) + 1)
+        for length in lengths.values():
+            counts[length] += 1
+
+        # Limit the code length, see JPEG specification Annex K.3: a pair of
+        # codes that is too long is moved up, while a shorter code is split.
+        for length in range(len(counts) - 1, MAX_CODE_LENGTH, -1):
+            while counts[length] > 0:
+                shorter = length - 2
+                while counts[shorter] == 0:
+                    shorter -= 1
+                counts[length] -= 2
+                counts[length - 1] += 1
+                counts[shorter + 1] += 2
+                counts[shorter] -= 1
+        counts = (counts[1:] + [0] * MAX_CODE_LENGTH)[:MAX_CODE_LENGTH]
+
+        ordered = sorted(symbols, key=lambda symbol: (lengths[symbol], symbol))
+        if reserve_all_ones:
+            # The last code of the longest length is all ones.
+            ordered.remove(256)
+            longest = max(
+                length for length, count in enumerate(counts) if count > 0)
+            counts[longest] -= 1
+        return cls(counts, ordered)
+
+    def write(self, writer: BitWriter) -> None:
+        """
+        Write the table: a byte per count followed by a byte per symbol.
+
+        Parameters
+        ----------
+        writer : BitWriter
+            The writer to write the table to.
+        """
+        for count in self.counts:
+            writer.write(count, 8)
+        for symbol in self.symbols:
+            writer.write(symbol, 8)
+
+    @classmethod
+    def read(cls, reader: BitReader) -> 'HuffmanTable':
+        """
+        Read a table, see :meth:write.
+
+        Parameters
+        ----------
+        reader : BitReader
+            The reader positioned at the start of the table.
+
+        Returns
+        -------
+        HuffmanTable : The Huffman table.
+        """
+        counts = [reader.read(8) for _ in range(MAX_CODE_LENGTH)]
+        symbols = [reader.read(8) for _ in range(sum(counts))]
+        return cls(counts, symbols)
+
+
+# The default code: every symbol is written as its byte.
+FIXED_TABLE = HuffmanTable(
+    [0] * 7 + [256] + [0] * (MAX_CODE_LENGTH - 8), range(256))
+
+# The default code of the DC differences: every size category is written as
+# a half byte.
+FIXED_DC_TABLE = HuffmanTable(
+    [0] * 3 + [MAX_DC_SIZE + 1] + [0] * (MAX_CODE_LENGTH - 4),
+    range(MAX_DC_SIZE + 1)
+)
+
+
+def block_symbols(sequence: Iterable) -> Iterator[Tuple[int, int, int]]:
+    """
+    The symbols describing a sequence.
+
+    The non-zero values are described by a symbol - the number of zeros before
+    the value and the number of bits needed to describe the value - followed
+    by a sign bit and the bits of the value. Also there are markers for many
+    sequential zeros and for the end of the block.
 
     Parameters
     ----------
     sequence : Iterable
-        The sequence to encoded.
+        The sequence.
 
-    Returns
-    -------
-    str : The bit string.
+    Yields
+    ------
+    Tuple[int, int, int] : The symbol, the sign and value bits following the
+    symbol and the number of those bits.
     """
-    code = ''
     runlength = 0      # number of sequential zeros
     for s in sequence:
         if s == 0:
@@ -33,73 +252,571 @@ def encode(sequence: Iterable) -> str:
             continue
 
         while runlength >= 15:
-            code += '11110000'   # marker for 15 sequential zeros
+            yield ZRL, 0, 0   # marker for 15 sequential zeros
             runlength -= 15
 
-        # Half a byte describes the number of zeros before this non-zero
-        # value.
-        code += int_to_bits(runlength).zfill(4)
+        magnitude = int(abs(s))
+        n_bits = magnitude.bit_length()
 
-        number_in_bits = int_to_bits(abs(s))
-        # Half a byte describes the number of bits needed to describe the
-        # non-zero value.
-        code += int_to_bits(len(number_in_bits)).zfill(4)
+        # One bit describes the sign (positive or negative), followed by the
+        # bits to describe the value
+        sign = 1 if s < 0 else 0
+        bits = (sign << n_bits) | magnitude
+        yield (runlength << 4) | n_bits, bits, 1 + n_bits
 
-        # One bit describes the sign (positive or negative)
-        code += '1' if s < 0 else '0'
+        runlength = 0
 
-        # The bits to describe the value
-        code += number_in_bits
+    yield EOB, 0, 0   # end of block (patch) marker
 
-        runlength = 0
 
-    code += '0' * 8   # end of block (patch) marker
-    return code
+def dc_symbol(difference: int) -> Tuple[int, int, int]:
+    """
+    The symbol describing the difference of a DC coefficient with the
+    previous one (DPCM).
 
+    The symbol is the size category - the number of bits needed to describe
+    the difference - followed by a sign bit and the bits of the difference,
+    like a value of :func:block_symbols. A difference of 0 is its symbol
+    only.
 
-def decode(code: str, *, remainder: bool = False) -> np.array:
+    Parameters
+    ----------
+    difference : int
+        The difference.
+
+    Returns
+    -------
+    Tuple[int, int, int] : The symbol, the sign and value bits following the
+    symbol and the number of those bits.
     """
-    The Huffman encoded code, to be decoded.
+    magnitude = abs(int(difference))
+    n_bits = magnitude.bit_length()
+    if n_bits > MAX_DC_SIZE:
+        raise ValueError(
+            f'DC difference does not fit in {MAX_DC_SIZE} bits: {difference}')
+    if n_bits == 0:
+        return 0, 0, 0
+    sign = 1 if difference < 0 else 0
+    return n_bits, (sign << n_bits) | magnitude, 1 + n_bits
+
+
+def dc_symbol_frequencies(
+    sequences: np.ndarray,
+    *,
+    prediction: int = 0
+) -> np.ndarray:
+    """
+    Count the size categories of the DC differences of sequences, see
+    :func:dc_symbol.
 
     Parameters
     ----------
-    code : str
-        The code to be decoded.
-    remainder : bool
-        If true, also return the remainder of the code.
+    sequences : np.ndarray
+        The sequences with shape (n_blocks, n_values), the DC coefficient
+        first.
+    prediction : int, optional (default : 0)
+        The DC coefficient before the first sequence.
 
     Returns
     -------
-    np.array : The decoded sequence.
+    np.ndarray : The frequency of every symbol (indexed by symbol).
+    """
+    differences = np.diff(
+        np.asarray(sequences)[:, 0].astype(np.int64), prepend=prediction)
+    # The exponent of the binary representation is the number of bits.
+    _, n_bits = np.frexp(np.abs(differences))
+    return np.bincount(n_bits, minlength=256)
+
+
+def _eob_runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The runs of blocks ending with zeros of a band with shape
+    (n_blocks, n_values): the first block of every run and the number of
+    blocks. A run continues over the blocks which are all zeros and is split
+    every MAX_EOB_RUN blocks. A block ending with a non-zero value or an
+    empty band needs no end of band.
+    """
+    n_blocks, n_values = values.shape
+    if n_values == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    needed = values[:, -1] == 0
+    empty = ~np.any(values, axis=1)
+    blocks = np.arange(n_blocks)
+    starts = needed.copy()
+    starts[1:] &= ~(empty[1:] & needed[:-1])
+
+    # The position of a block in its run of blocks ending with zeros.
+    first = np.maximum.accumulate(np.where(starts, blocks, 0))
+    position = blocks - first
+    lengths = np.bincount(first[needed], minlength=n_blocks)[first]
+    rows = np.flatnonzero(needed & (position % MAX_EOB_RUN == 0))
+    return rows, np.minimum(lengths[rows] - position[rows], MAX_EOB_RUN)
+
+
+def _eob_run_codes(
+    lengths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    # We expect an 8 by 8 sequence!!!
-    sequence = np.zeros(64)
+    The symbols of runs of blocks ending with zeros, see :func:_eob_runs,
+    and the number and value of the bits following them.
+    """
+    _, exponents = np.frexp(lengths)
+    n_bits = (exponents - 1).astype(np.int64)
+    return n_bits << 4, n_bits, lengths - (1 << n_bits)
+
+
+def symbol_frequencies(
+    sequences: Iterable[Iterable],
+    *,
+    eob_runs: bool = False
+) -> np.ndarray:
+    """
+    Count the symbols needed to describe sequences, see :func:block_symbols.
+
+    Parameters
+    ----------
+    sequences : Iterable[Iterable]
+        The sequences.
+    eob_runs : bool, optional (default : False)
+        If True, the sequences are a band and the ends of band are counted as
+        runs over the blocks, see :func:encode_blocks.
 
-    sequence_idx = 0
-    code_idx = 0
-    while True:
-        runlength = bits_to_int(code[code_idx: code_idx + 4])
-        n_bits = bits_to_int(code[code_idx + 4: code_idx + 8])
+    Returns
+    -------
+    np.ndarray : The frequency of every symbol (indexed by symbol).
+    """
+    if eob_runs:
+        sequences = np.asarray(sequences)
+    frequencies = np.zeros(256, dtype=int)
+    for sequence in sequences:
+        for symbol, _, _ in block_symbols(sequence):
+            frequencies[symbol] += 1
+    if eob_runs:
+        frequencies[EOB] -= len(sequences)
+        symbols, _, _ = _eob_run_codes(_eob_runs(sequences)[1])
+        frequencies += np.bincount(symbols, minlength=256)
+    return frequencies
 
-        if runlength == 0 and n_bits == 0:    # End of block
-            code_idx += 8
-            break
 
-        if runlength == 15 and n_bits == 0:
-            sequence_idx += 15
-            code_idx += 8
+def write_block(
+    writer: BitWriter,
+    sequence: Iterable,
+    *,
+    table: HuffmanTable = FIXED_TABLE
+) -> None:
+    """
+    Encode a sequence with Huffman (entropy) encoding.
+
+    The encoding is done with entropy encoding, i.e. using a smaller bit
+    representation for more frequent occurring values. Also there are markers
+    for many sequential zeros.
+
+    Parameters
+    ----------
+    writer : BitWriter
+        The writer to write the code to.
+    sequence : Iterable
+        The sequence to encoded.
+    table : HuffmanTable, optional (default : FIXED_TABLE)
+        The code for the symbols.
+    """
+    codes = table.codes
+    for symbol, bits, n_bits in block_symbols(sequence):
+        code = codes[symbol]
+        if code is None:
+            raise ValueError(f'Symbol not in Huffman table: {symbol:#04x}')
+        writer.write((code[0] << n_bits) | bits, code[1] + n_bits)
+
+
+def write_blocks(
+    writer: BitWriter,
+    sequences: Iterable[Sequence],
+    *,
+    table: HuffmanTable = FIXED_TABLE,
+    dc_table: Optional[HuffmanTable] = None,
+    prediction: int = 0
+) -> None:
+    """
+    Encode sequences with Huffman (entropy) encoding, see :func:write_block.
+
+    Parameters
+    ----------
+    writer : BitWriter
+        The writer to write the code to.
+    sequences : Iterable[Sequence]
+        The sequences to encode.
+    table : HuffmanTable, optional (default : FIXED_TABLE)
+        The code for the symbols.
+    dc_table : Optional[HuffmanTable], optional (default : None)
+        If given, the first value of every sequence - the DC coefficient - is
+        encoded as the difference with the previous one, see
+        :func:dc_symbol, with this code. Otherwise it is encoded like the
+        other values.
+    prediction : int, optional (default : 0)
+        The DC coefficient before the first sequence, e.g. of the last
+        sequence of the previous call within a segment.
+    """
+    if dc_table is None:
+        for sequence in sequences:
+            write_block(writer, sequence, table=table)
+        return
+
+    dc_codes = dc_table.codes
+    for sequence in sequences:
+        dc = int(sequence[0])
+        symbol, bits, n_bits = dc_symbol(dc - prediction)
+        code = dc_codes[symbol]
+        if code is None:
+            raise ValueError(f'Symbol not in DC Huffman table: {symbol}')
+        writer.write((code[0] << n_bits) | bits, code[1] + n_bits)
+        prediction = dc
+        write_block(writer, sequence[1:], table=table)
+
+
+def _code_arrays(table: HuffmanTable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The codes and code lengths of a table indexed by symbol, a length of 0
+    for the symbols without code.
+    """
+    codes = np.zeros(256, dtype=np.uint64)
+    lengths = np.zeros(256, dtype=np.int64)
+    for symbol, code in enumerate(table.codes):
+        if code is not None:
+            codes[symbol], lengths[symbol] = code
+    return codes, lengths
+
+
+def _value_bits(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The number of bits and the sign and value bits of values, see
+    :func:block_symbols.
+    """
+    magnitudes = np.abs(values)
+    # The exponent of the binary representation is the number of bits.
+    _, n_bits = np.frexp(magnitudes)
+    n_bits = n_bits.astype(np.int64)
+    signs = (values < 0).astype(np.int64)
+    return n_bits, (signs << n_bits) | magnitudes
+
+
+def encode_blocks(
+    sequences: np.ndarray,
+    *,
+    table: HuffmanTable = FIXED_TABLE,
+    dc_table: Optional[HuffmanTable] = None,
+    prediction: int = 0,
+    eob_runs: bool = False
+) -> Tuple[bytes, int]:
+    """
+    Encode sequences with Huffman (entropy) encoding, the vectorized
+    equivalent of :func:write_blocks.
+
+    The symbols of all sequences are computed with array operations: the
+    positions of the non-zero values give the runlengths, the end of block
+    and 15 zeros markers are inserted by offset. The codes are packed into
+    bytes at their bit offsets, so there is no work per value in Python.
+
+    Parameters
+    ----------
+    sequences : np.ndarray
+        The sequences to encode with shape (n_blocks, n_values).
+    table : HuffmanTable, optional (default : FIXED_TABLE)
+        The code for the symbols.
+    dc_table : Optional[HuffmanTable], optional (default : None)
+        If given, the DC coefficients are encoded as differences with this
+        code, see :func:write_blocks.
+    prediction : int, optional (default : 0)
+        The DC coefficient before the first sequence.
+    eob_runs : bool, optional (default : False)
+        If True, the sequences are a band of coefficients: a sequence ending
+        with a non-zero value has no end of band, and the end of band of
+        sequences ending with zeros is one symbol for a run of up to
+        MAX_EOB_RUN sequences, where the following sequences are all zeros.
+        The symbol (r << 4) is followed by the r low bits of the run length.
+
+    Returns
+    -------
+    Tuple[bytes, int] : The code padded with zeros to a whole byte, the same
+    as the bytes of :func:write_blocks without `eob_runs`, and the number of
+    bits.
+    """
+    sequences = np.asarray(sequences, dtype=np.int64)
+    if sequences.ndim != 2:
+        raise ValueError(
+            f'Expecting sequences of shape (n_blocks, n_values): '
+            f'{sequences.shape}'
+        )
+    n_blocks = len(sequences)
+    has_dc = int(dc_table is not None)
+    values = sequences[:, has_dc:]
+
+    # The non-zero values in code order and the number of zeros before them,
+    # which are written as markers of 15 zeros and the runlength.
+    rows, cols = np.nonzero(values)
+    previous = np.empty_like(cols)
+    previous[:1] = -1
+    previous[1:] = cols[:-1]
+    previous[np.diff(rows, prepend=-1) != 0] = -1
+    n_zrls, runlengths = np.divmod(cols - previous - 1, 15)
+    n_bits, bits = _value_bits(values[rows, cols])
+    if np.any(n_bits >= 16):
+        raise ValueError('Values should have at most 15 bits.')
+
+    # The end of every block, or of the runs of blocks ending with zeros.
+    if eob_runs:
+        eob_rows, eob_lengths = _eob_runs(values)
+        eob_symbols, n_eob_bits, eob_bits = _eob_run_codes(eob_lengths)
+    else:
+        eob_rows = np.arange(n_blocks)
+        eob_symbols = n_eob_bits = eob_bits = np.zeros_like(eob_rows)
+
+    codes, lengths = _code_arrays(table)
+    symbols = (runlengths << 4) | n_bits
+    missing = lengths[symbols] == 0
+    if np.any(missing):
+        raise ValueError(
+            f'Symbol not in Huffman table: {symbols[missing][0]:#04x}')
+    missing = lengths[eob_symbols] == 0
+    if np.any(missing):
+        raise ValueError(
+            f'Symbol not in Huffman table: {eob_symbols[missing][0]:#04x}')
+    if n_zrls.sum() and lengths[ZRL] == 0:
+        raise ValueError(f'Symbol not in Huffman table: {ZRL:#04x}')
+
+    # The index of every code: a sequence is its DC difference, the markers
+    # and value of every non-zero value and the end of block.
+    n_items = n_zrls + 1
+    row_items = np.bincount(
+        rows, weights=n_items, minlength=n_blocks).astype(np.int64)
+    block_items = row_items + has_dc + np.bincount(
+        eob_rows, minlength=n_blocks)
+    ends = np.cumsum(block_items)
+    starts = ends - block_items
+    value_idx = np.cumsum(n_items) - (np.cumsum(row_items) - row_items)[rows]
+    value_idx += starts[rows] + has_dc - 1
+    n_codes = int(ends[-1]) if n_blocks else 0
+
+    # The remaining codes are the markers of 15 zeros.
+    fields = np.full(n_codes, codes[ZRL], dtype=np.uint64)
+    n_fields = np.full(n_codes, lengths[ZRL], dtype=np.int64)
+    fields[value_idx] = (codes[symbols] << (1 + n_bits).astype(np.uint64)) | (
+        bits.astype(np.uint64))
+    n_fields[value_idx] = lengths[symbols] + 1 + n_bits
+    eob_idx = ends[eob_rows] - 1
+    fields[eob_idx] = (codes[eob_symbols] << n_eob_bits.astype(np.uint64)) | (
+        eob_bits.astype(np.uint64))
+    n_fields[eob_idx] = lengths[eob_symbols] + n_eob_bits
+
+    if dc_table is not None and n_blocks:
+        differences = np.diff(sequences[:, 0], prepend=prediction)
+        n_dc_bits, dc_bits = _value_bits(differences)
+        if np.any(n_dc_bits > MAX_DC_SIZE):
+            raise ValueError(
+                f'DC difference does not fit in {MAX_DC_SIZE} bits.')
+        dc_codes, dc_lengths = _code_arrays(dc_table)
+        missing = dc_lengths[n_dc_bits] == 0
+        if np.any(missing):
+            raise ValueError(
+                f'Symbol not in DC Huffman table: {n_dc_bits[missing][0]}')
+        # A difference of 0 is its symbol only.
+        n_extra = np.where(n_dc_bits > 0, 1 + n_dc_bits, 0)
+        fields[starts] = (
+            dc_codes[n_dc_bits] << n_extra.astype(np.uint64)) | (
+            dc_bits.astype(np.uint64))
+        n_fields[starts] = dc_lengths[n_dc_bits] + n_extra
+    return _pack(fields, n_fields)
+
+
+def _pack(fields: np.ndarray, n_fields: np.ndarray) -> Tuple[bytes, int]:
+    """
+    Pack bit fields of at most 32 bits, most significant bit first, see
+    :class:jpeg.bitstream.BitWriter.
+    """
+    offsets = np.cumsum(n_fields) - n_fields
+    n_bits = int(offsets[-1] + n_fields[-1]) if len(fields) else 0
+    n_bytes = -(-n_bits // 8)
+    # Align every field in the 5 bytes starting at its first byte; the
+    # fields do not overlap, so the bytes are the sums of their parts.
+    first_bytes = offsets // 8
+    aligned = fields << (40 - n_fields - offsets % 8).astype(np.uint64)
+    packed = np.zeros(n_bytes + 5, dtype=np.int64)
+    for byte_idx in range(5):
+        parts = (aligned >> np.uint64(32 - 8 * byte_idx)) & np.uint64(0xFF)
+        packed += np.bincount(
+            first_bytes + byte_idx,
+            weights=parts.astype(np.int64),
+            minlength=n_bytes + 5,
+        ).astype(np.int64)
+    return packed[:n_bytes].astype(np.uint8).tobytes(), n_bits
+
+
+def decode_blocks(
+    reader: BitReader,
+    n_blocks: int,
+    *,
+    table: HuffmanTable = FIXED_TABLE,
+    n_values: int = 64,
+    dc_table: Optional[HuffmanTable] = None,
+    prediction: int = 0,
+    eob_runs: bool = False
+) -> np.ndarray:
+    """
+    Decode Huffman encoded sequences, see :func:write_blocks.
+
+    The sequences are decoded in one pass over the shared buffer of the
+    reader; the reader is left at the end of the last sequence.
+
+    Parameters
+    ----------
+    reader : BitReader
+        The reader positioned at the start of the code.
+    n_blocks : int
+        The number of sequences to decode.
+    table : HuffmanTable, optional (default : FIXED_TABLE)
+        The code for the symbols.
+    n_values : int, optional (default : 64)
+        The number of values to keep of every sequence, the bits of the
+        later values are skipped, e.g. to decode at a reduced scale.
+    dc_table : Optional[HuffmanTable], optional (default : None)
+        The code of the DC differences, if the DC coefficients are encoded
+        as differences.
+    prediction : int, optional (default : 0)
+        The DC coefficient before the first sequence.
+    eob_runs : bool, optional (default : False)
+        If True, the sequences are a band of `n_values` coefficients with runs
+        of ends of band, see :func:encode_blocks.
+
+    Returns
+    -------
+    np.ndarray : The decoded sequences with shape (n_blocks, n_values), as
+    int16: a value has at most 15 bits.
+    """
+    # We expect 8 by 8 sequences!!!
+    sequences = np.zeros((n_blocks, n_values), dtype=np.int16)
+
+    read = reader.read
+    peek = reader.peek
+    lookup = table.lookup
+    max_length = table.max_length
+    dc_lookup = None if dc_table is None else dc_table.lookup
+    dc_max_length = None if dc_table is None else dc_table.max_length
+    # A band ends after its last value, a sequence at its end of block.
+    band_end = n_values if eob_runs else 1 << 16
+    eob_run = 0   # the number of following sequences which are all zeros
+    for block_idx in range(n_blocks):
+        sequence = sequences[block_idx]
+        sequence_idx = 0
+        if dc_lookup is not None:
+            entry = dc_lookup[peek(dc_max_length)]
+            if entry is None:
+                raise ValueError(
+                    f'Invalid DC Huffman code at position {reader.position}')
+            _, n_bits, length = entry
+            reader.position += length
+            if n_bits:
+                value = read(1 + n_bits)
+                magnitude = value & _MASKS[n_bits]
+                if value >> n_bits:
+                    magnitude = -magnitude
+                prediction += magnitude
+            sequence[0] = prediction
+            sequence_idx = 1
+        if eob_run:
+            eob_run -= 1
             continue
+        while sequence_idx < band_end:
+            entry = lookup[peek(max_length)]
+            if entry is None:
+                raise ValueError(
+                    f'Invalid Huffman code at position {reader.position}')
+            runlength, n_bits, length = entry
+            reader.position += length
+
+            if n_bits == 0:
+                if runlength == 0:    # End of block
+                    break
+                if runlength == 15:
+                    sequence_idx += 15
+                    continue
+                if eob_runs:    # End of band of this and following blocks
+                    eob_run = (1 << runlength) + read(runlength) - 1
+                    break
+
+            sequence_idx += runlength
+            if sequence_idx >= n_values:
+                reader.position += 1 + n_bits
+                sequence_idx += 1
+                continue
+
+            # One sign bit followed by the bits describing the value
+            value = read(1 + n_bits)
+            magnitude = value & _MASKS[n_bits]
+            if value >> n_bits:
+                magnitude = -magnitude
+            sequence[sequence_idx] = magnitude
+            sequence_idx += 1
+
+    if reader.bits_remaining < 0:
+        raise EOFError('Reading beyond end of data.')
+    return sequences
+
+
+def read_block(reader: BitReader) -> np.array:
+    """
+    Decode one Huffman encoded sequence, see :func:write_block.
+
+    Parameters
+    ----------
+    reader : BitReader
+        The reader positioned at the start of the code.
+
+    Returns
+    -------
+    np.array : The decoded sequence.
+    """
+    return decode_blocks(reader, 1)[0]
+
+
+def encode(sequence: Iterable) -> str:
+    """
+    Encode a sequence with Huffman (entropy) encoding.
+
+    This is a debug view of :func:write_block.
+
+    Parameters
+    ----------
+    sequence : Iterable
+        The sequence to encoded.
+
+    Returns
+    -------
+    str : The bit string.
+    """
+    writer = BitWriter()
+    write_block(writer, sequence)
+    return writer.to_bit_string()
 
-        sign = -1 if code[code_idx + 8] == '1' else 1
-        bit_rep = code[code_idx + 9: code_idx + 9 + n_bits]
 
-        sequence_idx += runlength
-        sequence[sequence_idx] = sign * bits_to_int(bit_rep)
+def decode(code: str, *, remainder: bool = False) -> np.array:
+    """
+    The Huffman encoded code, to be decoded.
 
-        code_idx += 9 + n_bits
-        sequence_idx += 1
+    This is a debug view of :func:read_block.
 
+    Parameters
+    ----------
+    code : str
+        The code to be decoded.
+    remainder : bool
+        If true, also return the remainder of the code.
+
+    Returns
+    -------
+    np.array : The decoded sequence.
+    """
+    reader = BitReader.from_bit_string(code)
+    sequence = read_block(reader)
     if remainder:
-        return sequence, code[code_idx:]
+        return sequence, code[reader.position:]
     else:
         return sequence
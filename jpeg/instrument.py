@@ -0,0 +1,247 @@
+import time
+from typing import (
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from .huffman import _eob_runs
+
+
+class Observer:
+    """
+    Observe the stages of compressing and decompressing an image.
+
+    Pass an observer to :func:jpeg.compress_bytes or
+    :func:jpeg.decompress_bytes. This base class ignores all events, override
+    the methods to export them, e.g. to a metrics system. Without an observer
+    the stages are not timed nor counted.
+
+    The stages are:
+    - 'color': the color conversion and chroma resampling of a RGB image.
+    - 'transform': the discrete cosine transform, quantization and zigzag
+      order, which are one step, see :func:jpeg.freq.quantize_blocks.
+    - 'count': counting the symbols for an optimized Huffman table.
+    - 'table': building the optimized Huffman table.
+    - 'entropy': the Huffman encoding or decoding.
+    - 'reconstruct': the dequantization and inverse transform.
+    """
+
+    def stage(self, name: str, seconds: float) -> None:
+        """
+        A stage is done, the stages of the segments are reported one by one.
+
+        Parameters
+        ----------
+        name : str
+            The stage name.
+        seconds : float
+            The wall time of the stage.
+        """
+
+    def blocks(
+        self,
+        sequences: np.ndarray,
+        bands: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> None:
+        """
+        Blocks are (de)compressed.
+
+        Parameters
+        ----------
+        sequences : np.ndarray
+            The quantized, zigzag ordered coefficients with shape (n_blocks,
+            64).
+        bands : Optional[Sequence[Tuple[int, int]]], optional (default : None)
+            The ranges of the zigzag order coded as one scan each of a
+            progressive image, None if the blocks are coded one by one.
+        """
+
+    def size(self, n_bytes: int) -> None:
+        """
+        An image is (de)compressed.
+
+        Parameters
+        ----------
+        n_bytes : int
+            The number of bytes of the compressed image.
+        """
+
+
+class Stats(Observer):
+    """
+    An observer accumulating the stage times and counters.
+
+    Attributes
+    ----------
+    seconds : Dict[str, float]
+        The wall time per stage.
+    n_blocks : int
+        The number of blocks.
+    n_zero_blocks : int
+        The number of blocks of which all coefficients are zero.
+    n_bytes : int
+        The number of bytes of the compressed images.
+    zero_runs : np.ndarray
+        The histogram of the runs of zero AC coefficients before a non zero
+        coefficient: zero_runs[k] is the number of runs of length k.
+    n_eob : int
+        The number of end of block symbols: every block ends with one, the
+        scans of a progressive image have one per run of blocks ending with
+        zeros.
+    n_zrl : int
+        The number of zero run length (15 zeros) symbols, the runs restart
+        in every scan of a progressive image.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.n_blocks = 0
+        self.n_zero_blocks = 0
+        self.n_bytes = 0
+        self.zero_runs = np.zeros(63, dtype=int)
+        self.n_eob = 0
+        self.n_zrl = 0
+
+    def stage(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.) + seconds
+
+    def blocks(
+        self,
+        sequences: np.ndarray,
+        bands: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> None:
+        nonzero = sequences != 0
+        self.n_blocks += len(sequences)
+        self.n_zero_blocks += int((~nonzero.any(axis=1)).sum())
+        zero_runs = zero_run_lengths(sequences)
+        self.zero_runs += zero_runs
+        if bands is None:
+            self.n_eob += len(sequences)
+            self.n_zrl += _n_zrl(zero_runs)
+            return
+        # The symbols of the scans, the DC coefficients are coded apart.
+        for start, stop in bands:
+            values = sequences[:, max(start, 1): stop]
+            self.n_eob += len(_eob_runs(values)[0])
+            self.n_zrl += _n_zrl(_zero_runs(values))
+
+    def size(self, n_bytes: int) -> None:
+        self.n_bytes += n_bytes
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        The stats as a flat dictionary, e.g. to export as metrics.
+
+        Returns
+        -------
+        Dict[str, float] : The counters and the time per stage, with keys
+        like 'seconds_entropy'.
+        """
+        n_runs = self.zero_runs.sum()
+        stats = {
+            'blocks': self.n_blocks,
+            'zero_blocks': self.n_zero_blocks,
+            'bytes': self.n_bytes,
+            'zero_runs': int(n_runs),
+            'mean_zero_run': (
+                float((np.arange(63) * self.zero_runs).sum() / n_runs)
+                if n_runs else 0.
+            ),
+            'eob_symbols': self.n_eob,
+            'zrl_symbols': self.n_zrl,
+        }
+        stats.update(
+            (f'seconds_{name}', seconds)
+            for name, seconds in self.seconds.items()
+        )
+        return stats
+
+
+def zero_run_lengths(sequences: np.ndarray) -> np.ndarray:
+    """
+    The histogram of the runs of zero AC coefficients before a non zero
+    coefficient.
+
+    Parameters
+    ----------
+    sequences : np.ndarray
+        The zigzag ordered coefficients with shape (n_blocks, 64).
+
+    Returns
+    -------
+    np.ndarray : The number of runs of every length (0 up to 62).
+    """
+    return _zero_runs(sequences[:, 1:])
+
+
+def _zero_runs(values: np.ndarray) -> np.ndarray:
+    """
+    The histogram of the runs of zeros before a non zero value of sequences
+    with shape (n_blocks, n_values), at least 63 lengths.
+    """
+    rows, cols = np.nonzero(values)
+    previous = np.full(len(cols), -1)
+    same_block = rows[1:] == rows[:-1]
+    previous[1:][same_block] = cols[:-1][same_block]
+    return np.bincount(cols - previous - 1, minlength=63)
+
+
+def _n_zrl(zero_runs: np.ndarray) -> int:
+    """
+    The number of zero run length (15 zeros) symbols of a histogram of runs,
+    see :func:_zero_runs.
+    """
+    return int((np.arange(len(zero_runs)) // 15 * zero_runs).sum())
+
+
+class _NullTimer:
+    """Does nothing, the timer without an observer."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Reports the wall time of a stage to an observer."""
+
+    def __init__(self, observer: Observer, name: str):
+        self.observer = observer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.observer.stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timed(observer: Optional[Observer], name: str):
+    """
+    Time a stage with a context manager.
+
+    Parameters
+    ----------
+    observer : Optional[Observer]
+        The observer to report the stage to, if None nothing is timed.
+    name : str
+        The stage name.
+
+    Returns
+    -------
+    The context manager.
+    """
+    if observer is None:
+        return _NULL_TIMER
+    return _Timer(observer, name)
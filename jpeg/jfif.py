@@ -0,0 +1,897 @@
+"""
+Baseline JFIF (.jpg) files.
+
+The files are written and read with the stages of this package - the
+discrete cosine transform, quantization, zigzag order and canonical Huffman
+tables - but in the format of the JPEG standard (ITU T.81): the DC
+coefficient is coded as the difference with the previous block, the values
+are coded with JPEG's additional bits and the entropy coded data is byte
+stuffed. Only baseline (sequential, Huffman coded, 8-bit) files are read.
+"""
+from itertools import (
+    chain,
+    repeat,
+)
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from .bitstream import (
+    BitReader,
+    BitWriter,
+)
+from .color import (
+    SUBSAMPLING,
+    downsample,
+    pad,
+    rgb_to_ycbcr,
+    upsample,
+    ycbcr_to_rgb,
+)
+from .freq import (
+    dequantize_blocks,
+    quantize_blocks,
+    scaled_size,
+)
+from .huffman import (
+    EOB,
+    ZRL,
+    HuffmanTable,
+)
+from .quantization import quantization_table
+from .utils import (
+    blocks_to_image,
+    image_to_blocks,
+    izigzag_blocks,
+    zigzag_blocks,
+)
+
+
+PATCH_SIZE = 8
+
+# Markers
+SOI = 0xD8
+EOI = 0xD9
+SOF0 = 0xC0
+SOF1 = 0xC1
+DHT = 0xC4
+DQT = 0xDB
+DRI = 0xDD
+SOS = 0xDA
+APP0 = 0xE0
+RST0 = 0xD0
+RST7 = 0xD7
+# The start of frame markers of the processes which are not supported:
+# progressive, lossless, hierarchical and arithmetic coding.
+UNSUPPORTED_SOF = frozenset(range(0xC2, 0xD0)) - {DHT, 0xC8, 0xCC}
+
+# The largest size of a DC difference and an AC value in a baseline file.
+MAX_DC_SIZE = 11
+MAX_AC_SIZE = 10
+
+# The typical Huffman tables of the JPEG standard (Annex K.3).
+DC_LUMINANCE_TABLE = HuffmanTable(
+    [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0], range(12))
+DC_CHROMINANCE_TABLE = HuffmanTable(
+    [0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0], range(12))
+AC_LUMINANCE_TABLE = HuffmanTable(
+    [0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7D],
+    [
+        0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12,
+        0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07,
+        0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xA1, 0x08,
+        0x23, 0x42, 0xB1, 0xC1, 0x15, 0x52, 0xD1, 0xF0,
+        0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0A, 0x16,
+        0x17, 0x18, 0x19, 0x1A, 0x25, 0x26, 0x27, 0x28,
+        0x29, 0x2A, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39,
+        0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49,
+        0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59,
+        0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69,
+        0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79,
+        0x7A, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89,
+        0x8A, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98,
+        0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7,
+        0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
+        0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3, 0xC4, 0xC5,
+        0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2, 0xD3, 0xD4,
+        0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA, 0xE1, 0xE2,
+        0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9, 0xEA,
+        0xF1, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8,
+        0xF9, 0xFA,
+    ]
+)
+AC_CHROMINANCE_TABLE = HuffmanTable(
+    [0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 0x77],
+    [
+        0x00, 0x01, 0x02, 0x03, 0x11, 0x04, 0x05, 0x21,
+        0x31, 0x06, 0x12, 0x41, 0x51, 0x07, 0x61, 0x71,
+        0x13, 0x22, 0x32, 0x81, 0x08, 0x14, 0x42, 0x91,
+        0xA1, 0xB1, 0xC1, 0x09, 0x23, 0x33, 0x52, 0xF0,
+        0x15, 0x62, 0x72, 0xD1, 0x0A, 0x16, 0x24, 0x34,
+        0xE1, 0x25, 0xF1, 0x17, 0x18, 0x19, 0x1A, 0x26,
+        0x27, 0x28, 0x29, 0x2A, 0x35, 0x36, 0x37, 0x38,
+        0x39, 0x3A, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48,
+        0x49, 0x4A, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58,
+        0x59, 0x5A, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68,
+        0x69, 0x6A, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78,
+        0x79, 0x7A, 0x82, 0x83, 0x84, 0x85, 0x86, 0x87,
+        0x88, 0x89, 0x8A, 0x92, 0x93, 0x94, 0x95, 0x96,
+        0x97, 0x98, 0x99, 0x9A, 0xA2, 0xA3, 0xA4, 0xA5,
+        0xA6, 0xA7, 0xA8, 0xA9, 0xAA, 0xB2, 0xB3, 0xB4,
+        0xB5, 0xB6, 0xB7, 0xB8, 0xB9, 0xBA, 0xC2, 0xC3,
+        0xC4, 0xC5, 0xC6, 0xC7, 0xC8, 0xC9, 0xCA, 0xD2,
+        0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9, 0xDA,
+        0xE2, 0xE3, 0xE4, 0xE5, 0xE6, 0xE7, 0xE8, 0xE9,
+        0xEA, 0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF7, 0xF8,
+        0xF9, 0xFA,
+    ]
+)
+
+
+class Component(NamedTuple):
+    """
+    A component (color channel) of a JPEG image in the coefficient domain.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        The quantized, zigzag ordered coefficients with shape (n_ver_blocks,
+        n_hor_blocks, 64). The blocks cover the image padded to whole
+        minimum coded units.
+    quantization : np.ndarray
+        The 8 by 8 quantization table.
+    factors : Tuple[int, int], optional (default : (1, 1))
+        The vertical and horizontal sampling factors.
+    """
+    coefficients: np.ndarray
+    quantization: np.ndarray
+    factors: Tuple[int, int] = (1, 1)
+
+
+class JFIFImage(NamedTuple):
+    """
+    A JPEG image in the coefficient domain.
+
+    Parameters
+    ----------
+    height : int
+        The image height.
+    width : int
+        The image width.
+    components : Tuple[Component, ...]
+        The components: one for a grayscale image, Y, Cb and Cr for a color
+        image.
+    """
+    height: int
+    width: int
+    components: Tuple[Component, ...]
+
+    @property
+    def max_factors(self) -> Tuple[int, int]:
+        """The largest vertical and horizontal sampling factors."""
+        return (
+            max(component.factors[0] for component in self.components),
+            max(component.factors[1] for component in self.components),
+        )
+
+    def component_shape(self, component_idx: int) -> Tuple[int, int]:
+        """
+        The number of block rows and columns of a component, excluding the
+        padding to whole minimum coded units.
+
+        Parameters
+        ----------
+        component_idx : int
+            The component index.
+
+        Returns
+        -------
+        Tuple[int, int] : The number of block rows and columns.
+        """
+        factor_ver, factor_hor = self.components[component_idx].factors
+        max_ver, max_hor = self.max_factors
+        return (
+            -(-(-(-self.height * factor_ver // max_ver)) // PATCH_SIZE),
+            -(-(-(-self.width * factor_hor // max_hor)) // PATCH_SIZE),
+        )
+
+    def mcu_shape(self) -> Tuple[int, int]:
+        """
+        The number of rows and columns of minimum coded units of an
+        interleaved scan.
+
+        Returns
+        -------
+        Tuple[int, int] : The number of rows and columns.
+        """
+        max_ver, max_hor = self.max_factors
+        return (
+            -(-self.height // (PATCH_SIZE * max_ver)),
+            -(-self.width // (PATCH_SIZE * max_hor)),
+        )
+
+
+def _scan_order(
+    image: JFIFImage,
+    component_indices: Sequence[int],
+) -> Iterator[List[Tuple[int, int, int]]]:
+    """
+    The minimum coded units of a scan: the component, block row and block
+    column of every block in the unit.
+    """
+    if len(component_indices) == 1:
+        component_idx = component_indices[0]
+        n_rows, n_cols = image.component_shape(component_idx)
+        for row in range(n_rows):
+            for col in range(n_cols):
+                yield [(component_idx, row, col)]
+        return
+
+    n_rows, n_cols = image.mcu_shape()
+    for mcu_row in range(n_rows):
+        for mcu_col in range(n_cols):
+            mcu = []
+            for component_idx in component_indices:
+                factor_ver, factor_hor = image.components[
+                    component_idx].factors
+                mcu.extend(
+                    (component_idx,
+                     mcu_row * factor_ver + v,
+                     mcu_col * factor_hor + h)
+                    for v in range(factor_ver)
+                    for h in range(factor_hor)
+                )
+            yield mcu
+
+
+def _value_bits(value: int) -> Tuple[int, int]:
+    """
+    The additional bits of a value: the value if positive, otherwise the
+    ones' complement of its magnitude. Also, the size of the value.
+    """
+    size = abs(value).bit_length()
+    if value < 0:
+        value += (1 << size) - 1
+    return value, size
+
+
+def _extend(bits: int, size: int) -> int:
+    """The value of the additional bits, inverse of :func:_value_bits."""
+    if size and bits < 1 << (size - 1):
+        return bits - (1 << size) + 1
+    return bits
+
+
+def block_symbols(
+    sequence: np.ndarray,
+    prediction: int,
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    The symbols describing a block in a JPEG file.
+
+    The first symbol is the size of the difference between the DC
+    coefficient and its prediction, the next symbols are the run of zeros and
+    size of the non-zero AC coefficients, with markers for 16 zeros and the
+    end of the block.
+
+    Parameters
+    ----------
+    sequence : np.ndarray
+        The quantized, zigzag ordered coefficients of the block.
+    prediction : int
+        The DC coefficient of the previous block of the component.
+
+    Yields
+    ------
+    Tuple[int, int, int] : The symbol, the additional bits following the
+    symbol and the number of those bits.
+    """
+    bits, size = _value_bits(int(sequence[0]) - prediction)
+    if size > MAX_DC_SIZE:
+        raise ValueError(f'DC difference out of baseline range: {size} bits')
+    yield size, bits, size
+
+    previous = 0
+    for idx in np.flatnonzero(sequence[1:]) + 1:
+        runlength = idx - previous - 1
+        while runlength > 15:
+            yield ZRL, 0, 0
+            runlength -= 16
+        bits, size = _value_bits(int(sequence[idx]))
+        if size > MAX_AC_SIZE:
+            raise ValueError(f'AC value out of baseline range: {size} bits')
+        yield (runlength << 4) | size, bits, size
+        previous = idx
+    if previous < len(sequence) - 1:
+        yield EOB, 0, 0
+
+
+def _scan_symbols(
+    image: JFIFImage,
+    restart_interval: int = 0,
+) -> Iterator[Tuple[int, int, Iterator[Tuple[int, int, int]]]]:
+    """
+    The restart interval index, the component index and the symbols of every
+    block of the (interleaved) scan of all components.
+    """
+    interval_idx = -1
+    mcus = _scan_order(image, range(len(image.components)))
+    for mcu_idx, mcu in enumerate(mcus):
+        if mcu_idx == 0 or (
+            restart_interval and mcu_idx % restart_interval == 0
+        ):
+            interval_idx += 1
+            predictions = [0] * len(image.components)
+        for component_idx, row, col in mcu:
+            sequence = image.components[component_idx].coefficients[row, col]
+            yield interval_idx, component_idx, block_symbols(
+                sequence, predictions[component_idx])
+            predictions[component_idx] = int(sequence[0])
+
+
+def _optimized_tables(
+    image: JFIFImage,
+    table_ids: Sequence[int],
+    restart_interval: int,
+) -> Dict[int, Tuple[HuffmanTable, HuffmanTable]]:
+    """The optimized DC and AC tables per table id."""
+    frequencies = {
+        table_id: (np.zeros(256, dtype=int), np.zeros(256, dtype=int))
+        for table_id in set(table_ids)
+    }
+    for _, component_idx, symbols in _scan_symbols(image, restart_interval):
+        dc_frequencies, ac_frequencies = frequencies[table_ids[component_idx]]
+        dc_symbol, _, _ = next(symbols)
+        dc_frequencies[dc_symbol] += 1
+        for symbol, _, _ in symbols:
+            ac_frequencies[symbol] += 1
+    return {
+        table_id: tuple(
+            HuffmanTable.from_frequencies(
+                table_frequencies, reserve_all_ones=True)
+            if table_frequencies.any() else HuffmanTable(
+                [1] + [0] * 15, [EOB])
+            for table_frequencies in table_frequencies_pair
+        )
+        for table_id, table_frequencies_pair in frequencies.items()
+    }
+
+
+def _encode_scan(
+    image: JFIFImage,
+    tables: Sequence[Tuple[HuffmanTable, HuffmanTable]],
+    restart_interval: int = 0,
+) -> bytes:
+    """
+    The byte stuffed, entropy coded data of the (interleaved) scan of all
+    components.
+    """
+    intervals = []
+    writer = BitWriter()
+    for interval_idx, component_idx, symbols in _scan_symbols(
+        image, restart_interval
+    ):
+        if interval_idx > len(intervals):
+            intervals.append(_flush_interval(writer))
+            writer = BitWriter()
+        dc_table, ac_table = tables[component_idx]
+        for table, (symbol, bits, n_bits) in zip(
+            chain([dc_table], repeat(ac_table)), symbols
+        ):
+            code = table.codes[symbol]
+            if code is None:
+                raise ValueError(
+                    f'Symbol not in Huffman table: {symbol:#04x}')
+            writer.write((code[0] << n_bits) | bits, code[1] + n_bits)
+    intervals.append(_flush_interval(writer))
+    return b''.join(
+        interval + (
+            bytes([0xFF, RST0 + interval_idx % 8])
+            if interval_idx < len(intervals) - 1 else b''
+        )
+        for interval_idx, interval in enumerate(intervals)
+    )
+
+
+def _flush_interval(writer: BitWriter) -> bytes:
+    """The byte stuffed data of a restart interval."""
+    # The last byte is padded with ones.
+    n_padding = -len(writer) % 8
+    writer.write((1 << n_padding) - 1, n_padding)
+    return writer.getvalue().replace(b'\xff', b'\xff\x00')
+
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    """A marker segment: the marker, the length and the payload."""
+    return bytes([0xFF, marker]) + (len(payload) + 2).to_bytes(2, 'big') + (
+        payload)
+
+
+def _table_payload(table: HuffmanTable) -> bytes:
+    """The counts and symbols of a Huffman table."""
+    return bytes(table.counts) + bytes(table.symbols)
+
+
+def write_jfif(
+    image: JFIFImage,
+    *,
+    optimize: bool = False,
+    restart_interval: Optional[int] = None
+) -> bytes:
+    """
+    Write a baseline JFIF file.
+
+    Parameters
+    ----------
+    image : JFIFImage
+        The image in the coefficient domain, with one (grayscale) or three
+        (YCbCr) components.
+    optimize : bool, optional (default : False)
+        If true, use Huffman tables optimized for this image, otherwise the
+        typical tables of the standard.
+    restart_interval : Optional[int], optional (default : None)
+        The number of minimum coded units between restart markers, if None
+        no restart markers.
+
+    Returns
+    -------
+    bytes : The JFIF file.
+    """
+    if len(image.components) not in (1, 3):
+        raise ValueError(
+            f'Expecting 1 or 3 components: {len(image.components)}')
+    n_rows, n_cols = image.mcu_shape()
+    for component in image.components:
+        expected = (
+            n_rows * component.factors[0],
+            n_cols * component.factors[1],
+            PATCH_SIZE ** 2,
+        )
+        if len(image.components) == 1:
+            expected = image.component_shape(0) + (PATCH_SIZE ** 2,)
+        if component.coefficients.shape != expected:
+            raise ValueError(
+                f'Expecting coefficients of shape {expected}: '
+                f'{component.coefficients.shape}'
+            )
+
+    # The quantization tables, shared by components with the same table.
+    quantizations: List[np.ndarray] = []
+    quantization_ids = []
+    for component in image.components:
+        quantization = np.asarray(component.quantization)
+        if (
+            quantization.shape != (PATCH_SIZE, PATCH_SIZE) or
+            not np.array_equal(quantization, np.rint(quantization)) or
+            quantization.min() < 1 or
+            quantization.max() > 255
+        ):
+            raise ValueError(
+                'Expecting an 8 by 8 quantization table of integers in '
+                f'[1, 255]: {quantization}'
+            )
+        for table_id, other in enumerate(quantizations):
+            if np.array_equal(quantization, other):
+                break
+        else:
+            table_id = len(quantizations)
+            quantizations.append(quantization)
+        quantization_ids.append(table_id)
+
+    if restart_interval is not None and not 0 < restart_interval < 1 << 16:
+        raise ValueError(
+            f'Expecting a restart interval in [1, 65535]: {restart_interval}')
+
+    # The luminance tables for the first component, the chrominance tables
+    # for the others.
+    table_ids = [0] + [1] * (len(image.components) - 1)
+    if optimize:
+        tables = _optimized_tables(image, table_ids, restart_interval or 0)
+    else:
+        tables = {
+            0: (DC_LUMINANCE_TABLE, AC_LUMINANCE_TABLE),
+            1: (DC_CHROMINANCE_TABLE, AC_CHROMINANCE_TABLE),
+        }
+    scan = _encode_scan(
+        image,
+        [tables[table_id] for table_id in table_ids],
+        restart_interval or 0,
+    )
+
+    # JFIF version 1.01, no units, an aspect ratio of 1 and no thumbnail.
+    segments = [
+        bytes([0xFF, SOI]),
+        _segment(APP0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'),
+    ]
+    for table_id, quantization in enumerate(quantizations):
+        values = zigzag_blocks(quantization.astype(int))
+        segments.append(
+            _segment(DQT, bytes([table_id]) + bytes(values.tolist())))
+    frame = bytes([8]) + image.height.to_bytes(2, 'big') + (
+        image.width.to_bytes(2, 'big')) + bytes([len(image.components)])
+    for component_idx, component in enumerate(image.components):
+        factor_ver, factor_hor = component.factors
+        frame += bytes([
+            component_idx + 1,
+            (factor_hor << 4) | factor_ver,
+            quantization_ids[component_idx],
+        ])
+    segments.append(_segment(SOF0, frame))
+    if restart_interval is not None:
+        segments.append(
+            _segment(DRI, restart_interval.to_bytes(2, 'big')))
+    for table_id in sorted(set(table_ids)):
+        dc_table, ac_table = tables[table_id]
+        segments.append(_segment(
+            DHT,
+            bytes([table_id]) + _table_payload(dc_table) +
+            bytes([0x10 | table_id]) + _table_payload(ac_table)
+        ))
+    scan_header = bytes([len(image.components)])
+    for component_idx, table_id in enumerate(table_ids):
+        scan_header += bytes([component_idx + 1, (table_id << 4) | table_id])
+    segments.append(_segment(SOS, scan_header + bytes([0, 63, 0])))
+    segments.append(scan)
+    segments.append(bytes([0xFF, EOI]))
+    return b''.join(segments)
+
+
+def _scan_intervals(data: bytes, start: int) -> Tuple[List[bytes], int]:
+    """
+    The entropy coded data of a scan, split at the restart markers and
+    unstuffed. Also, the position of the marker ending the scan.
+    """
+    intervals = []
+    interval_start = position = start
+    while True:
+        position = data.find(b'\xff', position)
+        if position < 0 or position + 1 >= len(data):
+            raise ValueError('Unexpected end of file in scan.')
+        marker = data[position + 1]
+        if marker == 0x00:
+            position += 2
+            continue
+        if marker == 0xFF:
+            position += 1
+            continue
+        intervals.append(
+            data[interval_start: position].replace(b'\xff\x00', b'\xff'))
+        if RST0 <= marker <= RST7:
+            position += 2
+            interval_start = position
+            continue
+        return intervals, position
+
+
+def _decode_block(
+    reader: BitReader,
+    sequence: np.ndarray,
+    prediction: int,
+    dc_table: HuffmanTable,
+    ac_table: HuffmanTable,
+) -> int:
+    """
+    Decode a block into the sequence, see :func:block_symbols.
+
+    Returns
+    -------
+    int : The DC coefficient.
+    """
+    read = reader.read
+    peek = reader.peek
+
+    entry = dc_table.lookup[peek(dc_table.max_length)]
+    if entry is None:
+        raise ValueError(f'Invalid Huffman code at position {reader.position}')
+    _, size, length = entry
+    reader.position += length
+    dc = prediction + _extend(read(size), size)
+    sequence[0] = dc
+
+    lookup = ac_table.lookup
+    max_length = ac_table.max_length
+    idx = 1
+    while idx < 64:
+        entry = lookup[peek(max_length)]
+        if entry is None:
+            raise ValueError(
+                f'Invalid Huffman code at position {reader.position}')
+        runlength, size, length = entry
+        reader.position += length
+        if size == 0:
+            if runlength != 15:
+                break   # end of block
+            idx += 16
+            continue
+        idx += runlength
+        if idx > 63:
+            raise ValueError('Too many coefficients in block.')
+        sequence[idx] = _extend(read(size), size)
+        idx += 1
+    return dc
+
+
+def read_jfif(data: bytes) -> JFIFImage:
+    """
+    Read a baseline JPEG file into the coefficient domain.
+
+    Parameters
+    ----------
+    data : bytes
+        The JPEG file.
+
+    Returns
+    -------
+    JFIFImage : The image in the coefficient domain.
+    """
+    data = bytes(data)
+    if data[:2] != bytes([0xFF, SOI]):
+        raise ValueError('Expecting a JPEG file: no start of image marker.')
+
+    quantizations: Dict[int, np.ndarray] = {}
+    tables: Dict[Tuple[int, int], HuffmanTable] = {}
+    frame: Optional[List[Tuple[int, Tuple[int, int], int]]] = None
+    image = None
+    restart_interval = 0
+    position = 2
+    while True:
+        position = data.find(b'\xff', position)
+        while 0 <= position < len(data) - 1 and data[position + 1] == 0xFF:
+            position += 1   # fill bytes
+        if position < 0 or position + 1 >= len(data):
+            raise ValueError('Unexpected end of file: no end of image marker.')
+        marker = data[position + 1]
+        if marker == EOI:
+            break
+        length = int.from_bytes(data[position + 2: position + 4], 'big')
+        payload = data[position + 4: position + 2 + length]
+        position += 2 + length
+
+        if marker in UNSUPPORTED_SOF:
+            raise ValueError(
+                f'Only baseline JPEG files are supported: {marker:#04x}')
+        elif marker in (SOF0, SOF1):
+            if payload[0] != 8:
+                raise ValueError(f'Expecting 8-bit samples: {payload[0]}')
+            height = int.from_bytes(payload[1:3], 'big')
+            width = int.from_bytes(payload[3:5], 'big')
+            if height == 0:
+                raise ValueError('Expecting the height in the frame header.')
+            frame = [
+                (
+                    payload[idx],
+                    (payload[idx + 1] & 0x0F, payload[idx + 1] >> 4),
+                    payload[idx + 2],
+                )
+                for idx in range(6, 6 + 3 * payload[5], 3)
+            ]
+        elif marker == DQT:
+            idx = 0
+            while idx < len(payload):
+                precision, table_id = payload[idx] >> 4, payload[idx] & 0x0F
+                n_bytes = 2 if precision else 1
+                values = np.frombuffer(
+                    payload[idx + 1: idx + 1 + 64 * n_bytes],
+                    dtype='>u2' if precision else 'u1',
+                )
+                quantizations[table_id] = izigzag_blocks(values.astype(int))
+                idx += 1 + 64 * n_bytes
+        elif marker == DHT:
+            idx = 0
+            while idx < len(payload):
+                table_class, table_id = payload[idx] >> 4, payload[idx] & 0x0F
+                counts = list(payload[idx + 1: idx + 17])
+                symbols = list(payload[idx + 17: idx + 17 + sum(counts)])
+                tables[table_class, table_id] = HuffmanTable(counts, symbols)
+                idx += 17 + sum(counts)
+        elif marker == DRI:
+            restart_interval = int.from_bytes(payload[:2], 'big')
+        elif marker == SOS:
+            if frame is None:
+                raise ValueError('Expecting a frame header before the scan.')
+            if image is None:
+                image = _allocate(height, width, frame, quantizations)
+            identifiers = [identifier for identifier, _, _ in frame]
+            scan = [
+                (
+                    identifiers.index(payload[idx]),
+                    tables[0, payload[idx + 1] >> 4],
+                    tables[1, payload[idx + 1] & 0x0F],
+                )
+                for idx in range(1, 1 + 2 * payload[0], 2)
+            ]
+            intervals, position = _scan_intervals(data, position)
+            _decode_scan(image, scan, intervals, restart_interval)
+
+    if image is None:
+        raise ValueError('Expecting a scan.')
+    return image
+
+
+def _allocate(
+    height: int,
+    width: int,
+    frame: List[Tuple[int, Tuple[int, int], int]],
+    quantizations: Dict[int, np.ndarray],
+) -> JFIFImage:
+    """The image with zero coefficients for the frame."""
+    image = JFIFImage(height, width, tuple(
+        Component(np.zeros((0, 0, 64), dtype=int), quantizations[table_id],
+                  factors)
+        for _, factors, table_id in frame
+    ))
+    n_rows, n_cols = image.mcu_shape()
+    components = []
+    for component_idx, component in enumerate(image.components):
+        if len(frame) == 1:
+            shape = image.component_shape(0)
+        else:
+            shape = (n_rows * component.factors[0],
+                     n_cols * component.factors[1])
+        components.append(component._replace(
+            coefficients=np.zeros(shape + (PATCH_SIZE ** 2,), dtype=int)))
+    return image._replace(components=tuple(components))
+
+
+def _decode_scan(
+    image: JFIFImage,
+    scan: List[Tuple[int, HuffmanTable, HuffmanTable]],
+    intervals: List[bytes],
+    restart_interval: int,
+) -> None:
+    """Decode the entropy coded data of a scan into the coefficients."""
+    component_indices = [component_idx for component_idx, _, _ in scan]
+    component_tables = {
+        component_idx: (dc_table, ac_table)
+        for component_idx, dc_table, ac_table in scan
+    }
+    intervals = iter(intervals)
+    reader = None
+    for mcu_idx, mcu in enumerate(_scan_order(image, component_indices)):
+        if reader is None or (
+            restart_interval and mcu_idx % restart_interval == 0
+        ):
+            interval = next(intervals, None)
+            if interval is None:
+                raise ValueError('Unexpected end of scan.')
+            reader = BitReader(interval)
+            predictions = dict.fromkeys(component_indices, 0)
+        for component_idx, row, col in mcu:
+            predictions[component_idx] = _decode_block(
+                reader,
+                image.components[component_idx].coefficients[row, col],
+                predictions[component_idx],
+                *component_tables[component_idx]
+            )
+
+
+def compress_jfif(
+    im: np.ndarray,
+    *,
+    quality: int = 75,
+    subsampling: str = '4:2:0',
+    optimize: bool = False,
+    restart_interval: Optional[int] = None,
+    backend: str = 'matrix'
+) -> bytes:
+    """
+    Compress an image into a baseline JFIF file.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        The image, a grayscale image with shape (height, width) or a RGB
+        image with shape (height, width, 3). The image is padded by
+        repeating the last row and column.
+    quality : int, optional (default : 75)
+        The quality in [1, 100] of the quantization tables, see
+        :func:jpeg.quantization.quantization_table.
+    subsampling : str, optional (default : '4:2:0')
+        The chroma subsampling of a RGB image, see
+        :data:jpeg.color.SUBSAMPLING.
+    optimize : bool, optional (default : False)
+        If true, use Huffman tables optimized for this image.
+    restart_interval : Optional[int], optional (default : None)
+        The number of minimum coded units between restart markers, see
+        :func:write_jfif.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+
+    Returns
+    -------
+    bytes : The JFIF file.
+    """
+    if im.ndim == 2:
+        factors = (1, 1)
+        planes = [im]
+    elif im.ndim == 3 and im.shape[2] == 3:
+        factors = SUBSAMPLING[subsampling]
+        ycbcr = rgb_to_ycbcr(im)
+        planes = [ycbcr[:, :, idx] for idx in range(3)]
+    else:
+        raise ValueError(f'Expecting a grayscale or RGB image: {im.shape}')
+
+    mcu_size = (PATCH_SIZE * factors[0], PATCH_SIZE * factors[1])
+    components = []
+    for component_idx, plane in enumerate(planes):
+        plane = pad(plane, mcu_size)
+        if component_idx == 0:
+            Q = quantization_table(quality)
+            component_factors = factors
+        else:
+            Q = quantization_table(quality, chroma=True)
+            plane = downsample(plane, factors)
+            component_factors = (1, 1)
+        coefficients = quantize_blocks(
+            image_to_blocks(plane - 128.), Q, backend=backend)
+        components.append(Component(coefficients, Q, component_factors))
+    image = JFIFImage(im.shape[0], im.shape[1], tuple(components))
+    return write_jfif(
+        image, optimize=optimize, restart_interval=restart_interval)
+
+
+def decompress_jfif(
+    data: bytes,
+    *,
+    backend: str = 'matrix',
+    scale: float = 1
+) -> np.ndarray:
+    """
+    Decompress a baseline JPEG file.
+
+    Parameters
+    ----------
+    data : bytes
+        The JPEG file.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    scale : float, optional (default : 1)
+        Decompress at a reduced resolution, e.g. 1/2, 1/4 or 1/8, see
+        :func:jpeg.decompress_bytes.
+
+    Returns
+    -------
+    np.ndarray : The uint8 image, with shape (height, width) for a grayscale
+    image and (height, width, 3) for a color image, times the scale (rounded
+    up).
+    """
+    image = read_jfif(data)
+    if len(image.components) not in (1, 3):
+        raise ValueError(
+            f'Expecting 1 or 3 components: {len(image.components)}')
+
+    size = scaled_size(scale)
+    shape = (
+        -(-image.height * size // PATCH_SIZE),
+        -(-image.width * size // PATCH_SIZE),
+    )
+    max_ver, max_hor = image.max_factors
+    planes = []
+    for component in image.components:
+        factor_ver, factor_hor = component.factors
+        if max_ver % factor_ver or max_hor % factor_hor:
+            raise ValueError(
+                f'Unsupported sampling factors: {component.factors}')
+        blocks = dequantize_blocks(
+            component.coefficients,
+            component.quantization,
+            backend=backend,
+            scale=scale,
+        )
+        plane = blocks_to_image(blocks) + 128
+        planes.append(upsample(
+            plane, (max_ver // factor_ver, max_hor // factor_hor), shape))
+
+    if len(planes) == 1:
+        im = planes[0]
+    else:
+        im = ycbcr_to_rgb(np.stack(planes, axis=2))
+    return np.clip(np.rint(im), 0, 255).astype(np.uint8)
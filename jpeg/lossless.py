@@ -0,0 +1,492 @@
+"""
+Lossless transforms of compressed images, like jpegtran.
+
+The transforms rearrange the quantized coefficients after entropy decoding
+and encode them again: the pixels are never reconstructed, so there is no
+generation loss and no transform cost. Mirroring a block negates its
+coefficients of odd frequency along the mirrored axis, transposing a block
+transposes its coefficients.
+
+A transform is exact when the edges which move to the top or left of the
+image are whole blocks (minimum coded units for a subsampled color image).
+Otherwise it raises a ValueError, or drops the partial edge blocks with
+`trim`.
+"""
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+
+import numpy as np
+
+from . import (
+    _component_streams,
+    _decode_coefficients,
+    _encode_coefficients,
+    _interleave,
+)
+from .bitstream import (
+    BitReader,
+    BitWriter,
+)
+from .header import (
+    PATCH_SIZE,
+    Header,
+    read_header,
+    write_header,
+)
+from .jfif import (
+    Component,
+    JFIFImage,
+    read_jfif,
+    write_jfif,
+)
+from .utils import (
+    izigzag_blocks,
+    zigzag_blocks,
+)
+
+
+def _signs(axis: int) -> np.ndarray:
+    """
+    The zigzag ordered signs of the coefficients of a block mirrored along an
+    axis: the coefficients of odd frequency change sign.
+    """
+    signs = np.ones((PATCH_SIZE, PATCH_SIZE), dtype=np.int8)
+    if axis == 0:
+        signs[1::2, :] = -1
+    else:
+        signs[:, 1::2] = -1
+    return zigzag_blocks(signs)
+
+
+# The coefficients of the mirrored and transposed blocks.
+_VERTICAL_SIGNS = _signs(0)
+_HORIZONTAL_SIGNS = _signs(1)
+_TRANSPOSED = zigzag_blocks(izigzag_blocks(np.arange(PATCH_SIZE ** 2)).T)
+
+
+def _flip_horizontal(coefficients: np.ndarray) -> np.ndarray:
+    return coefficients[:, ::-1] * _HORIZONTAL_SIGNS
+
+
+def _flip_vertical(coefficients: np.ndarray) -> np.ndarray:
+    return coefficients[::-1] * _VERTICAL_SIGNS
+
+
+def _transpose(coefficients: np.ndarray) -> np.ndarray:
+    return coefficients.transpose(1, 0, 2)[..., _TRANSPOSED]
+
+
+# Every operation is a sequence of elementary operations, a rotation
+# clockwise by 90 degrees is a transpose followed by a horizontal flip.
+OPERATIONS: Dict[str, Tuple[str, ...]] = {
+    'flip_horizontal': ('flip_horizontal',),
+    'flip_vertical': ('flip_vertical',),
+    'transpose': ('transpose',),
+    'rotate_90': ('transpose', 'flip_horizontal'),
+    'rotate_180': ('flip_horizontal', 'flip_vertical'),
+    'rotate_270': ('transpose', 'flip_vertical'),
+}
+
+_ELEMENTARY: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    'flip_horizontal': _flip_horizontal,
+    'flip_vertical': _flip_vertical,
+    'transpose': _transpose,
+}
+
+
+def _check_operation(operation: str) -> None:
+    if operation not in OPERATIONS:
+        raise ValueError(
+            f'Expecting an operation in {sorted(OPERATIONS)}: {operation}')
+
+
+def transform_blocks(coefficients: np.ndarray, operation: str) -> np.ndarray:
+    """
+    Transform the quantized coefficients of all blocks of an image.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        The quantized, zigzag ordered coefficients with shape (n_ver_blocks,
+        n_hor_blocks, 64).
+    operation : str
+        The operation, see :data:OPERATIONS.
+
+    Returns
+    -------
+    np.ndarray : The coefficients of the transformed image.
+    """
+    _check_operation(operation)
+    if coefficients.ndim != 3 or coefficients.shape[2] != PATCH_SIZE ** 2:
+        raise ValueError(
+            f'Expecting coefficients of shape (n_ver_blocks, n_hor_blocks, '
+            f'{PATCH_SIZE ** 2}): {coefficients.shape}'
+        )
+    for name in OPERATIONS[operation]:
+        coefficients = _ELEMENTARY[name](coefficients)
+    return coefficients
+
+
+def _block_factors(image: JFIFImage) -> List[Tuple[int, int]]:
+    """
+    The number of block rows and columns of every component per unit: its
+    sampling factors, or one block for a single component, which is not
+    interleaved whatever its factors (like libjpeg).
+    """
+    if len(image.components) == 1:
+        return [(1, 1)]
+    return [component.factors for component in image.components]
+
+
+def _units(image: JFIFImage) -> Tuple[int, int]:
+    """The height and width of the units of the image: its blocks or MCUs."""
+    factors = _block_factors(image)
+    return (
+        PATCH_SIZE * max(factor_ver for factor_ver, _ in factors),
+        PATCH_SIZE * max(factor_hor for _, factor_hor in factors),
+    )
+
+
+def crop_image(
+    image: JFIFImage,
+    y0: int,
+    x0: int,
+    height: int,
+    width: int,
+) -> JFIFImage:
+    """
+    Crop an image in the coefficient domain.
+
+    Parameters
+    ----------
+    image : JFIFImage
+        The image.
+    y0 : int
+        The first row, a multiple of the unit height: 8 times the largest
+        vertical sampling factor, 8 for a single component.
+    x0 : int
+        The first column, a multiple of the unit width.
+    height : int
+        The height of the cropped image.
+    width : int
+        The width of the cropped image.
+
+    Returns
+    -------
+    JFIFImage : The cropped image.
+    """
+    unit_height, unit_width = _units(image)
+    if y0 % unit_height or x0 % unit_width:
+        raise ValueError(
+            f'Expecting the crop to start at a multiple of {unit_height} by '
+            f'{unit_width}: {y0}, {x0}'
+        )
+    if (
+        y0 < 0 or x0 < 0 or height < 1 or width < 1 or
+        y0 + height > image.height or x0 + width > image.width
+    ):
+        raise ValueError(
+            f'Crop ({y0}, {x0}, {height}, {width}) outside the image of '
+            f'{image.height} by {image.width}'
+        )
+
+    components = []
+    for component, (factor_ver, factor_hor) in zip(
+        image.components, _block_factors(image)
+    ):
+        row = y0 // unit_height * factor_ver
+        col = x0 // unit_width * factor_hor
+        n_rows = -(-height // unit_height) * factor_ver
+        n_cols = -(-width // unit_width) * factor_hor
+        components.append(component._replace(
+            coefficients=component.coefficients[
+                row: row + n_rows, col: col + n_cols]
+        ))
+    return JFIFImage(height, width, tuple(components))
+
+
+def _trim(image: JFIFImage, operation: str, trim: bool) -> JFIFImage:
+    """
+    Drop the partial edge blocks which the operation moves to the top or
+    left, or raise a ValueError if not `trim`.
+    """
+    unit_height, unit_width = _units(image)
+    height, width = image.height, image.width
+    transposed = False
+    for name in OPERATIONS[operation]:
+        if name == 'transpose':
+            transposed = not transposed
+            unit_height, unit_width = unit_width, unit_height
+            height, width = width, height
+        elif name == 'flip_horizontal':
+            width -= width % unit_width
+        else:
+            height -= height % unit_height
+    if transposed:
+        height, width = width, height
+    if (height, width) == (image.height, image.width):
+        return image
+    if not trim or height == 0 or width == 0:
+        raise ValueError(
+            f'The {operation} of an image of {image.height} by {image.width} '
+            'is not exact, the edges are partial blocks.'
+        )
+    return crop_image(image, 0, 0, height, width)
+
+
+def transform_image(
+    image: JFIFImage,
+    operation: str,
+    *,
+    trim: bool = False
+) -> JFIFImage:
+    """
+    Transform an image in the coefficient domain.
+
+    Parameters
+    ----------
+    image : JFIFImage
+        The image.
+    operation : str
+        The operation, see :data:OPERATIONS.
+    trim : bool, optional (default : False)
+        If true, drop the partial edge blocks which would move to the top or
+        left of the image, otherwise raise a ValueError for them.
+
+    Returns
+    -------
+    JFIFImage : The transformed image.
+    """
+    _check_operation(operation)
+    image = _trim(image, operation, trim)
+    transposed = 'transpose' in OPERATIONS[operation]
+    components = []
+    for component in image.components:
+        quantization = component.quantization
+        factors = component.factors
+        if transposed:
+            factors = factors[::-1]
+            if quantization is not None:
+                quantization = np.asarray(quantization).T
+        components.append(Component(
+            transform_blocks(component.coefficients, operation),
+            quantization,
+            factors,
+        ))
+    if transposed:
+        return JFIFImage(image.width, image.height, tuple(components))
+    return image._replace(components=tuple(components))
+
+
+def _read_image(data: bytes) -> Tuple[JFIFImage, List[Header]]:
+    """
+    The image in the coefficient domain and the headers of its components.
+    The quantization of a component is None if it is not stored.
+    """
+    header = read_header(BitReader(data))
+    if header.components is None:
+        streams = [data]
+        factors = [(1, 1)]
+    else:
+        streams = _component_streams(data, header)
+        factors = [header.subsampling, (1, 1), (1, 1)]
+
+    components = []
+    headers = []
+    for stream, component_factors in zip(streams, factors):
+        component_header, coefficients = _decode_coefficients(stream)
+        quantization = None
+        if component_header.quantization is not None:
+            quantization = np.array(component_header.quantization).reshape(
+                PATCH_SIZE, PATCH_SIZE)
+        components.append(
+            Component(coefficients, quantization, component_factors))
+        headers.append(component_header)
+    image = JFIFImage(header.height, header.width, tuple(components))
+    return image, headers
+
+
+def _write_image(image: JFIFImage, headers: List[Header]) -> bytes:
+    """
+    Encode the image like the components of the headers, inverse of
+    :func:_read_image.
+    """
+    streams = []
+    for component_idx, (component, header) in enumerate(
+        zip(image.components, headers)
+    ):
+        n_rows, n_cols = image.component_shape(component_idx)
+        quantization = None
+        if component.quantization is not None:
+            quantization = tuple(
+                np.asarray(component.quantization).ravel().tolist())
+        streams.append(_encode_coefficients(
+            component.coefficients[:n_rows, :n_cols],
+            header._replace(quantization=quantization),
+        ))
+    if len(streams) == 1:
+        return streams[0]
+
+    header = Header(
+        image.height,
+        image.width,
+        subsampling=image.components[0].factors,
+        components=tuple(len(stream) for stream in streams),
+        bands=headers[0].bands,
+    )
+    writer = BitWriter()
+    write_header(writer, header)
+    if header.bands is not None:
+        return writer.getvalue() + _interleave(streams)
+    return writer.getvalue() + b''.join(streams)
+
+
+def _check_gray_shape(image: JFIFImage) -> None:
+    """A grayscale image is whole blocks."""
+    if len(image.components) == 1 and (
+        image.height % PATCH_SIZE or image.width % PATCH_SIZE
+    ):
+        raise ValueError(
+            f'Expecting a multiple of {PATCH_SIZE} for the shape of a '
+            f'grayscale image: {image.height}, {image.width}'
+        )
+
+
+def transform_bytes(
+    data: bytes,
+    operation: str,
+    *,
+    trim: bool = False
+) -> bytes:
+    """
+    Transform a compressed image without decompressing it.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed image, see :func:jpeg.compress_bytes.
+    operation : str
+        The operation, see :data:OPERATIONS.
+    trim : bool, optional (default : False)
+        If true, drop the partial edge blocks, see :func:transform_image.
+
+    Returns
+    -------
+    bytes : The transformed image, with the restart interval, index and
+    (optimized) table options of the original. A transposed or rotated image
+    has a transposed quantization matrix: if the matrix is not stored in the
+    image, decompress with the transposed matrix.
+    """
+    image, headers = _read_image(data)
+    return _write_image(transform_image(image, operation, trim=trim), headers)
+
+
+def crop_bytes(
+    data: bytes,
+    y0: int,
+    x0: int,
+    height: int,
+    width: int,
+) -> bytes:
+    """
+    Crop a compressed image without decompressing it.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed image, see :func:jpeg.compress_bytes.
+    y0, x0, height, width : int
+        The crop, see :func:crop_image. The height and width of a grayscale
+        image are multiples of 8.
+
+    Returns
+    -------
+    bytes : The cropped image.
+    """
+    image, headers = _read_image(data)
+    image = crop_image(image, y0, x0, height, width)
+    _check_gray_shape(image)
+    return _write_image(image, headers)
+
+
+def transform_jfif(
+    data: bytes,
+    operation: str,
+    *,
+    trim: bool = False,
+    optimize: bool = False
+) -> bytes:
+    """
+    Transform a baseline JPEG file without decompressing it.
+
+    Parameters
+    ----------
+    data : bytes
+        The JPEG file.
+    operation : str
+        The operation, see :data:OPERATIONS.
+    trim : bool, optional (default : False)
+        If true, drop the partial edge blocks, see :func:transform_image.
+    optimize : bool, optional (default : False)
+        If true, use Huffman tables optimized for the image, see
+        :func:jpeg.jfif.write_jfif.
+
+    Returns
+    -------
+    bytes : The transformed JFIF file.
+    """
+    image = transform_image(read_jfif(data), operation, trim=trim)
+    return write_jfif(_fit_jfif(image), optimize=optimize)
+
+
+def crop_jfif(
+    data: bytes,
+    y0: int,
+    x0: int,
+    height: int,
+    width: int,
+    *,
+    optimize: bool = False
+) -> bytes:
+    """
+    Crop a baseline JPEG file without decompressing it.
+
+    Parameters
+    ----------
+    data : bytes
+        The JPEG file.
+    y0, x0, height, width : int
+        The crop, see :func:crop_image.
+    optimize : bool, optional (default : False)
+        If true, use Huffman tables optimized for the image.
+
+    Returns
+    -------
+    bytes : The cropped JFIF file.
+    """
+    image = crop_image(read_jfif(data), y0, x0, height, width)
+    return write_jfif(_fit_jfif(image), optimize=optimize)
+
+
+def _fit_jfif(image: JFIFImage) -> JFIFImage:
+    """
+    Drop the blocks beyond the minimum coded units of an interleaved image,
+    or beyond the image for one component.
+    """
+    if len(image.components) == 1:
+        shapes = [image.component_shape(0)]
+    else:
+        n_rows, n_cols = image.mcu_shape()
+        shapes = [
+            (n_rows * component.factors[0], n_cols * component.factors[1])
+            for component in image.components
+        ]
+    return image._replace(components=tuple(
+        component._replace(
+            coefficients=component.coefficients[:n_rows, :n_cols])
+        for component, (n_rows, n_cols) in zip(image.components, shapes)
+    ))
@@ -0,0 +1,168 @@
+"""
+Incremental decompression of progressive images.
+
+A progressive image (see :func:jpeg.compress_bytes) stores the coefficients
+of all blocks band by band, from low to high frequencies. A prefix of the
+data holds the first bands of the whole image: with the DC coefficients
+only, every block is reconstructed as its average, every further band adds
+detail. A viewer on a slow link shows the coarse image right away and
+refines it while the remainder arrives.
+"""
+from itertools import islice
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from . import (
+    _decode_scan,
+    _header_quantization,
+    _progressive_scans,
+    _reconstruct,
+    _to_rgb,
+)
+from .bitstream import BitReader
+from .header import (
+    PATCH_SIZE,
+    Header,
+    read_header,
+)
+
+
+class ProgressiveDecoder:
+    """
+    Decompress a progressive image while its data arrives.
+
+    Every scan is decoded once, when it is complete. The image is available
+    as soon as the first band of every component arrived.
+
+    Parameters
+    ----------
+    Q : Union[float, np.ndarray], optional (default : 1.)
+        The quantization matrix, unless the header stores one.
+    Q_chroma : Optional[Union[float, np.ndarray]], optional (default : None)
+        The quantization matrix of the chroma of a RGB image, if None `Q` is
+        used.
+    backend : str, optional (default : 'matrix')
+        The transform implementation, see :func:jpeg.freq.dct_blocks.
+    """
+
+    def __init__(
+        self,
+        *,
+        Q: Union[float, np.ndarray] = 1,
+        Q_chroma: Optional[Union[float, np.ndarray]] = None,
+        backend: str = 'matrix'
+    ):
+        self.Q = Q
+        self.Q_chroma = Q if Q_chroma is None else Q_chroma
+        self.backend = backend
+        # The data received so far, appending to it is amortized O(1).
+        self._data = bytearray()
+        self._header: Optional[Header] = None
+        # The header and coefficients of the components, missing bands are 0.
+        self._components: List[Tuple[Header, np.ndarray]] = []
+        self._n_scans = 0
+
+    @property
+    def header(self) -> Optional[Header]:
+        """The header of the image, None until it arrived."""
+        return self._header
+
+    @property
+    def n_bands(self) -> int:
+        """The number of bands decoded of every component."""
+        if self._header is None:
+            return 0
+        return self._n_scans // len(self._header.components or (None,))
+
+    @property
+    def complete(self) -> bool:
+        """Whether all bands are decoded."""
+        return (
+            self._header is not None and
+            self.n_bands == len(self._header.bands)
+        )
+
+    def feed(self, data: bytes) -> int:
+        """
+        Add the next bytes of the compressed image and decode the scans
+        completed by them.
+
+        Parameters
+        ----------
+        data : bytes
+            The next bytes of the compressed image.
+
+        Returns
+        -------
+        int : The number of bands decoded of every component.
+        """
+        self._data += data
+        if self._header is None:
+            try:
+                header = read_header(BitReader(self._data))
+            except EOFError:
+                return 0
+            if header.bands is None:
+                raise ValueError('Expecting a progressive image.')
+            self._header = header
+
+        self._decode_scans()
+        return self.n_bands
+
+    def _decode_scans(self) -> None:
+        """
+        Decode the complete scans not decoded yet. The views of the data are
+        released on return, so that the data can grow.
+        """
+        for component_idx, header, band, scan in islice(
+            _progressive_scans(self._data, self._header), self._n_scans, None
+        ):
+            if component_idx == len(self._components):
+                self._components.append((header, np.zeros(
+                    (header.n_ver_patches * header.n_hor_patches,
+                     PATCH_SIZE ** 2),
+                    dtype=np.int16,
+                )))
+            _, sequences = self._components[component_idx]
+            _decode_scan(scan, header, band, sequences)
+            self._n_scans += 1
+
+    def image(self, *, scale: float = 1) -> Optional[np.ndarray]:
+        """
+        The image from the bands decoded so far.
+
+        Parameters
+        ----------
+        scale : float, optional (default : 1)
+            The reduced resolution, see :func:jpeg.decompress_bytes. With the
+            DC coefficients only, 1/8 gives a pixel per block.
+
+        Returns
+        -------
+        Optional[np.ndarray] : The (coarse) image, the same as
+        :func:jpeg.decompress_bytes once complete. None until the first band
+        of every component arrived.
+        """
+        if self.n_bands == 0:
+            return None
+        Qs = (self.Q, self.Q_chroma, self.Q_chroma)
+        planes = [
+            _reconstruct(
+                sequences,
+                header.n_ver_patches,
+                header.n_hor_patches,
+                _header_quantization(header, Q),
+                self.backend,
+                scale,
+            )
+            for (header, sequences), Q in zip(self._components, Qs)
+        ]
+        if self._header.components is None:
+            return planes[0].astype(int)
+        return _to_rgb(planes, self._header, scale)
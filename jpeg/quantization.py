@@ -1,6 +1,10 @@
+import functools
+
 import numpy as np
 
 
+# The luminance and chrominance tables of the JPEG standard (Annex K), the
+# tables of quality 50.
 quantization_50 = np.array([
     [16, 11, 10, 16, 24, 40, 51, 61],
     [12, 12, 14, 19, 26, 58, 60, 55],
@@ -12,7 +16,72 @@ quantization_50 = np.array([
     [72, 92, 95, 98, 112, 100, 103, 99],
 ])
 
+chroma_quantization_50 = np.array([
+    [17, 18, 24, 47, 99, 99, 99, 99],
+    [18, 21, 26, 66, 99, 99, 99, 99],
+    [24, 26, 56, 99, 99, 99, 99, 99],
+    [47, 66, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+])
+
 
 QUANTIZATION_MATRICES = {
     '50%': quantization_50
 }
+
+# The range of the quality of :func:quantization_table.
+MIN_QUALITY = 1
+MAX_QUALITY = 100
+
+
+def quality_scaling(quality: int) -> int:
+    """
+    The percentage the tables of quality 50 are scaled with (IJG jcparam.c).
+
+    Parameters
+    ----------
+    quality : int
+        The quality in [1, 100].
+
+    Returns
+    -------
+    int : The scaling percentage, 5000 for quality 1 down to 0 for 100.
+    """
+    if not MIN_QUALITY <= quality <= MAX_QUALITY:
+        raise ValueError(
+            f'Quality should be in [{MIN_QUALITY}, {MAX_QUALITY}]: {quality}')
+    if quality < 50:
+        return 5000 // quality
+    return 200 - 2 * quality
+
+
+@functools.lru_cache(maxsize=None)
+def quantization_table(
+    quality: int = 50,
+    *,
+    chroma: bool = False
+) -> np.ndarray:
+    """
+    The cached (read-only) quantization table of a quality.
+
+    The tables of quality 50 are scaled like the Independent JPEG Group's
+    libjpeg does, the entries are limited to [1, 255] (baseline).
+
+    Parameters
+    ----------
+    quality : int, optional (default : 50)
+        The quality in [1, 100], higher is better.
+    chroma : bool, optional (default : False)
+        If true, the chrominance table, otherwise the luminance table.
+
+    Returns
+    -------
+    np.ndarray : The 8 by 8 quantization table.
+    """
+    base = chroma_quantization_50 if chroma else quantization_50
+    table = np.clip((base * quality_scaling(quality) + 50) // 100, 1, 255)
+    table.setflags(write=False)
+    return table
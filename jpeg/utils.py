@@ -1,3 +1,4 @@
+import functools
 import math
 
 import numpy as np
@@ -25,6 +26,54 @@ def generate_patches(im: np.ndarray, *, patch_size: int = 8) -> np.ndarray:
             yield im[y: y + patch_size, x: x + patch_size]
 
 
+def image_to_blocks(im: np.ndarray, *, patch_size: int = 8) -> np.ndarray:
+    """
+    View an image as a grid of patches.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        Image, its height and width should be multiples of the patch size.
+    patch_size, optional (default : 8)
+        Patch size.
+
+    Returns
+    -------
+    np.ndarray : The blocks with shape (height / patch_size, width /
+    patch_size, patch_size, patch_size).
+    """
+    if len(im.shape) != 2:
+        raise ValueError(f'Expecting 2D image: {im.shape}')
+    height, width = im.shape
+    if height % patch_size or width % patch_size:
+        raise ValueError(
+            f'Image shape should be a multiple of {patch_size}: {im.shape}')
+    return im.reshape(
+        height // patch_size, patch_size, width // patch_size, patch_size
+    ).swapaxes(1, 2)
+
+
+def blocks_to_image(blocks: np.ndarray) -> np.ndarray:
+    """
+    Inverse of :func:image_to_blocks.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The blocks with shape (n_ver_patches, n_hor_patches, patch_size,
+        patch_size).
+
+    Returns
+    -------
+    np.ndarray : The image.
+    """
+    if len(blocks.shape) != 4:
+        raise ValueError(f'Expecting 4D blocks: {blocks.shape}')
+    n_ver, n_hor, patch_height, patch_width = blocks.shape
+    return blocks.swapaxes(1, 2).reshape(
+        n_ver * patch_height, n_hor * patch_width)
+
+
 def bits_to_int(bits: str) -> int:
     """
     Convert a bit string to an integer.
@@ -71,31 +120,116 @@ def int_to_bits(int_: int) -> str:
     return bits
 
 
-def zigzag_patch(patch: np.ndarray) -> np.array:
+@functools.lru_cache(maxsize=None)
+def zigzag_indices(patch_size: int = 8) -> np.ndarray:
     """
-    Reorders the elements in a patch in a zigzag order.
+    The (flat) indices of a patch in zigzag order.
 
     Parameters
     ----------
-    patch : np.ndarray
-        The patch.
+    patch_size : int, optional (default : 8)
+        The patch size.
 
     Returns
     -------
-    np.array : The elements of the patch (in zigzag order).
+    np.ndarray : The (read-only) indices of the flattened patch.
 
     Source
     ------
     https://en.wikipedia.org/wiki/File:JPEG_ZigZag.svg
     """
-    if not patch.shape == (8, 8):
-        raise ValueError(f'Patch should have shape (8, 8): {patch.shape}')
-    patch_90 = np.rot90(patch)
-    return np.concatenate([
+    indices = []
+    for diagonal in range(2 * patch_size - 1):
+        rows = range(
+            max(0, diagonal - patch_size + 1),
+            min(diagonal, patch_size - 1) + 1
+        )
         # The direction of the diagonal is alternated for the zigzag order
-        patch_90.diagonal(index)[::-1 if index % 2 else 1]
-        for index in range(-7, 8)
-    ])
+        if diagonal % 2 == 0:
+            rows = reversed(rows)
+        indices.extend(row * patch_size + diagonal - row for row in rows)
+    indices = np.array(indices)
+    indices.setflags(write=False)
+    return indices
+
+
+@functools.lru_cache(maxsize=None)
+def izigzag_indices(patch_size: int = 8) -> np.ndarray:
+    """
+    The indices of a zigzag ordered vector in (flat) patch order.
+
+    Parameters
+    ----------
+    patch_size : int, optional (default : 8)
+        The patch size.
+
+    Returns
+    -------
+    np.ndarray : The (read-only) indices of the zigzag ordered vector.
+    """
+    indices = np.argsort(zigzag_indices(patch_size))
+    indices.setflags(write=False)
+    return indices
+
+
+def zigzag_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    Reorders the elements of all patches in a zigzag order.
+
+    Parameters
+    ----------
+    blocks : np.ndarray
+        The blocks, the last two axes are a (square) patch.
+
+    Returns
+    -------
+    np.ndarray : The elements of the patches (in zigzag order), the last two
+    axes are replaced by one axis.
+    """
+    patch_size = blocks.shape[-1]
+    if blocks.ndim < 2 or blocks.shape[-2] != patch_size:
+        raise ValueError(f'Patches should be square: {blocks.shape}')
+    vectors = blocks.reshape(blocks.shape[:-2] + (patch_size ** 2,))
+    return vectors[..., zigzag_indices(patch_size)]
+
+
+def izigzag_blocks(vectors: np.ndarray) -> np.ndarray:
+    """
+    Inverse of :func:zigzag_blocks.
+
+    Parameters
+    ----------
+    vectors : np.ndarray
+        The zigzag ordered vectors, the last axis is a vector.
+
+    Returns
+    -------
+    np.ndarray : The patches, the last axis is replaced by two axes.
+    """
+    patch_size = int(round(math.sqrt(vectors.shape[-1])))
+    if patch_size ** 2 != vectors.shape[-1]:
+        raise ValueError(
+            f'Vector length should be a square: {vectors.shape[-1]}')
+    patches = vectors[..., izigzag_indices(patch_size)]
+    return patches.reshape(vectors.shape[:-1] + (patch_size, patch_size))
+
+
+def zigzag_patch(patch: np.ndarray) -> np.array:
+    """
+    Reorders the elements in a patch in a zigzag order.
+
+    Parameters
+    ----------
+    patch : np.ndarray
+        The (square) patch.
+
+    Returns
+    -------
+    np.array : The elements of the patch (in zigzag order).
+    """
+    if patch.ndim != 2:
+        raise ValueError(f'Patch should be 2D: {patch.shape}')
+    return zigzag_blocks(patch)
 
 
 def izigzag_patch(vector: np.array) -> np.ndarray:
@@ -105,19 +239,14 @@ def izigzag_patch(vector: np.array) -> np.ndarray:
     Parameters
     ----------
     vector : np.array
-        The vector to be converted in a 8 by 8 patch
+        The vector to be converted in a patch, e.g. a vector of length 64 is
+        converted in a 8 by 8 patch.
 
     Returns
     -------
-    np.ndarray : The 8 by 8 patch.
-    """
-    if not len(vector) == 64:
-        raise ValueError('Only implemented for a vector of length 64')
-
-    indices = [
-        0, 1, 5, 6, 14, 15, 27, 28, 2, 4, 7, 13, 16, 26, 29, 42, 3, 8,
-        12, 17, 25, 30, 41, 43, 9, 11, 18, 24, 31, 40, 44, 53, 10, 19, 23, 32,
-        39, 45, 52, 54, 20, 22, 33, 38, 46, 51, 55, 60, 21, 34, 37, 47, 50, 56,
-        59, 61, 35, 36, 48, 49, 57, 58, 62, 63
-    ]
-    return vector[indices].reshape(8, 8)
+    np.ndarray : The patch.
+    """
+    vector = np.asarray(vector)
+    if vector.ndim != 1:
+        raise ValueError(f'Expecting a vector: {vector.shape}')
+    return izigzag_blocks(vector)
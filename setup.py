@@ -23,6 +23,9 @@ test_requirements = [
     'scipy',
 ]
 extra_requirements = {
+    'benchmark': [
+        'pytest-benchmark',
+    ],
     'dev': [
         'pre-commit',
         'flake8',
@@ -0,0 +1,119 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import numpy as np
+import pytest
+
+import jpeg
+import jpeg.aio
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop (asyncio.run needs Python 3.7)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Count the submitted jobs and the maximum number of running jobs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n_submitted = 0
+        self.n_running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def _count(self, fn):
+        with self._lock:
+            self.n_running += 1
+            self.max_running = max(self.max_running, self.n_running)
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.n_running -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        self.n_submitted += 1
+        return super().submit(self._count, lambda: fn(*args, **kwargs))
+
+
+@pytest.fixture
+def im():
+    x, y = np.meshgrid(np.arange(64), np.arange(48))
+    return (128 + 100 * np.sin(x / 5) * np.cos(y / 7)).astype(int)
+
+
+@pytest.fixture
+def rgb_im():
+    rng = np.random.RandomState(3)
+    return rng.randint(0, 256, (21, 30, 3))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'Q': 4., 'restart_interval': 2},
+    {'quality': 70, 'optimize': True, 'restart_interval': 1, 'index': True},
+])
+def test_compress_decompress_async(im, kwargs):
+    data = run(jpeg.aio.compress_async(im, **kwargs))
+    assert data == jpeg.compress_bytes(im, **kwargs)
+    Q = kwargs.get('Q', 1)
+    im_back = run(jpeg.aio.decompress_async(data, Q=Q))
+    np.testing.assert_array_equal(im_back, jpeg.decompress_bytes(data, Q=Q))
+
+
+def test_compress_decompress_async_color(rgb_im):
+    data = run(jpeg.aio.compress_async(rgb_im, quality=80))
+    assert data == jpeg.compress_bytes(rgb_im, quality=80)
+    np.testing.assert_array_equal(
+        run(jpeg.aio.decompress_async(data)),
+        jpeg.decompress_bytes(data),
+    )
+
+
+def test_async_codec_limits_jobs(im):
+    async def main(codec):
+        return await asyncio.gather(*(
+            codec.compress(im, restart_interval=1) for _ in range(8)))
+
+    with CountingExecutor(8) as executor:
+        codec = jpeg.aio.AsyncCodec(executor, max_jobs=2, max_pending=3)
+        blobs = run(main(codec))
+    assert executor.max_running <= 2
+    assert executor.n_submitted == 8 * 6
+    assert blobs == [jpeg.compress_bytes(im, restart_interval=1)] * 8
+
+
+def test_async_codec_cancel_between_segments(im):
+    async def main(codec):
+        task = asyncio.ensure_future(codec.compress(im, restart_interval=1))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with CountingExecutor(1) as executor:
+        run(main(jpeg.aio.AsyncCodec(executor)))
+    assert executor.n_submitted == 1
+
+
+@pytest.mark.parametrize("index, n_jobs", [(False, 1), (True, 6)])
+def test_async_codec_decompress_segment_jobs(im, index, n_jobs):
+    data = jpeg.compress_bytes(im, restart_interval=1, index=index)
+    with CountingExecutor(1) as executor:
+        im_back = run(
+            jpeg.aio.AsyncCodec(executor).decompress(data))
+    assert executor.n_submitted == n_jobs
+    np.testing.assert_array_equal(im_back, jpeg.decompress_bytes(data))
+
+
+@pytest.mark.parametrize("kwargs", [{'max_jobs': 0}, {'max_pending': 0}])
+def test_async_codec_raises_value_error_limits(kwargs):
+    with pytest.raises(ValueError):
+        jpeg.aio.AsyncCodec(**kwargs)
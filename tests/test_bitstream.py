@@ -0,0 +1,92 @@
+import pytest
+
+from jpeg.bitstream import BitReader, BitWriter
+
+
+def test_write_packs_bits_most_significant_first():
+    writer = BitWriter()
+    writer.write(0b101, 3)
+    writer.write(0b11111, 5)
+    writer.write(0b1, 1)
+    assert len(writer) == 9
+    assert writer.getvalue() == bytes([0b10111111, 0b10000000])
+
+
+def test_write_raises_value_error_value_too_large():
+    with pytest.raises(ValueError):
+        BitWriter().write(4, 2)
+
+
+def test_to_bit_string():
+    writer = BitWriter()
+    writer.write_bits('0010110011')
+    assert writer.to_bit_string() == '0010110011'
+
+
+def test_align():
+    writer = BitWriter()
+    writer.write(1, 1)
+    writer.align()
+    assert len(writer) == 8
+    assert writer.getvalue() == bytes([0b10000000])
+
+
+def test_read_write():
+    values = [(5, 3), (0, 1), (1000, 11), (2 ** 32 - 1, 32), (3, 2)]
+    writer = BitWriter()
+    for value, n_bits in values:
+        writer.write(value, n_bits)
+    reader = BitReader(writer.getvalue())
+    assert [reader.read(n_bits) for _, n_bits in values] == [
+        value for value, _ in values]
+    assert reader.position == len(writer)
+
+
+def test_read_beyond_end_raises_eof_error():
+    reader = BitReader(bytes([1]))
+    reader.read(5)
+    with pytest.raises(EOFError):
+        reader.read(4)
+
+
+def test_reader_from_bit_string():
+    reader = BitReader.from_bit_string('1011')
+    assert reader.read(4) == 0b1011
+    assert reader.bits_remaining == 4
+
+
+def test_peek_does_not_move_position():
+    reader = BitReader(bytes([0b10110000]))
+    reader.read(1)
+    assert reader.peek(3) == 0b011
+    assert reader.position == 1
+
+
+def test_peek_beyond_end_reads_zeros():
+    reader = BitReader(bytes([0b11111111]))
+    reader.read(4)
+    assert reader.peek(8) == 0b11110000
+
+
+def test_take_keeps_partial_byte():
+    writer = BitWriter()
+    writer.write(0b101010101, 9)
+    assert writer.take() == bytes([0b10101010])
+    assert len(writer) == 1
+    writer.write(0, 7)
+    assert writer.take() == bytes([0b10000000])
+    assert writer.getvalue() == b''
+
+
+@pytest.mark.parametrize("n_bits", [0, 3, 8, 13])
+def test_write_packed_same_as_write(n_bits):
+    value = 0b1011001110001 >> (13 - n_bits)
+    expected = BitWriter()
+    expected.write(0b101, 3)
+    expected.write(value, n_bits)
+    writer = BitWriter()
+    writer.write(0b101, 3)
+    writer.write_packed(
+        (value << (-n_bits % 8)).to_bytes(-(-n_bits // 8), 'big'), n_bits)
+    assert writer.getvalue() == expected.getvalue()
+    assert len(writer) == len(expected)
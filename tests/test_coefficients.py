@@ -0,0 +1,82 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+import jpeg
+from jpeg.coefficients import (
+    CoefficientImage,
+    coefficients_to_image,
+    decode_coefficients,
+    encode_coefficients,
+    image_to_coefficients,
+)
+
+
+@pytest.fixture
+def gray():
+    y, x = np.mgrid[:48, :64]
+    return (128 + 60 * np.sin(x / 5.) + 40 * np.cos(y / 3.)).astype(int)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'optimize': True, 'restart_interval': 2, 'index': True},
+    {'progressive': True},
+])
+@pytest.mark.parametrize('quality', [None, 75])
+def test_encode_coefficients_same_as_compress_bytes(gray, kwargs, quality):
+    image = image_to_coefficients(gray, quality=quality)
+    assert encode_coefficients(image, **kwargs) == jpeg.compress_bytes(
+        gray, quality=quality, **kwargs)
+
+
+@pytest.mark.parametrize('quality', [None, 75])
+def test_decode_coefficients(gray, quality):
+    image = image_to_coefficients(gray, quality=quality)
+    data = jpeg.compress_bytes(gray, quality=quality)
+    image_back = decode_coefficients(data)
+    assert image_back == image
+    assert image_back.coefficients.dtype == np.int16
+    assert image_back.coefficients.flags['C_CONTIGUOUS']
+    assert_array_equal(
+        coefficients_to_image(image_back), jpeg.decompress_bytes(data))
+    assert_array_equal(
+        coefficients_to_image(image_back, scale=1 / 4),
+        jpeg.decompress_bytes(data, scale=1 / 4)
+    )
+
+
+def test_decode_coefficients_raises_value_error_color():
+    data = jpeg.compress_bytes(np.zeros((16, 16, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        decode_coefficients(data)
+
+
+@pytest.mark.parametrize('quality', [None, 50])
+def test_tobytes_frombytes(gray, quality):
+    image = image_to_coefficients(gray, quality=quality)
+    data = image.tobytes()
+    assert len(data) == image.nbytes + 12 + 128 * (quality is not None)
+    image_back = CoefficientImage.frombytes(data)
+    assert image_back == image
+    assert pickle.loads(pickle.dumps(image)) == image
+
+
+def test_coefficient_image_is_int16(gray):
+    image = image_to_coefficients(gray)
+    assert image.nbytes == 6 * 8 * 64 * 2
+    assert not hasattr(image, '__dict__')
+
+
+@pytest.mark.parametrize('args', [
+    (12, 8, np.zeros((1, 1, 64))),
+    (16, 8, np.zeros((1, 1, 64))),
+    (8, 8, np.full((1, 1, 64), 2 ** 15)),
+    (8, 8, np.zeros((1, 1, 64)), np.zeros((8, 8))),
+    (8, 8, np.zeros((1, 1, 64)), np.full((8, 8), 1.5)),
+])
+def test_coefficient_image_raises_value_error(args):
+    with pytest.raises(ValueError):
+        CoefficientImage(*args)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from jpeg import color
+
+
+@pytest.fixture
+def rgb():
+    return np.random.RandomState(0).randint(0, 256, size=(7, 9, 3))
+
+
+def test_rgb_to_ycbcr_gray_has_neutral_chroma():
+    gray = np.full((2, 2, 3), 100)
+    np.testing.assert_array_almost_equal(
+        color.rgb_to_ycbcr(gray), np.full((2, 2, 3), [100, 128, 128]))
+
+
+def test_ycbcr_to_rgb_of_rgb_to_ycbcr(rgb):
+    np.testing.assert_array_almost_equal(
+        color.ycbcr_to_rgb(color.rgb_to_ycbcr(rgb)), rgb, decimal=3)
+
+
+def test_rgb_to_ycbcr_raises_value_error_not_rgb():
+    with pytest.raises(ValueError):
+        color.rgb_to_ycbcr(np.zeros((4, 4)))
+
+
+def test_downsample_averages():
+    plane = np.arange(16).reshape(4, 4)
+    np.testing.assert_array_equal(
+        color.downsample(plane, (2, 2)), [[2.5, 4.5], [10.5, 12.5]])
+    np.testing.assert_array_equal(
+        color.downsample(plane, (1, 2)), [[.5, 2.5], [4.5, 6.5], [8.5, 10.5],
+                                          [12.5, 14.5]])
+
+
+def test_downsample_pads_odd_shape(rgb):
+    out = color.downsample(rgb[:, :, 0], (2, 2))
+    assert out.shape == (4, 5)
+    assert out[3, 4] == rgb[6, 8, 0]
+
+
+def test_upsample_of_downsample_constant_plane():
+    plane = np.full((7, 9), 3.)
+    out = color.upsample(color.downsample(plane, (2, 2)), (2, 2), (7, 9))
+    np.testing.assert_array_equal(out, plane)
+
+
+def test_pad():
+    out = color.pad(np.arange(6).reshape(2, 3), (4, 4))
+    assert out.shape == (4, 4)
+    np.testing.assert_array_equal(out[:, 3], [2, 5, 5, 5])
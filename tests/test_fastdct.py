@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import jpeg.fastdct
+import jpeg.freq
+from jpeg.utils import image_to_blocks
+
+
+@pytest.fixture
+def blocks():
+    rng = np.random.RandomState(0)
+    return image_to_blocks(rng.randint(0, 256, (32, 48)) - 128.)
+
+
+def test_aan_dct_blocks_matches_matrix(blocks):
+    np.testing.assert_allclose(
+        jpeg.fastdct.aan_dct_blocks(blocks),
+        jpeg.freq.dct_blocks(blocks),
+        atol=1e-10,
+    )
+
+
+def test_aan_idct_blocks_matches_matrix(blocks):
+    coefficients = jpeg.freq.dct_blocks(blocks)
+    np.testing.assert_allclose(
+        jpeg.fastdct.aan_idct_blocks(coefficients), blocks, atol=1e-10)
+
+
+def test_int_dct_blocks_within_one(blocks):
+    expected = np.rint(jpeg.freq.dct_blocks(blocks))
+    dct = jpeg.fastdct.int_dct_blocks(blocks)
+    assert np.issubdtype(dct.dtype, np.integer)
+    assert np.abs(dct - expected).max() <= 1
+
+
+def test_int_idct_blocks_within_one(blocks):
+    coefficients = np.rint(jpeg.freq.dct_blocks(blocks))
+    expected = np.rint(jpeg.freq.idct_blocks(coefficients))
+    idct = jpeg.fastdct.int_idct_blocks(coefficients)
+    assert np.abs(idct - expected).max() <= 1
+
+
+@pytest.mark.parametrize("function", [
+    jpeg.fastdct.aan_dct_blocks,
+    jpeg.fastdct.aan_idct_blocks,
+    jpeg.fastdct.int_dct_blocks,
+    jpeg.fastdct.int_idct_blocks,
+])
+def test_fast_dct_raises_value_error_wrong_block_size(function):
+    with pytest.raises(ValueError):
+        function(np.zeros((2, 2, 4, 4)))
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_dct_idct_backend(blocks, backend):
+    im = 128 + blocks.swapaxes(1, 2).reshape(32, 48)
+    im_dct = jpeg.freq.dct(im, backend=backend)
+    np.testing.assert_allclose(
+        jpeg.freq.idct(im_dct, backend=backend), im, atol=2)
+
+
+def test_dct_raises_value_error_unknown_backend(blocks):
+    with pytest.raises(ValueError):
+        jpeg.freq.dct_blocks(blocks, backend='fft')
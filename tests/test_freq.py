@@ -3,6 +3,8 @@ import pytest
 from scipy import fftpack
 
 import jpeg.freq
+import jpeg.quantization
+from jpeg.utils import izigzag_blocks, zigzag_blocks
 
 
 @pytest.fixture
@@ -82,3 +84,178 @@ def test_scipy_idct_dct_same_as_pyjpeg_idct_dct_wikipedia_example(g):
         jpeg.freq.idct(jpeg.freq.dct(g)),
         fftpack.idctn(fftpack.dctn(g, norm='ortho'), norm='ortho')
     )
+
+
+@pytest.fixture
+def im():
+    return np.random.RandomState(0).randint(0, 256, size=(32, 48))
+
+
+def test_dct_blocks_same_as_filter_transform(im):
+    dc_filters = [
+        jpeg.freq.discrete_cosine_filter(x, y)
+        for x in range(8)
+        for y in range(8)
+    ]
+    np.testing.assert_array_almost_equal(
+        jpeg.freq.dct(im),
+        jpeg.freq.transform(im - 128, dc_filters)
+    )
+
+
+def test_idct_blocks_same_as_filter_transform(im):
+    idc_filters = [
+        jpeg.freq.inverse_discrete_cosine_filter(u, v)
+        for u in range(8)
+        for v in range(8)
+    ]
+    np.testing.assert_array_almost_equal(
+        jpeg.freq.idct(im),
+        jpeg.freq.transform(im, idc_filters) + 128
+    )
+
+
+def test_idct_dct_random_image(im):
+    np.testing.assert_array_almost_equal(jpeg.freq.idct(jpeg.freq.dct(im)), im)
+
+
+def test_dct_filter_bank_same_as_filters():
+    bank = jpeg.freq.dct_filter_bank()
+    assert bank.shape == (64, 8, 8)
+    np.testing.assert_array_equal(
+        bank[10], jpeg.freq.discrete_cosine_filter(1, 2))
+
+
+def test_idct_filter_bank_same_as_filters():
+    bank = jpeg.freq.idct_filter_bank()
+    np.testing.assert_array_equal(
+        bank[10], jpeg.freq.inverse_discrete_cosine_filter(1, 2))
+
+
+def test_transform_with_filter_banks_is_identity(im):
+    dct = jpeg.freq.transform(im, jpeg.freq.dct_filter_bank())
+    np.testing.assert_array_almost_equal(
+        jpeg.freq.transform(dct, jpeg.freq.idct_filter_bank()), im)
+
+
+@pytest.mark.parametrize("patch_size", [4, 8, 16])
+def test_dct_basis_is_orthonormal(patch_size):
+    basis = jpeg.freq.dct_basis(patch_size)
+    np.testing.assert_array_almost_equal(
+        basis @ basis.T, np.eye(patch_size))
+
+
+def test_dct_basis_is_cached_and_read_only():
+    jpeg.freq.clear_basis_cache()
+    basis = jpeg.freq.dct_basis(8, dtype=np.float32)
+    assert basis.dtype == np.float32
+    assert not basis.flags.writeable
+    assert jpeg.freq.dct_basis(8, dtype=np.float32) is basis
+    assert ('dct', 8, np.dtype(np.float32)) in jpeg.freq.basis_cache_info()
+
+
+def test_clear_basis_cache():
+    jpeg.freq.dct_basis()
+    jpeg.freq.clear_basis_cache()
+    assert jpeg.freq.basis_cache_info() == []
+
+
+@pytest.fixture
+def blocks():
+    rng = np.random.RandomState(1)
+    return rng.uniform(-128, 128, (4, 6, 8, 8))
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_quantize_blocks(blocks, backend):
+    Q = jpeg.quantization.quantization_table(75)
+    coefficients = jpeg.freq.dct_blocks(blocks, backend=backend)
+    expected = (zigzag_blocks(coefficients) / zigzag_blocks(Q)).astype(int)
+    np.testing.assert_array_equal(
+        jpeg.freq.quantize_blocks(blocks, Q, backend=backend), expected)
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_dequantize_blocks(blocks, backend):
+    Q = jpeg.quantization.quantization_table(75)
+    coefficients = jpeg.freq.quantize_blocks(blocks, Q)
+    expected = jpeg.freq.idct_blocks(izigzag_blocks(coefficients) * Q)
+    np.testing.assert_allclose(
+        jpeg.freq.dequantize_blocks(coefficients, Q, backend=backend),
+        expected,
+        atol=1,
+    )
+
+
+def test_quantized_dct_basis_is_cached_per_quantization():
+    jpeg.freq.clear_basis_cache()
+    basis = jpeg.freq.quantized_dct_basis(2.)
+    assert not basis.flags.writeable
+    assert jpeg.freq.quantized_dct_basis(2. * np.ones((8, 8))) is basis
+    assert jpeg.freq.quantized_dct_basis(3.) is not basis
+    assert len(jpeg.freq.basis_cache_info()) == 2
+
+
+def test_quantized_basis_cache_is_bounded():
+    jpeg.freq.clear_basis_cache()
+    first = jpeg.freq.quantized_dct_basis(1.)
+    for Q in range(2, 2 * jpeg.freq.MAX_QUANTIZED_BASES):
+        jpeg.freq.quantized_dct_basis(float(Q))
+        # The recently used basis is kept.
+        assert jpeg.freq.quantized_dct_basis(1.) is first
+    assert (
+        len(jpeg.freq.basis_cache_info()) == jpeg.freq.MAX_QUANTIZED_BASES)
+
+
+def test_quantized_bases_are_inverse():
+    Q = jpeg.quantization.quantization_table(20)
+    np.testing.assert_array_almost_equal(
+        jpeg.freq.quantized_dct_basis(Q) @ jpeg.freq.dequantized_idct_basis(Q),
+        np.eye(64),
+    )
+
+
+@pytest.mark.parametrize("Q", [np.ones((4, 4)), 0., -np.ones((8, 8))])
+def test_quantize_blocks_raises_value_error_wrong_quantization(blocks, Q):
+    with pytest.raises(ValueError):
+        jpeg.freq.quantize_blocks(blocks, Q)
+
+
+@pytest.mark.parametrize("scale, size, n_coefficients", [
+    (1, 8, 64), (1 / 2, 4, 25), (1 / 4, 2, 5), (1 / 8, 1, 1)])
+def test_scaled_idct_basis_shape(scale, size, n_coefficients):
+    assert jpeg.freq.scaled_size(scale) == size
+    assert jpeg.freq.scaled_coefficients(scale) == n_coefficients
+    assert jpeg.freq.scaled_idct_basis(2., scale).shape == (
+        n_coefficients, size ** 2)
+
+
+@pytest.mark.parametrize("scale", [0, 1 / 16, 1 / 3, 2])
+def test_scaled_size_raises_value_error(scale):
+    with pytest.raises(ValueError):
+        jpeg.freq.scaled_size(scale)
+
+
+def test_dequantize_blocks_dc_only_is_mean(blocks):
+    Q = jpeg.quantization.quantization_table(75)
+    coefficients = jpeg.freq.quantize_blocks(blocks, Q)
+    full = jpeg.freq.dequantize_blocks(coefficients, Q)
+    np.testing.assert_allclose(
+        jpeg.freq.dequantize_blocks(coefficients[..., :1], Q, scale=1 / 8),
+        full.mean(axis=(-2, -1), keepdims=True),
+        atol=1e-9,
+    )
+
+
+@pytest.mark.parametrize("scale", [1 / 2, 1 / 4])
+def test_dequantize_blocks_scaled_smooth_blocks(scale):
+    # The pixels of smooth blocks are close to the mean of the pixels they
+    # replace.
+    y, x = np.mgrid[:8, :8]
+    blocks = np.stack([20 * np.cos(y / 4.) + 3 * x, 10. * y - 30])
+    coefficients = jpeg.freq.quantize_blocks(blocks, 0.01)
+    out = jpeg.freq.dequantize_blocks(coefficients, 0.01, scale=scale)
+    factor = int(1 / scale)
+    expected = blocks.reshape(
+        2, 8 // factor, factor, 8 // factor, factor).mean(axis=(2, 4))
+    np.testing.assert_allclose(out, expected, atol=3)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from jpeg import header, huffman
+from jpeg.bitstream import BitReader, BitWriter
+
+
+def write_read(header_):
+    writer = BitWriter()
+    header.write_header(writer, header_)
+    return header.read_header(BitReader(writer.getvalue()))
+
+
+def test_write_read_default_header():
+    out = write_read(header.Header(16, 24))
+    assert out == header.Header(16, 24, size=9)
+
+
+def test_write_read_header():
+    table = huffman.HuffmanTable.from_frequencies(np.arange(256) % 3)
+    header_ = header.Header(
+        40, 16, table=table, restart_interval=2, offsets=(0, 10, 25))
+    out = write_read(header_)
+    assert out == header_._replace(size=out.size)
+
+
+def test_segments():
+    header_ = header.Header(40, 16, restart_interval=2)
+    assert header_.segments() == [(0, 2), (2, 2), (4, 1)]
+    assert header.Header(40, 16).segments() == [(0, 5)]
+
+
+def test_segment_bounds():
+    header_ = header.Header(
+        40, 16, restart_interval=2, offsets=(0, 10, 25), size=20)
+    assert header_.segment_bounds(1, 100) == slice(30, 45)
+    assert header_.segment_bounds(2, 100) == slice(45, 100)
+
+
+def test_write_header_raises_value_error_wrong_number_of_offsets():
+    with pytest.raises(ValueError):
+        header.write_header(
+            BitWriter(), header.Header(40, 16, offsets=(0, 10)))
+
+
+def test_write_read_header_quantization():
+    header_ = header.Header(16, 24, quantization=tuple(range(1, 65)))
+    out = write_read(header_)
+    assert out == header_._replace(size=out.size)
+
+
+@pytest.mark.parametrize("quantization", [(1,) * 63, (0,) * 64])
+def test_write_header_raises_value_error_wrong_quantization(quantization):
+    with pytest.raises(ValueError):
+        header.write_header(
+            BitWriter(), header.Header(16, 24, quantization=quantization))
+
+
+def test_write_read_header_progressive():
+    header_ = header.Header(16, 24, bands=(1, 6, 64), scans=(10, 20, 30))
+    out = write_read(header_)
+    assert out == header_._replace(size=out.size)
+    assert out.band_ranges() == [(0, 1), (1, 6), (6, 64)]
+
+
+def test_write_read_header_progressive_color():
+    header_ = header.Header(
+        16, 24, subsampling=(2, 2), components=(10, 20, 30), bands=(1, 64))
+    out = write_read(header_)
+    assert out == header_._replace(size=out.size)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'bands': (1, 6, 63), 'scans': (1, 1, 1)},
+    {'bands': (6, 1, 64), 'scans': (1, 1, 1)},
+    {'bands': (1, 64)},
+    {'bands': (1, 64), 'scans': (1, 1), 'restart_interval': 1},
+])
+def test_write_header_raises_value_error_wrong_bands(kwargs):
+    with pytest.raises(ValueError):
+        header.write_header(BitWriter(), header.Header(16, 24, **kwargs))
+
+
+@pytest.mark.parametrize("optimized", [False, True])
+def test_write_read_header_dc_table(optimized):
+    dc_table = huffman.FIXED_DC_TABLE
+    if optimized:
+        dc_table = huffman.HuffmanTable.from_frequencies(
+            np.maximum(12 - np.arange(256), 0))
+    header_ = header.Header(16, 24, dc_table=dc_table)
+    out = write_read(header_)
+    assert out == header_._replace(size=out.size)
@@ -1,8 +1,11 @@
+import pickle
+
 import numpy as np
 import pytest
 from numpy.testing import assert_array_equal
 
 from jpeg import huffman, utils
+from jpeg.bitstream import BitReader, BitWriter
 
 
 @pytest.fixture
@@ -63,3 +66,303 @@ def test_huffman_encode_decode_b(B):
 def test_huffman_encode_decode_b_zigzag(B_zigzag):
     out = huffman.decode(huffman.encode(B_zigzag))
     np.testing.assert_array_equal(out, B_zigzag)
+
+
+def test_decode_blocks_one_pass(B_zigzag):
+    writer = BitWriter()
+    for sequence in (B_zigzag, np.zeros(64), -B_zigzag):
+        huffman.write_block(writer, sequence)
+    reader = BitReader(writer.getvalue())
+    out = huffman.decode_blocks(reader, 3)
+    assert out.shape == (3, 64)
+    np.testing.assert_array_equal(out, [B_zigzag, np.zeros(64), -B_zigzag])
+    assert reader.position == len(writer)
+
+
+def test_decode_blocks_long_zero_runs():
+    sequence = np.zeros(64)
+    sequence[40] = 3
+    sequence[63] = -1
+    writer = BitWriter()
+    huffman.write_block(writer, sequence)
+    out = huffman.decode_blocks(BitReader(writer.getvalue()), 1)
+    np.testing.assert_array_equal(out[0], sequence)
+
+
+def test_fixed_table_codes_are_symbols():
+    assert huffman.FIXED_TABLE.codes[0x3A] == (0x3A, 8)
+
+
+def test_huffman_table_frequent_symbols_get_short_codes():
+    frequencies = np.zeros(256, dtype=int)
+    frequencies[[0x00, 0x01, 0x12, 0xF0]] = [100, 50, 10, 1]
+    table = huffman.HuffmanTable.from_frequencies(frequencies)
+    assert [table.codes[s][1] for s in (0x00, 0x01, 0x12, 0xF0)] == [
+        1, 2, 3, 3]
+
+
+def test_huffman_table_code_length_limited():
+    # Fibonacci frequencies give the longest possible codes
+    fibonacci = [1, 1]
+    while len(fibonacci) < 30:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    frequencies = np.zeros(256, dtype=int)
+    frequencies[:30] = fibonacci
+    table = huffman.HuffmanTable.from_frequencies(frequencies)
+    assert table.max_length == huffman.MAX_CODE_LENGTH
+    assert sorted(table.symbols) == list(range(30))
+
+
+def test_huffman_table_single_symbol():
+    frequencies = np.zeros(256, dtype=int)
+    frequencies[0] = 10
+    table = huffman.HuffmanTable.from_frequencies(frequencies)
+    assert table.codes[0] == (0, 1)
+
+
+@pytest.mark.parametrize('frequencies', [
+    np.arange(256) % 7,
+    np.eye(1, 256, 0x12, dtype=int)[0],
+    [1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377, 610, 987, 1597],
+])
+def test_huffman_table_reserve_all_ones(frequencies):
+    table = huffman.HuffmanTable.from_frequencies(
+        frequencies, reserve_all_ones=True)
+    assert sorted(table.symbols) == list(np.flatnonzero(frequencies))
+    for symbol in table.symbols:
+        code, length = table.codes[symbol]
+        assert code != (1 << length) - 1
+
+
+def test_huffman_table_write_read():
+    frequencies = np.arange(256) % 7
+    table = huffman.HuffmanTable.from_frequencies(frequencies)
+    writer = BitWriter()
+    table.write(writer)
+    assert huffman.HuffmanTable.read(BitReader(writer.getvalue())) == table
+
+
+def test_encode_decode_optimized_table(B_zigzag):
+    sequences = [B_zigzag, np.zeros(64), -B_zigzag]
+    table = huffman.HuffmanTable.from_frequencies(
+        huffman.symbol_frequencies(sequences))
+    writer = BitWriter()
+    for sequence in sequences:
+        huffman.write_block(writer, sequence, table=table)
+    out = huffman.decode_blocks(BitReader(writer.getvalue()), 3, table=table)
+    np.testing.assert_array_equal(out, sequences)
+
+
+def test_write_block_raises_value_error_symbol_not_in_table(B_zigzag):
+    table = huffman.HuffmanTable.from_frequencies(
+        huffman.symbol_frequencies([np.zeros(64)]))
+    with pytest.raises(ValueError):
+        huffman.write_block(BitWriter(), B_zigzag, table=table)
+
+
+def test_zigzag_blocks_same_as_zigzag_patch(B, B_zigzag):
+    blocks = np.stack([B, -B, 2 * B])
+    out = utils.zigzag_blocks(blocks)
+    assert out.shape == (3, 64)
+    np.testing.assert_array_equal(out, [B_zigzag, -B_zigzag, 2 * B_zigzag])
+
+
+def test_izigzag_blocks_same_as_izigzag_patch(B, B_zigzag):
+    vectors = np.stack([B_zigzag, -B_zigzag]).reshape(1, 2, 64)
+    out = utils.izigzag_blocks(vectors)
+    assert out.shape == (1, 2, 8, 8)
+    np.testing.assert_array_equal(out[0], [B, -B])
+
+
+def test_zigzag_patch_4_by_4():
+    patch = np.arange(16).reshape(4, 4)
+    out = utils.zigzag_patch(patch)
+    np.testing.assert_array_equal(
+        out, [0, 1, 4, 8, 5, 2, 3, 6, 9, 12, 13, 10, 7, 11, 14, 15])
+    np.testing.assert_array_equal(utils.izigzag_patch(out), patch)
+
+
+@pytest.mark.parametrize("patch_size", [1, 2, 5, 16])
+def test_izigzag_zigzag_patch(patch_size):
+    patch = np.arange(patch_size ** 2).reshape(patch_size, patch_size)
+    out = utils.izigzag_patch(utils.zigzag_patch(patch))
+    np.testing.assert_array_equal(out, patch)
+
+
+def test_zigzag_patch_raises_value_error_not_square():
+    with pytest.raises(ValueError):
+        utils.zigzag_patch(np.zeros((8, 4)))
+
+
+def test_izigzag_patch_raises_value_error_not_square_length():
+    with pytest.raises(ValueError):
+        utils.izigzag_patch(np.zeros(20))
+
+
+def test_huffman_table_pickle():
+    table = huffman.HuffmanTable.from_frequencies(np.arange(256) % 5)
+    assert pickle.loads(pickle.dumps(table)) == table
+
+
+@pytest.mark.parametrize('n_values', [1, 5, 25, 64])
+def test_decode_blocks_n_values(B_zigzag, n_values):
+    writer = BitWriter()
+    for sequence in (B_zigzag, -B_zigzag):
+        huffman.write_block(writer, sequence)
+    reader = BitReader(writer.getvalue())
+    out = huffman.decode_blocks(reader, 2, n_values=n_values)
+    np.testing.assert_array_equal(
+        out, [B_zigzag[:n_values], -B_zigzag[:n_values]])
+    assert reader.position == len(writer)
+
+
+@pytest.mark.parametrize('difference, expected', [
+    (0, (0, 0, 0)),
+    (5, (3, 0b0101, 4)),
+    (-5, (3, 0b1101, 4)),
+])
+def test_dc_symbol(difference, expected):
+    assert huffman.dc_symbol(difference) == expected
+
+
+def test_dc_symbol_raises_value_error_too_large():
+    with pytest.raises(ValueError):
+        huffman.dc_symbol(2 ** 15)
+
+
+def test_dc_symbol_frequencies():
+    sequences = np.random.RandomState(0).randint(-300, 300, size=(50, 4))
+    frequencies = np.zeros(256, dtype=int)
+    prediction = 7
+    for sequence in sequences:
+        frequencies[huffman.dc_symbol(sequence[0] - prediction)[0]] += 1
+        prediction = sequence[0]
+    assert_array_equal(
+        huffman.dc_symbol_frequencies(sequences, prediction=7), frequencies)
+
+
+@pytest.mark.parametrize('n_values', [1, 64])
+def test_write_blocks_decode_blocks_dc_prediction(n_values):
+    sequences = np.random.RandomState(0).randint(-40, 40, size=(6, 64))
+    sequences[:, 10:] = 0
+    dc_table = huffman.HuffmanTable.from_frequencies(
+        huffman.dc_symbol_frequencies(sequences))
+    writer = BitWriter()
+    # The prediction continues over the calls.
+    huffman.write_blocks(writer, sequences[:4], dc_table=dc_table)
+    huffman.write_blocks(
+        writer, sequences[4:], dc_table=dc_table, prediction=sequences[3, 0])
+
+    reader = BitReader(writer.getvalue())
+    first = huffman.decode_blocks(
+        reader, 4, dc_table=dc_table, n_values=n_values)
+    second = huffman.decode_blocks(
+        reader, 2, dc_table=dc_table, n_values=n_values,
+        prediction=first[-1, 0]
+    )
+    assert_array_equal(
+        np.concatenate([first, second]), sequences[:, :n_values])
+    assert reader.position == len(writer)
+
+
+def test_write_blocks_dc_prediction_is_smaller():
+    sequences = np.zeros((20, 64), dtype=int)
+    sequences[:, 0] = 500 + np.arange(20)
+    absolute, predicted = BitWriter(), BitWriter()
+    huffman.write_blocks(absolute, sequences)
+    huffman.write_blocks(
+        predicted, sequences, dc_table=huffman.FIXED_DC_TABLE)
+    assert len(predicted) < len(absolute)
+
+
+def write_blocks(sequences, **kwargs):
+    writer = BitWriter()
+    huffman.write_blocks(writer, sequences, **kwargs)
+    return writer.getvalue(), len(writer)
+
+
+@pytest.mark.parametrize('dc_table', [None, huffman.FIXED_DC_TABLE])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_encode_blocks_same_as_write_blocks(B_zigzag, dc_table, optimize):
+    sequences = np.random.RandomState(0).randint(-300, 300, size=(30, 64))
+    sequences[np.random.RandomState(1).rand(30, 64) < 0.8] = 0
+    # All zeros, long zero runs and a non-zero last value.
+    sequences[0] = 0
+    sequences[1, 1:] = 0
+    sequences[2, :-1] = 0
+    sequences[3, 1:40] = 0
+    sequences[4] = B_zigzag
+    table = huffman.FIXED_TABLE
+    if optimize:
+        table = huffman.HuffmanTable.from_frequencies(
+            huffman.symbol_frequencies(
+                sequences if dc_table is None else sequences[:, 1:]))
+    kwargs = dict(table=table, dc_table=dc_table, prediction=-7)
+    assert huffman.encode_blocks(sequences, **kwargs) == write_blocks(
+        sequences, **kwargs)
+
+
+@pytest.mark.parametrize('n_values', [0, 1, 5])
+def test_encode_blocks_few_values(n_values):
+    sequences = np.arange(3 * n_values).reshape(3, n_values) % 4 - 1
+    assert huffman.encode_blocks(sequences) == write_blocks(sequences)
+
+
+def test_encode_blocks_no_blocks():
+    assert huffman.encode_blocks(
+        np.zeros((0, 64)), dc_table=huffman.FIXED_DC_TABLE) == (b'', 0)
+
+
+@pytest.mark.parametrize('start, stop, dc_table', [
+    (0, 1, huffman.FIXED_DC_TABLE),
+    (0, 64, huffman.FIXED_DC_TABLE),
+    (0, 64, None),
+    (1, 6, None),
+    (6, 64, None),
+])
+def test_encode_blocks_decode_blocks_eob_runs(start, stop, dc_table):
+    sequences = np.random.RandomState(0).randint(-9, 9, size=(40000, 64))
+    sequences[np.random.RandomState(1).rand(40000, 64) < 0.9] = 0
+    # Runs of blocks with zeros longer than one symbol describes.
+    sequences[5: 5 + huffman.MAX_EOB_RUN + 10, 1:] = 0
+    sequences[-1, 1:] = 0
+    band = sequences[:, start: stop]
+    frequencies = huffman.symbol_frequencies(
+        band[:, dc_table is not None:], eob_runs=True)
+    table = huffman.FIXED_TABLE
+    if frequencies.any():
+        table = huffman.HuffmanTable.from_frequencies(frequencies)
+    data, n_bits = huffman.encode_blocks(
+        band, table=table, dc_table=dc_table, eob_runs=True)
+    reader = BitReader(data)
+    decoded = huffman.decode_blocks(
+        reader, len(band), table=table, n_values=stop - start,
+        dc_table=dc_table, eob_runs=True)
+    assert_array_equal(decoded, band)
+    assert reader.position == n_bits
+
+
+def test_encode_blocks_eob_runs():
+    # One symbol for the runs of 3 blocks, the first of them with values, and
+    # no symbol for the end of a block with a last non-zero value.
+    sequences = np.array([[0, 0], [1, 0], [0, 0], [0, 0], [0, 1], [0, 0]])
+    code = (
+        '00000000'          # end of band of 1 block
+        '00000001' '01'     # the value 1
+        '00010000' '1'      # end of band of 3 blocks
+        '00010001' '01'     # the value 1 after a zero
+        '00000000'          # end of band of 1 block
+    )
+    writer = BitWriter()
+    writer.write_bits(code)
+    assert huffman.encode_blocks(sequences, eob_runs=True) == (
+        writer.getvalue(), len(code))
+
+
+@pytest.mark.parametrize('dc', [False, True])
+def test_encode_blocks_raises_value_error_symbol_not_in_table(B_zigzag, dc):
+    table = huffman.HuffmanTable.from_frequencies(
+        huffman.symbol_frequencies([np.zeros(64)]))
+    kwargs = {'table': table} if not dc else {'dc_table': table}
+    with pytest.raises(ValueError):
+        huffman.encode_blocks(B_zigzag[None], **kwargs)
@@ -0,0 +1,137 @@
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+import jpeg
+from jpeg import huffman
+from jpeg.coefficients import decode_coefficients
+from jpeg.header import PROGRESSIVE_BANDS
+from jpeg.instrument import (
+    Observer,
+    Stats,
+    zero_run_lengths,
+)
+
+
+@pytest.fixture
+def im():
+    x, y = np.meshgrid(np.arange(48), np.arange(32))
+    return (128 + 100 * np.sin(x / 5) * np.cos(y / 7)).astype(int)
+
+
+def test_zero_run_lengths():
+    sequences = np.zeros((2, 64), dtype=int)
+    sequences[0, [0, 1, 4, 20]] = 1
+    sequences[1, [3, 63]] = 1
+    expected = np.zeros(63, dtype=int)
+    np.add.at(expected, [0, 2, 15, 2, 59], 1)
+    np.testing.assert_array_equal(zero_run_lengths(sequences), expected)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'Q': 4.},
+    {'quality': 50, 'optimize': True, 'restart_interval': 1, 'index': True},
+])
+def test_compress_decompress_observer(im, kwargs):
+    stats = Stats()
+    data = jpeg.compress_bytes(im, observer=stats, **kwargs)
+    assert data == jpeg.compress_bytes(im, **kwargs)
+    assert stats.n_blocks == 24
+    assert stats.n_bytes == len(data)
+    expected_stages = {'transform', 'entropy'}
+    if kwargs.get('optimize'):
+        expected_stages |= {'count', 'table'}
+    assert set(stats.seconds) == expected_stages
+
+    decompress_stats = Stats()
+    Q = kwargs.get('Q', 1)
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        im_back = jpeg.decompress_bytes(
+            data, Q=Q, executor=executor, observer=decompress_stats)
+    np.testing.assert_array_equal(im_back, jpeg.decompress_bytes(data, Q=Q))
+    assert set(decompress_stats.seconds) == {'entropy', 'reconstruct'}
+    assert decompress_stats.n_blocks == stats.n_blocks
+    np.testing.assert_array_equal(
+        decompress_stats.zero_runs, stats.zero_runs)
+
+
+def test_stats_zero_blocks():
+    stats = Stats()
+    jpeg.compress_bytes(128 * np.ones((16, 32)), observer=stats)
+    assert stats.n_zero_blocks == stats.n_blocks == stats.n_eob == 8
+    assert stats.as_dict()['zero_runs'] == 0
+
+
+def test_stats_color():
+    stats = Stats()
+    rgb_im = np.random.RandomState(0).randint(0, 256, (16, 24, 3))
+    data = jpeg.compress_bytes(rgb_im, subsampling='4:4:4', observer=stats)
+    assert stats.n_blocks == 3 * 6
+    assert 'color' in stats.seconds
+    assert stats.n_bytes == len(data)
+
+
+def test_stats_as_dict(im):
+    stats = Stats()
+    jpeg.compress_bytes(im, Q=8., observer=stats)
+    metrics = stats.as_dict()
+    assert metrics['blocks'] == 24
+    assert metrics['zero_runs'] == stats.zero_runs.sum()
+    assert metrics['seconds_entropy'] > 0
+
+
+def test_stats_symbols_same_as_stream():
+    stats = Stats()
+    noise = 128 + np.random.RandomState(0).normal(0, 20, (128, 128))
+    data = jpeg.compress_bytes(noise, quality=75, observer=stats)
+    symbols = [
+        symbol
+        for sequence in decode_coefficients(data).coefficients.reshape(-1, 64)
+        for symbol, _, _ in huffman.block_symbols(sequence[1:])
+    ]
+    metrics = stats.as_dict()
+    assert metrics['zrl_symbols'] == symbols.count(huffman.ZRL) > 0
+    assert metrics['eob_symbols'] == symbols.count(huffman.EOB) == 256
+
+
+def test_stats_symbols_same_as_stream_progressive():
+    noise = 128 + np.random.RandomState(0).normal(0, 20, (128, 128))
+    data = jpeg.compress_bytes(noise, quality=75, progressive=True)
+    sequences = decode_coefficients(data).coefficients.reshape(-1, 64)
+    n_eob = n_zrl = 0
+    for start, stop in zip((0,) + PROGRESSIVE_BANDS, PROGRESSIVE_BANDS):
+        # An end of band for a run of blocks ending with zeros, the run
+        # continues over the blocks which are all zeros.
+        in_run = False
+        for sequence in sequences[:, max(start, 1): stop]:
+            n_zrl += [
+                symbol for symbol, _, _ in huffman.block_symbols(sequence)
+            ].count(huffman.ZRL)
+            if not len(sequence) or sequence[-1]:
+                in_run = False
+            elif not (in_run and not sequence.any()):
+                in_run = True
+                n_eob += 1
+
+    rgb = np.stack([noise, noise.T, 255 - noise], axis=2)
+    for im, kwargs in ((noise, {}), (rgb, {'subsampling': '4:4:4'})):
+        stats = Stats()
+        data = jpeg.compress_bytes(
+            im, quality=75, progressive=True, observer=stats, **kwargs)
+        decompress_stats = Stats()
+        jpeg.decompress_bytes(data, observer=decompress_stats)
+        for metrics in (stats.as_dict(), decompress_stats.as_dict()):
+            if im is noise:
+                assert metrics['zrl_symbols'] == n_zrl > 0
+                assert metrics['eob_symbols'] == n_eob < 2 * len(sequences)
+            assert metrics['zrl_symbols'] == stats.n_zrl > 0
+            assert metrics['eob_symbols'] == stats.n_eob > 0
+
+
+def test_observer_ignores_events(im):
+    data = jpeg.compress_bytes(im, observer=Observer())
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(data, observer=Observer()),
+        jpeg.decompress_bytes(data),
+    )
@@ -0,0 +1,222 @@
+import io
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from jpeg import jfif
+from jpeg.huffman import HuffmanTable
+
+
+@pytest.fixture
+def rgb():
+    y, x = np.mgrid[:37, :53]
+    return np.stack([
+        128 + 100 * np.sin(x / 9.),
+        128 + 100 * np.cos(y / 7.),
+        (x + y) * 2.5,
+    ], axis=2).astype(np.uint8)
+
+
+@pytest.fixture
+def gray(rgb):
+    return rgb[:, :, 0]
+
+
+@pytest.mark.parametrize('table, n_symbols', [
+    (jfif.DC_LUMINANCE_TABLE, 12),
+    (jfif.DC_CHROMINANCE_TABLE, 12),
+    (jfif.AC_LUMINANCE_TABLE, 162),
+    (jfif.AC_CHROMINANCE_TABLE, 162),
+])
+def test_standard_tables(table, n_symbols):
+    assert len(set(table.symbols)) == n_symbols
+    assert table.max_length <= 16
+
+
+@pytest.mark.parametrize('value', [0, 1, -1, 5, -5, 1023, -1023])
+def test_value_bits_extend(value):
+    bits, size = jfif._value_bits(value)
+    assert size == abs(value).bit_length()
+    assert 0 <= bits < 1 << size
+    assert jfif._extend(bits, size) == value
+
+
+def test_block_symbols():
+    sequence = np.zeros(64, dtype=int)
+    sequence[[0, 1, 20]] = [-26, 3, -1]
+    assert list(jfif.block_symbols(sequence, -20)) == [
+        (3, 1, 3), (0x02, 3, 2), (0xF0, 0, 0), (0x21, 0, 1), (0x00, 0, 0)]
+
+
+def test_block_symbols_raises_value_error_out_of_range():
+    sequence = np.zeros(64, dtype=int)
+    sequence[1] = 1024
+    with pytest.raises(ValueError):
+        list(jfif.block_symbols(sequence, 0))
+
+
+@pytest.mark.parametrize('subsampling', ['4:4:4', '4:2:2', '4:2:0'])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_compress_decompress_jfif(rgb, subsampling, optimize):
+    data = jfif.compress_jfif(
+        rgb, quality=90, subsampling=subsampling, optimize=optimize)
+    assert data[:2] == b'\xff\xd8' and data[-2:] == b'\xff\xd9'
+    out = jfif.decompress_jfif(data)
+    assert out.shape == rgb.shape and out.dtype == np.uint8
+    assert np.abs(out.astype(int) - rgb).mean() < 4
+
+
+def test_compress_decompress_jfif_gray(gray):
+    out = jfif.decompress_jfif(jfif.compress_jfif(gray, quality=90))
+    assert out.shape == gray.shape
+    assert np.abs(out.astype(int) - gray).max() <= 8
+
+
+def test_optimized_tables_are_smaller(rgb):
+    assert len(jfif.compress_jfif(rgb, optimize=True)) < len(
+        jfif.compress_jfif(rgb))
+
+
+@pytest.mark.parametrize('restart_interval', [None, 1, 3])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_write_read_jfif_same_coefficients(rgb, restart_interval, optimize):
+    data = jfif.compress_jfif(rgb, quality=50)
+    image = jfif.read_jfif(data)
+    assert (image.height, image.width) == rgb.shape[:2]
+    assert [component.factors for component in image.components] == [
+        (2, 2), (1, 1), (1, 1)]
+
+    data = jfif.write_jfif(
+        image, optimize=optimize, restart_interval=restart_interval)
+    if restart_interval is not None:
+        assert b'\xff\xd0' in data
+    image_back = jfif.read_jfif(data)
+    for component, component_back in zip(
+        image.components, image_back.components
+    ):
+        assert_array_equal(component.coefficients, component_back.coefficients)
+        assert_array_equal(component.quantization, component_back.quantization)
+        assert component.factors == component_back.factors
+
+
+def test_byte_stuffing():
+    # All AC coefficients of size 10 give codes of ones in the standard table.
+    sequence = np.full(64, -1023)
+    image = jfif.JFIFImage(8, 8, (jfif.Component(
+        sequence.reshape(1, 1, 64), np.ones((8, 8), dtype=int)),))
+    data = jfif.write_jfif(image)
+    scan = data[data.index(b'\xff\xda'):]
+    assert b'\xff\x00' in scan
+    assert_array_equal(
+        jfif.read_jfif(data).components[0].coefficients[0, 0], sequence)
+
+
+def test_write_jfif_raises_value_error_quantization():
+    image = jfif.JFIFImage(8, 8, (jfif.Component(
+        np.zeros((1, 1, 64), dtype=int), np.full((8, 8), 256)),))
+    with pytest.raises(ValueError):
+        jfif.write_jfif(image)
+
+
+def test_write_jfif_raises_value_error_shape():
+    image = jfif.JFIFImage(16, 8, (jfif.Component(
+        np.zeros((1, 1, 64), dtype=int), np.ones((8, 8), dtype=int)),))
+    with pytest.raises(ValueError):
+        jfif.write_jfif(image)
+
+
+def test_read_jfif_raises_value_error_not_jpeg():
+    with pytest.raises(ValueError):
+        jfif.read_jfif(b'\x89PNG\r\n')
+
+
+def test_read_jfif_raises_value_error_progressive(gray):
+    data = jfif.compress_jfif(gray)
+    with pytest.raises(ValueError):
+        jfif.read_jfif(data.replace(b'\xff\xc0', b'\xff\xc2'))
+
+
+def test_reserved_all_ones_in_optimized_tables(rgb):
+    data = jfif.compress_jfif(rgb, optimize=True)
+    tables = []
+    position = data.index(b'\xff\xc4')
+    while data[position: position + 2] == b'\xff\xc4':
+        length = int.from_bytes(data[position + 2: position + 4], 'big')
+        payload = data[position + 4: position + 2 + length]
+        while payload:
+            counts = list(payload[1:17])
+            tables.append(
+                HuffmanTable(counts, list(payload[17: 17 + sum(counts)])))
+            payload = payload[17 + sum(counts):]
+        position += 2 + length
+    assert len(tables) == 4
+    for table in tables:
+        for symbol in table.symbols:
+            code, length = table.codes[symbol]
+            assert code != (1 << length) - 1
+
+
+@pytest.mark.parametrize('subsampling', ['4:4:4', '4:2:0'])
+def test_pillow_reads_jfif(rgb, subsampling):
+    Image = pytest.importorskip('PIL.Image')
+    data = jfif.compress_jfif(rgb, quality=90, subsampling=subsampling)
+    out = jfif.decompress_jfif(data)
+    out_pillow = np.asarray(Image.open(io.BytesIO(data)))
+    assert out_pillow.shape == rgb.shape
+    # Pillow interpolates the chroma, instead of repeating.
+    assert np.abs(out_pillow.astype(int) - out).mean() < (
+        1 if subsampling == '4:4:4' else 4)
+
+
+def test_pillow_reads_jfif_gray(gray):
+    Image = pytest.importorskip('PIL.Image')
+    data = jfif.compress_jfif(gray, optimize=True, restart_interval=2)
+    out_pillow = np.asarray(Image.open(io.BytesIO(data)))
+    out = jfif.decompress_jfif(data)
+    assert np.abs(out_pillow.astype(int) - out).max() <= 1
+
+
+@pytest.mark.parametrize('subsampling', [0, 1, 2])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_decompress_pillow_jfif(rgb, subsampling, optimize):
+    Image = pytest.importorskip('PIL.Image')
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(
+        buffer, 'JPEG', quality=80, subsampling=subsampling,
+        optimize=optimize)
+    data = buffer.getvalue()
+    out_pillow = np.asarray(Image.open(io.BytesIO(data)))
+    out = jfif.decompress_jfif(data)
+    assert out.shape == rgb.shape
+    assert np.abs(out_pillow.astype(int) - out).mean() < (
+        1 if subsampling == 0 else 4)
+
+
+def test_decompress_pillow_jfif_gray_restart_markers(gray):
+    Image = pytest.importorskip('PIL.Image')
+    buffer = io.BytesIO()
+    try:
+        Image.fromarray(gray).save(
+            buffer, 'JPEG', quality=80, restart_marker_blocks=2)
+    except TypeError:
+        pytest.skip('Pillow does not write restart markers.')
+    data = buffer.getvalue()
+    assert b'\xff\xdd' in data
+    out_pillow = np.asarray(Image.open(io.BytesIO(data)))
+    out = jfif.decompress_jfif(data)
+    assert np.abs(out_pillow.astype(int) - out).max() <= 1
+
+
+@pytest.mark.parametrize('scale', [1 / 2, 1 / 4, 1 / 8])
+def test_decompress_jfif_scale(rgb, scale):
+    data = jfif.compress_jfif(rgb, quality=90, subsampling='4:4:4')
+    out = jfif.decompress_jfif(data, scale=scale)
+    assert out.shape == (
+        int(np.ceil(37 * scale)), int(np.ceil(53 * scale)), 3)
+    factor = int(1 / scale)
+    full = jfif.decompress_jfif(data)[:37 // factor * factor,
+                                      :53 // factor * factor]
+    expected = full.reshape(
+        37 // factor, factor, 53 // factor, factor, 3).mean(axis=(1, 3))
+    assert np.abs(out[:37 // factor, :53 // factor] - expected).mean() < 2
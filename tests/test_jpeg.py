@@ -0,0 +1,376 @@
+import concurrent.futures
+import io
+
+import numpy as np
+import pytest
+
+import jpeg
+import jpeg.freq
+import jpeg.quantization
+
+
+@pytest.fixture
+def im():
+    return np.random.RandomState(0).randint(0, 256, size=(32, 48))
+
+
+def test_compress_decompress(im):
+    out = jpeg.decompress(jpeg.compress(im))
+    assert out.shape == im.shape
+    assert np.abs(out - im).max() <= 2
+
+
+def test_compress_bytes_decompress_bytes(im):
+    data = jpeg.compress_bytes(im, Q=2)
+    assert isinstance(data, bytes)
+    out = jpeg.decompress_bytes(data, Q=2)
+    assert out.shape == im.shape
+    assert np.abs(out - im).max() <= 8
+
+
+def test_compress_is_bit_view_of_compress_bytes(im):
+    bits = jpeg.compress(im)
+    data = jpeg.compress_bytes(im)
+    assert len(data) == (len(bits) + 7) // 8
+    assert int(bits, 2) << (-len(bits) % 8) == int.from_bytes(data, 'big')
+
+
+def test_decompress_bytes_absolute_dc(im):
+    # Images without DC prediction, as compressed by earlier versions.
+    sequences = jpeg._quantize(im, 2, 'matrix')
+    header = jpeg.Header(*im.shape)
+    data = jpeg._assemble(
+        header, [jpeg._encode_segment(sequences, header.table, None)], False)
+    assert jpeg.read_header(jpeg.BitReader(data)).dc_table is None
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(data, Q=2),
+        jpeg.decompress_bytes(jpeg.compress_bytes(im, Q=2), Q=2)
+    )
+
+
+@pytest.fixture
+def smooth_im():
+    y, x = np.mgrid[:64, :64]
+    return (128 + 60 * np.sin(x / 9) * np.cos(y / 13)).astype(int)
+
+
+def test_compress_optimize_is_smaller(smooth_im):
+    Q = jpeg.quantization.quantization_50
+    data = jpeg.compress_bytes(smooth_im, Q=Q)
+    optimized = jpeg.compress_bytes(smooth_im, Q=Q, optimize=True)
+    assert len(optimized) < len(data)
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(optimized, Q=Q),
+        jpeg.decompress_bytes(data, Q=Q),
+    )
+
+
+@pytest.mark.parametrize("restart_interval", [1, 3, 4, 10])
+def test_compress_restart_interval(im, restart_interval):
+    data = jpeg.compress_bytes(im, restart_interval=restart_interval)
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(data), jpeg.decompress_bytes(
+            jpeg.compress_bytes(im)))
+
+
+def test_compress_restart_interval_raises_value_error(im):
+    with pytest.raises(ValueError):
+        jpeg.compress_bytes(im, restart_interval=0)
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_compress_workers_is_deterministic(smooth_im, optimize):
+    kwargs = dict(restart_interval=2, optimize=optimize)
+    data = jpeg.compress_bytes(smooth_im, **kwargs)
+    assert jpeg.compress_bytes(smooth_im, workers=2, **kwargs) == data
+    with concurrent.futures.ThreadPoolExecutor(3) as executor:
+        assert jpeg.compress_bytes(
+            smooth_im, executor=executor, **kwargs) == data
+
+
+def test_compress_index_decompress_in_parallel(smooth_im):
+    data = jpeg.compress_bytes(smooth_im, restart_interval=3, index=True)
+    expected = jpeg.decompress_bytes(jpeg.compress_bytes(smooth_im))
+    np.testing.assert_array_equal(jpeg.decompress_bytes(data), expected)
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(data, workers=2), expected)
+    with concurrent.futures.ThreadPoolExecutor(3) as executor:
+        np.testing.assert_array_equal(
+            jpeg.decompress_bytes(data, executor=executor), expected)
+
+
+def test_compress_raises_value_error_wrong_shape():
+    with pytest.raises(ValueError):
+        jpeg.compress_bytes(np.zeros((12, 16)))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'restart_interval': 1},
+    {'restart_interval': 3},
+    {'restart_interval': 1, 'index': True},
+    {'restart_interval': 3, 'index': True},
+])
+@pytest.mark.parametrize("region", [
+    (0, 0, 64, 64),
+    (0, 0, 1, 1),
+    (13, 21, 20, 9),
+    (40, 8, 24, 56),
+    (63, 63, 1, 1),
+])
+def test_decompress_region(smooth_im, kwargs, region):
+    data = jpeg.compress_bytes(smooth_im, Q=3, **kwargs)
+    y0, x0, h, w = region
+    out = jpeg.decompress_region(data, *region, Q=3)
+    np.testing.assert_array_equal(
+        out, jpeg.decompress_bytes(data, Q=3)[y0: y0 + h, x0: x0 + w])
+
+
+@pytest.mark.parametrize("region", [
+    (60, 0, 8, 8), (-1, 0, 8, 8), (0, 0, 0, 8), (0, 0, 8, 0),
+])
+@pytest.mark.parametrize("index", [False, True])
+def test_decompress_region_raises_value_error_outside_image(
+    smooth_im, region, index
+):
+    data = jpeg.compress_bytes(smooth_im, restart_interval=1, index=index)
+    with pytest.raises(ValueError, match='outside image'):
+        jpeg.decompress_region(data, *region)
+
+
+def strips(im, heights):
+    y = 0
+    for height in heights:
+        yield im[y: y + height]
+        y += height
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'Q': 3, 'restart_interval': 3},
+    {'restart_interval': 2, 'index': True},
+])
+def test_compress_stream_array(tmp_path, smooth_im, kwargs):
+    path = tmp_path / 'im.raw'
+    memmap = np.memmap(path, dtype=np.uint8, mode='w+', shape=(64, 64))
+    memmap[:] = smooth_im
+
+    fileobj = io.BytesIO()
+    n_bytes = jpeg.compress_stream(memmap, fileobj, **kwargs)
+    assert fileobj.getvalue() == jpeg.compress_bytes(smooth_im, **kwargs)
+    assert n_bytes == len(fileobj.getvalue())
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'height': 64},
+    {'restart_interval': 3},
+    {'height': 64, 'restart_interval': 2, 'index': True},
+])
+def test_compress_stream_strips(smooth_im, kwargs):
+    fileobj = io.BytesIO()
+    jpeg.compress_stream(strips(smooth_im, [5, 11, 16, 32]), fileobj, **kwargs)
+    kwargs.pop('height', None)
+    assert fileobj.getvalue() == jpeg.compress_bytes(smooth_im, **kwargs)
+
+
+def test_compress_stream_raises_value_error_incomplete_block_row(smooth_im):
+    with pytest.raises(ValueError):
+        jpeg.compress_stream(strips(smooth_im, [8, 3]), io.BytesIO())
+
+
+def test_compress_stream_raises_value_error_wrong_height(smooth_im):
+    with pytest.raises(ValueError):
+        jpeg.compress_stream(
+            strips(smooth_im, [8, 8]), io.BytesIO(), height=64)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {'restart_interval': 3}])
+def test_decompress_file(tmp_path, smooth_im, kwargs):
+    path = tmp_path / 'im.pyjpeg'
+    path.write_bytes(jpeg.compress_bytes(smooth_im, Q=3, **kwargs))
+
+    out = jpeg.decompress_file(path, Q=3)
+    assert out.dtype == np.uint8
+    expected = np.clip(jpeg.decompress_bytes(path.read_bytes(), Q=3), 0, 255)
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_decompress_file_into_out(tmp_path, im):
+    path = tmp_path / 'im.pyjpeg'
+    path.write_bytes(jpeg.compress_bytes(im, Q=20))
+
+    out = np.zeros(im.shape, dtype=np.int16)
+    assert jpeg.decompress_file(str(path), out, Q=20) is out
+    expected = np.clip(jpeg.decompress_bytes(path.read_bytes(), Q=20), 0, 255)
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_decompress_file_raises_value_error_wrong_out_shape(tmp_path, im):
+    path = tmp_path / 'im.pyjpeg'
+    path.write_bytes(jpeg.compress_bytes(im))
+    with pytest.raises(ValueError):
+        jpeg.decompress_file(path, np.zeros((8, 8)))
+
+
+@pytest.mark.parametrize("n_bytes", [0, 5, 12, 200])
+def test_decompress_file_raises_value_error_truncated(tmp_path, im, n_bytes):
+    path = tmp_path / 'im.pyjpeg'
+    path.write_bytes(jpeg.compress_bytes(im, quality=75)[:n_bytes])
+    with pytest.raises(ValueError, match='truncated'):
+        jpeg.decompress_file(path)
+
+
+def test_decompress_bytes_raises_value_error_truncated_header():
+    with pytest.raises(ValueError, match='truncated'):
+        jpeg.decompress_bytes(b'')
+
+
+@pytest.fixture
+def rgb_im():
+    y, x = np.mgrid[:45, :61]
+    return np.stack([
+        128 + 60 * np.sin(x / 9) * np.cos(y / 13),
+        128 + 50 * np.cos(x / 11),
+        128 + 40 * np.sin(y / 7),
+    ], axis=2).astype(int)
+
+
+@pytest.mark.parametrize("subsampling", ['4:4:4', '4:2:2', '4:2:0'])
+def test_compress_decompress_color(rgb_im, subsampling):
+    data = jpeg.compress_bytes(rgb_im, subsampling=subsampling)
+    out = jpeg.decompress_bytes(data)
+    assert out.shape == rgb_im.shape
+    assert np.abs(out - rgb_im).mean() < 3
+
+
+def test_compress_color_subsampling_is_smaller(rgb_im):
+    Q = jpeg.quantization.quantization_50
+    sizes = [
+        len(jpeg.compress_bytes(rgb_im, Q=Q, subsampling=subsampling))
+        for subsampling in ('4:4:4', '4:2:2', '4:2:0')
+    ]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_compress_color_options(rgb_im):
+    kwargs = dict(Q=4, Q_chroma=8)
+    expected = jpeg.decompress_bytes(
+        jpeg.compress_bytes(rgb_im, **kwargs), **kwargs)
+    data = jpeg.compress_bytes(
+        rgb_im, optimize=True, restart_interval=2, index=True, **kwargs)
+    np.testing.assert_array_equal(
+        jpeg.decompress_bytes(data, workers=2, **kwargs), expected)
+
+
+def test_decompress_region_raises_value_error_color(rgb_im):
+    with pytest.raises(ValueError):
+        jpeg.decompress_region(jpeg.compress_bytes(rgb_im), 0, 0, 8, 8)
+
+
+@pytest.mark.parametrize("backend", jpeg.freq.TRANSFORM_BACKENDS)
+def test_compress_decompress_backend(smooth_im, backend):
+    data = jpeg.compress_bytes(smooth_im, Q=4., backend=backend)
+    reference = jpeg.decompress_bytes(
+        jpeg.compress_bytes(smooth_im, Q=4.), Q=4.)
+    result = jpeg.decompress_bytes(data, Q=4., backend=backend)
+    assert np.abs(result - reference).max() <= 8
+
+
+def test_compress_quality_stores_tables(smooth_im, rgb_im):
+    for im in (smooth_im, rgb_im):
+        data = jpeg.compress_bytes(im, quality=90)
+        assert np.abs(jpeg.decompress_bytes(data, Q=1000) - im).max() < 32
+
+
+def test_compress_quality_is_smaller_for_lower_quality(smooth_im):
+    sizes = [
+        len(jpeg.compress_bytes(smooth_im, quality=quality))
+        for quality in (10, 50, 90)
+    ]
+    assert sizes == sorted(sizes)
+    assert sizes[0] < sizes[-1]
+
+
+def test_compress_stream_quality(smooth_im):
+    fileobj = io.BytesIO()
+    jpeg.compress_stream(smooth_im, fileobj, quality=60)
+    data = jpeg.compress_bytes(smooth_im, quality=60)
+    assert fileobj.getvalue() == data
+    np.testing.assert_array_equal(
+        jpeg.decompress_region(data, 3, 5, 20, 30),
+        jpeg.decompress_bytes(data)[3:23, 5:35],
+    )
+
+
+@pytest.fixture
+def images(im, smooth_im, rgb_im):
+    rng = np.random.RandomState(2)
+    return [
+        im,
+        smooth_im,
+        rng.randint(0, 256, im.shape),
+        rgb_im,
+        smooth_im[:16],
+        rng.randint(0, 256, im.shape),
+    ]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'Q': 4.},
+    {'quality': 60, 'optimize': True},
+    {'quality': 80, 'backend': 'aan'},
+])
+def test_compress_many_is_compress_bytes(images, kwargs):
+    blobs = jpeg.compress_many(images, batch_size=2, **kwargs)
+    assert blobs == [jpeg.compress_bytes(im, **kwargs) for im in images]
+
+
+def test_decompress_many_is_decompress_bytes(images):
+    blobs = [
+        jpeg.compress_bytes(images[0], Q=4., restart_interval=2),
+        *jpeg.compress_many(images[1:], Q=4.),
+    ]
+    expected = [jpeg.decompress_bytes(data, Q=4.) for data in blobs]
+    result = jpeg.decompress_many(blobs, Q=4., batch_size=2)
+    assert len(result) == len(expected)
+    for im_back, expected_im in zip(result, expected):
+        np.testing.assert_array_equal(im_back, expected_im)
+
+
+def test_compress_many_with_executor(images):
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        blobs = jpeg.compress_many(images, Q=4., executor=executor)
+        result = jpeg.decompress_many(blobs, Q=4., executor=executor)
+    assert blobs == jpeg.compress_many(images, Q=4.)
+    assert [im.shape for im in result] == [im.shape for im in images]
+
+
+def test_compress_many_raises_value_error_batch_size(images):
+    with pytest.raises(ValueError):
+        jpeg.compress_many(images, batch_size=0)
+
+
+@pytest.mark.parametrize("scale", [1, 1 / 2, 1 / 4, 1 / 8])
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"restart_interval": 3, "index": True}])
+def test_decompress_scale(smooth_im, scale, kwargs):
+    data = jpeg.compress_bytes(smooth_im, quality=90, **kwargs)
+    out = jpeg.decompress_bytes(data, scale=scale)
+    factor = int(1 / scale)
+    assert out.shape == (64 // factor, 64 // factor)
+    expected = jpeg.decompress_bytes(data).reshape(
+        64 // factor, factor, 64 // factor, factor).mean(axis=(1, 3))
+    assert np.abs(out - expected).max() <= 3
+
+
+@pytest.mark.parametrize("scale", [1 / 2, 1 / 4, 1 / 8])
+def test_decompress_scale_color(rgb_im, scale):
+    out = jpeg.decompress_bytes(jpeg.compress_bytes(rgb_im), scale=scale)
+    assert out.shape == (
+        int(np.ceil(45 * scale)), int(np.ceil(61 * scale)), 3)
+
+
+def test_decompress_scale_raises_value_error(smooth_im):
+    with pytest.raises(ValueError):
+        jpeg.decompress_bytes(jpeg.compress_bytes(smooth_im), scale=1 / 3)
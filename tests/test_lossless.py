@@ -0,0 +1,196 @@
+import io
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+import jpeg
+from jpeg import jfif, lossless
+
+
+PIXEL_OPERATIONS = {
+    'flip_horizontal': lambda im: im[:, ::-1],
+    'flip_vertical': lambda im: im[::-1],
+    'transpose': lambda im: im.swapaxes(0, 1),
+    'rotate_90': lambda im: np.rot90(im, -1),
+    'rotate_180': lambda im: np.rot90(im, 2),
+    'rotate_270': lambda im: np.rot90(im, 1),
+}
+
+
+@pytest.fixture
+def gray():
+    y, x = np.mgrid[:48, :64]
+    return (128 + 60 * np.sin(x / 5.) + 40 * np.cos(y / 3.)).astype(int)
+
+
+@pytest.fixture
+def rgb():
+    y, x = np.mgrid[:37, :53]
+    return np.stack([
+        128 + 100 * np.sin(x / 9.),
+        128 + 100 * np.cos(y / 7.),
+        (x + y) * 2.5,
+    ], axis=2).astype(np.uint8)
+
+
+@pytest.mark.parametrize('operation', sorted(lossless.OPERATIONS))
+def test_transform_blocks_same_as_pixels(operation):
+    blocks = np.random.RandomState(0).randint(-50, 50, size=(2, 3, 64))
+    # The (unnormalized) inverse DCT of the blocks.
+    basis = np.cos(np.outer(2 * np.arange(8) + 1, np.arange(8)) * np.pi / 16)
+
+    def reconstruct(coefficients):
+        return np.block([
+            [basis @ jpeg.utils.izigzag_patch(block) @ basis.T
+             for block in row]
+            for row in coefficients
+        ])
+
+    np.testing.assert_allclose(
+        reconstruct(lossless.transform_blocks(blocks, operation)),
+        PIXEL_OPERATIONS[operation](reconstruct(blocks)),
+        atol=1e-9,
+    )
+
+
+def test_transform_blocks_raises_value_error_operation():
+    with pytest.raises(ValueError):
+        lossless.transform_blocks(np.zeros((1, 1, 64)), 'rotate_45')
+
+
+@pytest.mark.parametrize('operation', sorted(lossless.OPERATIONS))
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'quality': 60, 'optimize': True, 'restart_interval': 2, 'index': True},
+])
+def test_transform_bytes_gray(gray, operation, kwargs):
+    data = jpeg.compress_bytes(gray, **kwargs)
+    out = jpeg.decompress_bytes(lossless.transform_bytes(data, operation))
+    assert_array_equal(
+        out, PIXEL_OPERATIONS[operation](jpeg.decompress_bytes(data)))
+
+
+@pytest.mark.parametrize('operation, inverse', [
+    ('flip_horizontal', 'flip_horizontal'),
+    ('flip_vertical', 'flip_vertical'),
+    ('transpose', 'transpose'),
+    ('rotate_90', 'rotate_270'),
+    ('rotate_180', 'rotate_180'),
+])
+def test_transform_bytes_inverse_is_bit_exact(gray, operation, inverse):
+    data = jpeg.compress_bytes(gray, quality=75, optimize=True)
+    transformed = lossless.transform_bytes(data, operation)
+    assert lossless.transform_bytes(transformed, inverse) == data
+
+
+def _original_shape(shape, operation):
+    """The shape before the operation."""
+    if 'transpose' in lossless.OPERATIONS[operation]:
+        return shape[1], shape[0]
+    return shape[:2]
+
+
+@pytest.mark.parametrize('subsampling', ['4:4:4', '4:2:2', '4:2:0'])
+@pytest.mark.parametrize('operation', sorted(lossless.OPERATIONS))
+def test_transform_bytes_color_trim(rgb, subsampling, operation):
+    data = jpeg.compress_bytes(rgb, quality=80, subsampling=subsampling)
+    out = jpeg.decompress_bytes(
+        lossless.transform_bytes(data, operation, trim=True))
+    # The partial blocks are dropped from the bottom and right edges.
+    height, width = _original_shape(out.shape, operation)
+    expected = PIXEL_OPERATIONS[operation](
+        jpeg.decompress_bytes(data)[:height, :width])
+    assert np.abs(out - expected).max() <= 1
+
+
+def test_transform_bytes_raises_value_error_partial_blocks(rgb):
+    data = jpeg.compress_bytes(rgb)
+    with pytest.raises(ValueError):
+        lossless.transform_bytes(data, 'flip_horizontal')
+    # A transpose is always exact.
+    assert jpeg.decompress_bytes(
+        lossless.transform_bytes(data, 'transpose')).shape == (53, 37, 3)
+
+
+def test_transform_bytes_transposes_stored_quantization(gray):
+    Q = np.arange(1, 65).reshape(8, 8)
+    data = jpeg.compress_bytes(gray, Q=Q)
+    transposed = lossless.transform_bytes(data, 'transpose')
+    assert_array_equal(
+        jpeg.decompress_bytes(transposed, Q=Q.T),
+        jpeg.decompress_bytes(data, Q=Q).T
+    )
+
+
+def test_crop_bytes_gray(gray):
+    data = jpeg.compress_bytes(gray, quality=75, restart_interval=1)
+    out = jpeg.decompress_bytes(lossless.crop_bytes(data, 8, 16, 32, 40))
+    assert_array_equal(out, jpeg.decompress_bytes(data)[8:40, 16:56])
+
+
+def test_crop_bytes_color(rgb):
+    data = jpeg.compress_bytes(rgb, quality=75)
+    out = jpeg.decompress_bytes(lossless.crop_bytes(data, 16, 16, 21, 30))
+    assert out.shape == (21, 30, 3)
+    assert np.abs(out - jpeg.decompress_bytes(data)[16:, 16:46]).max() <= 1
+
+
+@pytest.mark.parametrize('crop', [
+    (4, 0, 8, 8),       # not aligned
+    (0, 0, 8, 12),      # partial block of a grayscale image
+    (40, 0, 16, 8),     # outside
+])
+def test_crop_bytes_raises_value_error(gray, crop):
+    data = jpeg.compress_bytes(gray)
+    with pytest.raises(ValueError):
+        lossless.crop_bytes(data, *crop)
+
+
+@pytest.mark.parametrize('subsampling', ['4:4:4', '4:2:0'])
+@pytest.mark.parametrize('operation', sorted(lossless.OPERATIONS))
+def test_transform_jfif(rgb, subsampling, operation):
+    data = jfif.compress_jfif(rgb, quality=90, subsampling=subsampling)
+    transformed = lossless.transform_jfif(data, operation, trim=True)
+    out = jfif.decompress_jfif(transformed)
+    height, width = _original_shape(out.shape, operation)
+    expected = PIXEL_OPERATIONS[operation](
+        jfif.decompress_jfif(data)[:height, :width])
+    assert np.abs(out.astype(int) - expected).max() <= 1
+
+
+def test_transform_jfif_single_component_with_factors():
+    im = (np.random.RandomState(0).rand(9, 200) * 255).astype(np.uint8)
+    image = jfif.read_jfif(jfif.compress_jfif(im, quality=90))
+    # A single component is not interleaved, whatever its factors.
+    data = jfif.write_jfif(image._replace(components=(
+        image.components[0]._replace(factors=(2, 2)),)))
+    pixels = jfif.decompress_jfif(data)
+
+    out = jfif.decompress_jfif(
+        lossless.transform_jfif(data, 'rotate_90', trim=True))
+    assert_array_equal(out, np.rot90(pixels[:8], -1))
+    out = jfif.decompress_jfif(lossless.crop_jfif(data, 0, 8, 9, 100))
+    assert_array_equal(out, pixels[:, 8:108])
+
+
+def test_transform_jfif_inverse_is_bit_exact(rgb):
+    data = jfif.compress_jfif(rgb, quality=90, optimize=True)
+    transformed = lossless.transform_jfif(data, 'transpose', optimize=True)
+    assert lossless.transform_jfif(
+        transformed, 'transpose', optimize=True) == data
+
+
+def test_crop_jfif(rgb):
+    data = jfif.compress_jfif(rgb, quality=90)
+    out = jfif.decompress_jfif(lossless.crop_jfif(data, 16, 16, 20, 30))
+    expected = jfif.decompress_jfif(data)[16:36, 16:46]
+    assert np.abs(out.astype(int) - expected).max() <= 1
+
+
+def test_transform_jfif_readable_by_pillow(rgb):
+    Image = pytest.importorskip('PIL.Image')
+    data = jfif.compress_jfif(rgb, quality=90, subsampling='4:2:2')
+    transformed = lossless.transform_jfif(data, 'rotate_90', trim=True)
+    out_pillow = np.asarray(Image.open(io.BytesIO(transformed)))
+    assert out_pillow.shape == (53, 32, 3)
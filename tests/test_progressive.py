@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+import jpeg
+from jpeg import lossless
+from jpeg.bitstream import BitReader
+from jpeg.header import PROGRESSIVE_BANDS, read_header
+from jpeg.progressive import ProgressiveDecoder
+
+
+@pytest.fixture
+def rgb():
+    y, x = np.mgrid[:37, :53]
+    return np.stack([
+        128 + 100 * np.sin(x / 9.),
+        128 + 100 * np.cos(y / 7.),
+        (x + y) * 2.5,
+    ], axis=2).astype(np.uint8)
+
+
+@pytest.fixture
+def gray(rgb):
+    return rgb[:32, :48, 0].astype(int)
+
+
+@pytest.mark.parametrize('progressive', [True, (1, 3, 10, 64), (64,)])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_compress_decompress_progressive_same_as_sequential(
+    gray, rgb, progressive, optimize
+):
+    for im in (gray, rgb):
+        data = jpeg.compress_bytes(
+            im, quality=75, optimize=optimize, progressive=progressive)
+        expected = jpeg.decompress_bytes(
+            jpeg.compress_bytes(im, quality=75, optimize=optimize))
+        assert_array_equal(jpeg.decompress_bytes(data), expected)
+
+
+@pytest.mark.parametrize('progressive', [True, (64,)])
+@pytest.mark.parametrize('optimize', [False, True])
+def test_compress_progressive_size(progressive, optimize):
+    # Dense blocks: the ends of band are not written for blocks ending with
+    # a non-zero value, the scans are not larger than the sequential code.
+    im = np.random.RandomState(0).randint(0, 256, (64, 80)).astype(np.uint8)
+    data = jpeg.compress_bytes(
+        im, quality=90, optimize=optimize, progressive=progressive)
+    assert len(data) <= len(
+        jpeg.compress_bytes(im, quality=90, optimize=optimize))
+
+
+def test_compress_progressive_size_constant():
+    # Without coefficients a band is one run over all blocks.
+    im = np.full((64, 80), 100, dtype=np.uint8)
+    data = jpeg.compress_bytes(im, progressive=True)
+    header = read_header(BitReader(data))
+    sequential = read_header(BitReader(jpeg.compress_bytes(im)))
+    n_blocks = 8 * 10
+    # The DC differences of 0 without end of band and a symbol for the run
+    # of 80 blocks followed by 6 bits.
+    assert header.scans[0] < n_blocks
+    assert header.scans[1:] == (2, 2)
+    assert len(data) - header.size < len(jpeg.compress_bytes(im)) - (
+        sequential.size)
+
+
+@pytest.mark.parametrize('scale', [1 / 2, 1 / 8])
+def test_decompress_progressive_scale(rgb, scale):
+    data = jpeg.compress_bytes(rgb, quality=75, progressive=True)
+    expected = jpeg.decompress_bytes(
+        jpeg.compress_bytes(rgb, quality=75), scale=scale)
+    assert_array_equal(jpeg.decompress_bytes(data, scale=scale), expected)
+
+
+def test_compress_progressive_raises_value_error(gray):
+    with pytest.raises(ValueError):
+        jpeg.compress_bytes(gray, progressive=True, restart_interval=1)
+
+
+@pytest.mark.parametrize('bands', [(6, 1, 64), (0, 1, 64), (1, 63), ()])
+def test_compress_progressive_raises_value_error_bands(gray, rgb, bands):
+    for im in (gray, rgb):
+        with pytest.raises(ValueError, match='Expecting increasing bands'):
+            jpeg.compress_bytes(im, progressive=bands)
+
+
+def test_decompress_progressive_raises_value_error_truncated(gray):
+    data = jpeg.compress_bytes(gray, progressive=True)
+    with pytest.raises(ValueError):
+        jpeg.decompress_bytes(data[:-1])
+
+
+def test_decompress_region_raises_value_error_progressive(gray):
+    data = jpeg.compress_bytes(gray, progressive=True)
+    with pytest.raises(ValueError):
+        jpeg.decompress_region(data, 0, 0, 8, 8)
+
+
+def test_transform_bytes_progressive(gray):
+    data = jpeg.compress_bytes(gray, quality=75, progressive=True)
+    transformed = lossless.transform_bytes(data, 'transpose')
+    assert read_header(BitReader(transformed)).bands == PROGRESSIVE_BANDS
+    assert_array_equal(
+        jpeg.decompress_bytes(transformed), jpeg.decompress_bytes(data).T)
+
+
+def test_transform_bytes_progressive_color(rgb):
+    data = jpeg.compress_bytes(
+        rgb[:32, :48], quality=75, optimize=True, progressive=True)
+    transformed = lossless.transform_bytes(data, 'rotate_90')
+    assert read_header(BitReader(transformed)).bands == PROGRESSIVE_BANDS
+    assert lossless.transform_bytes(transformed, 'rotate_270') == data
+    assert np.abs(
+        jpeg.decompress_bytes(transformed) -
+        np.rot90(jpeg.decompress_bytes(data), -1)
+    ).max() <= 1
+
+
+@pytest.mark.parametrize('chunk_size', [1, 37, 1000])
+def test_progressive_decoder(gray, rgb, chunk_size):
+    for im in (gray, rgb):
+        data = jpeg.compress_bytes(im, quality=90, progressive=True)
+        decoder = ProgressiveDecoder()
+        errors = []
+        for start in range(0, len(data), chunk_size):
+            n_bands = decoder.feed(data[start: start + chunk_size])
+            if n_bands > len(errors):
+                errors.append(np.abs(decoder.image() - im).mean())
+        assert decoder.complete
+        assert len(errors) == len(PROGRESSIVE_BANDS) or chunk_size > 100
+        # Every band refines the image.
+        assert errors == sorted(errors, reverse=True)
+        assert_array_equal(decoder.image(), jpeg.decompress_bytes(data))
+
+
+def test_progressive_decoder_dc_is_block_average(gray):
+    data = jpeg.compress_bytes(gray, progressive=True)
+    header = read_header(BitReader(data))
+    decoder = ProgressiveDecoder()
+    assert decoder.feed(data[:header.size + header.scans[0]]) == 1
+    averages = gray.reshape(4, 8, 6, 8).mean(axis=(1, 3))
+    assert np.abs(decoder.image(scale=1 / 8) - averages).max() <= 1
+    assert np.abs(
+        decoder.image()[::8, ::8] - decoder.image(scale=1 / 8)).max() <= 1
+
+
+def test_progressive_decoder_prefix_of_header(gray):
+    data = jpeg.compress_bytes(gray, progressive=True)
+    decoder = ProgressiveDecoder()
+    assert decoder.feed(data[:4]) == 0
+    assert decoder.header is None and decoder.image() is None
+
+
+def test_progressive_decoder_raises_value_error_sequential(gray):
+    with pytest.raises(ValueError):
+        ProgressiveDecoder().feed(jpeg.compress_bytes(gray))
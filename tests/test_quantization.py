@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from jpeg import quantization
+
+
+@pytest.mark.parametrize("chroma, expected", [
+    (False, quantization.quantization_50),
+    (True, quantization.chroma_quantization_50),
+])
+def test_quantization_table_quality_50(chroma, expected):
+    table = quantization.quantization_table(50, chroma=chroma)
+    np.testing.assert_array_equal(table, expected)
+
+
+def test_quantization_table_limits():
+    np.testing.assert_array_equal(quantization.quantization_table(100), 1)
+    assert quantization.quantization_table(1).max() == 255
+
+
+def test_quantization_table_decreases_with_quality():
+    tables = [quantization.quantization_table(q) for q in range(1, 101)]
+    assert all((a >= b).all() for a, b in zip(tables, tables[1:]))
+
+
+def test_quantization_table_is_cached_and_read_only():
+    table = quantization.quantization_table(75, chroma=True)
+    assert not table.flags.writeable
+    assert quantization.quantization_table(75, chroma=True) is table
+
+
+@pytest.mark.parametrize("quality", [0, 101])
+def test_quantization_table_raises_value_error_quality(quality):
+    with pytest.raises(ValueError):
+        quantization.quantization_table(quality)
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from jpeg import utils
@@ -75,3 +76,16 @@ def test_zfill_bits_to_int():
 )
 def test_int_to_bits_large_numbers(number, expected):
     assert utils.int_to_bits(number) == expected
+
+
+def test_image_to_blocks_and_back():
+    im = np.arange(16 * 24).reshape(16, 24)
+    blocks = utils.image_to_blocks(im)
+    assert blocks.shape == (2, 3, 8, 8)
+    np.testing.assert_array_equal(blocks[1, 2], im[8:16, 16:24])
+    np.testing.assert_array_equal(utils.blocks_to_image(blocks), im)
+
+
+def test_image_to_blocks_raises_value_error_wrong_shape():
+    with pytest.raises(ValueError):
+        utils.image_to_blocks(np.zeros((8, 12)))